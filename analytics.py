@@ -0,0 +1,238 @@
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from collections import Counter, deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from sqlite_db import connect
+
+logger = logging.getLogger(__name__)
+
+# Event kinds
+START = "start"
+NAVIGATE = "navigate"
+SEARCH = "search"
+SEARCH_MISS = "search_miss"
+DOWNLOAD = "download"
+
+# (timestamp, kind, user_id, class_num, subject, year, query)
+Event = Tuple[float, str, int, Optional[str], Optional[str], Optional[str], Optional[str]]
+
+# Search queries are stored up to this many characters
+MAX_QUERY_LENGTH = 64
+
+SECONDS_PER_DAY = 86400
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    ts REAL NOT NULL,
+    kind TEXT NOT NULL,
+    user_id INTEGER NOT NULL,
+    class_num TEXT,
+    subject TEXT,
+    year TEXT,
+    query TEXT
+);
+CREATE INDEX IF NOT EXISTS events_ts ON events (ts);
+CREATE TABLE IF NOT EXISTS daily_events (
+    day INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (day, kind)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS daily_downloads (
+    day INTEGER NOT NULL,
+    class_num TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    year TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (day, class_num, subject, year)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS daily_search_misses (
+    day INTEGER NOT NULL,
+    query TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (day, query)
+) WITHOUT ROWID;
+"""
+
+
+class AnalyticsStore:
+    """SQLite store for usage events and their daily rollups.
+
+    Every batch is written in one transaction: the raw events, plus
+    per-day counts by event kind, by downloaded paper and by search query
+    without results. Counts are summed in Python first, so a batch costs
+    one upsert per distinct key rather than per event. Reports read only
+    the rollup tables; raw events are kept for `retention_days` for ad hoc
+    queries and then deleted.
+    """
+
+    def __init__(self, path: str, retention_days: int = 30):
+        self.path = path
+        self.retention_days = retention_days
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._purged_day = -1
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = connect(self.path)
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def write(self, events: List[Event]):
+        """Store a batch of events and add them to the rollups"""
+        kinds: Counter = Counter()
+        downloads: Counter = Counter()
+        misses: Counter = Counter()
+        for ts, kind, _, class_num, subject, year, query in events:
+            day = int(ts // SECONDS_PER_DAY)
+            kinds[day, kind] += 1
+            if kind == DOWNLOAD:
+                downloads[day, class_num, subject, year] += 1
+            elif kind == SEARCH_MISS:
+                misses[day, query] += 1
+
+        today = int(time.time() // SECONDS_PER_DAY)
+        with self._lock, self.conn:
+            self.conn.executemany("INSERT INTO events VALUES (?, ?, ?, ?, ?, ?, ?)", events)
+            self.conn.executemany(
+                "INSERT INTO daily_events VALUES (?, ?, ?) "
+                "ON CONFLICT DO UPDATE SET count = count + excluded.count",
+                [(*key, count) for key, count in kinds.items()]
+            )
+            self.conn.executemany(
+                "INSERT INTO daily_downloads VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT DO UPDATE SET count = count + excluded.count",
+                [(*key, count) for key, count in downloads.items()]
+            )
+            self.conn.executemany(
+                "INSERT INTO daily_search_misses VALUES (?, ?, ?) "
+                "ON CONFLICT DO UPDATE SET count = count + excluded.count",
+                [(*key, count) for key, count in misses.items()]
+            )
+            if today != self._purged_day:
+                self.conn.execute("DELETE FROM events WHERE ts < ?", ((today - self.retention_days) * SECONDS_PER_DAY,))
+                self._purged_day = today
+
+    def _since(self, days: int) -> int:
+        return int(time.time() // SECONDS_PER_DAY) - days + 1
+
+    def event_counts(self, days: int) -> Dict[str, int]:
+        """Events per kind over the last `days` days, today included"""
+        with self._lock:
+            return dict(self.conn.execute(
+                "SELECT kind, SUM(count) FROM daily_events WHERE day >= ? GROUP BY kind", (self._since(days),)
+            ))
+
+    def top_papers(self, days: int, limit: int = 10) -> List[Tuple[str, str, str, int]]:
+        """Most downloaded papers over the last `days` days as (class, subject, year, downloads)"""
+        with self._lock:
+            return self.conn.execute(
+                "SELECT class_num, subject, year, SUM(count) AS total FROM daily_downloads WHERE day >= ? "
+                "GROUP BY class_num, subject, year ORDER BY total DESC LIMIT ?",
+                (self._since(days), limit)
+            ).fetchall()
+
+    def daily_downloads(self, days: int) -> List[Tuple[int, str, str, str, int]]:
+        """Downloads per paper and day over the last `days` days as (day, class, subject, year, downloads)"""
+        with self._lock:
+            return self.conn.execute(
+                "SELECT * FROM daily_downloads WHERE day >= ?", (self._since(days),)
+            ).fetchall()
+
+    def top_search_misses(self, days: int, limit: int = 10) -> List[Tuple[str, int]]:
+        """Most frequent search queries without results over the last `days` days"""
+        with self._lock:
+            return self.conn.execute(
+                "SELECT query, SUM(count) AS total FROM daily_search_misses WHERE day >= ? "
+                "GROUP BY query ORDER BY total DESC LIMIT ?",
+                (self._since(days), limit)
+            ).fetchall()
+
+
+class Analytics:
+    """Records usage events into a ring buffer and writes them to the store in batches.
+
+    `record` only appends a tuple to a bounded deque, so handlers never
+    wait on storage. `run` drains the buffer every `interval` seconds, or
+    as soon as `batch_size` events are waiting, and writes the batch from a
+    worker thread. If events arrive faster than they can be written, the
+    oldest buffered ones are dropped and counted in `dropped`.
+    """
+
+    def __init__(self, store: AnalyticsStore, capacity: int = 100_000, batch_size: int = 5_000,
+                 interval: float = 5):
+        self.store = store
+        self.batch_size = batch_size
+        self.interval = interval
+        self._buffer: Deque[Event] = deque(maxlen=capacity)
+        self._wake: Optional[asyncio.Event] = None
+        self.recorded = 0
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    def record(self, kind: str, user_id: int, class_num: Optional[str] = None, subject: Optional[str] = None,
+               year: Optional[str] = None, query: Optional[str] = None):
+        buffer = self._buffer
+        if len(buffer) == buffer.maxlen:
+            self.dropped += 1
+        if query is not None:
+            query = query[:MAX_QUERY_LENGTH]
+        buffer.append((time.time(), kind, user_id, class_num, subject, year, query))
+        self.recorded += 1
+        if self._wake is not None and len(buffer) >= self.batch_size:
+            self._wake.set()
+
+    def _drain(self) -> List[Event]:
+        batch = list(self._buffer)
+        self._buffer.clear()
+        return batch
+
+    async def flush(self) -> int:
+        """Write everything buffered so far, returning how many events were written"""
+        batch = self._drain()
+        if not batch:
+            return 0
+        try:
+            await asyncio.to_thread(self.store.write, batch)
+        except Exception as e:
+            self.failed += len(batch)
+            logger.error("Failed to write analytics events", extra={"events": len(batch), "error": str(e)})
+            return 0
+        self.written += len(batch)
+        return len(batch)
+
+    async def run(self):
+        """Flush periodically until cancelled"""
+        self._wake = asyncio.Event()
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    def close(self):
+        """Write what is left in the buffer from the calling thread, then close the store"""
+        batch = self._drain()
+        if batch:
+            self.store.write(batch)
+            self.written += len(batch)
+        self.store.close()
@@ -0,0 +1,75 @@
+"""Admin catalog view: the old full summary against one page of CatalogSummary.
+
+The old view concatenated a line per subject with += over the whole
+catalog on every press and sent the result as one message, which
+Telegram rejects past 4096 characters. The table shows the time to
+produce the message text, its length, and the cost of keeping the
+summary current when a paper is added (incremental add and re-layout,
+against the old recount).
+
+Run from the repository root:
+
+    python -m benchmarks.bench_admin_view
+"""
+import timeit
+
+from benchmarks.synthetic import make_catalog
+from catalog_summary import CatalogSummary
+
+SIZES = [1_000, 10_000, 100_000]
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+
+def legacy_summary(papers) -> str:
+    total_papers = 0
+    papers_summary = "📋 **Current Papers Database:**\n\n"
+    for class_num in sorted(papers.keys()):
+        papers_summary += f"**Class {class_num}:**\n"
+        for subject, years in papers[class_num].items():
+            papers_summary += f"  • {subject}: {len(years)} papers ({', '.join(sorted(years.keys()))})\n"
+            total_papers += len(years)
+        papers_summary += "\n"
+    papers_summary += f"**Total Papers: {total_papers}**"
+    return papers_summary
+
+
+def page_text(summary: CatalogSummary, page: int) -> str:
+    return (
+        f"📋 **Current Papers Database** ({page + 1}/{summary.pages}):\n\n"
+        f"{summary.page(page)}\n\n"
+        f"**Total Papers: {summary.total}**"
+    )
+
+
+def timed_ms(call, number: int) -> float:
+    return timeit.timeit(call, number=number) / number * 1000
+
+
+def bench():
+    print(f"{'papers':>8} {'old ms':>8} {'old chars':>10} {'page ms':>8} {'max page chars':>15} {'pages':>6} "
+          f"{'add+layout ms':>14}")
+    for size in SIZES:
+        papers = make_catalog(size)
+        summary = CatalogSummary()
+        summary.build(papers)
+
+        number = max(1, 20_000 // size)
+        legacy_ms = timed_ms(lambda: legacy_summary(papers), number)
+        legacy_chars = len(legacy_summary(papers))
+        page_ms = timed_ms(lambda: page_text(summary, summary.pages // 2), 200)
+        longest = max(len(page_text(summary, page)) for page in range(summary.pages))
+        assert longest <= TELEGRAM_MESSAGE_LIMIT, longest
+
+        added = iter(range(10_000))
+
+        def add_and_render():
+            summary.add("10", "Mathematics", f"x{next(added)}")
+            page_text(summary, 0)
+
+        add_ms = timed_ms(add_and_render, 200)
+        print(f"{size:>8} {legacy_ms:>8.3f} {legacy_chars:>10} {page_ms:>8.3f} {longest:>15} {summary.pages:>6} "
+              f"{add_ms:>14.3f}")
+
+
+if __name__ == "__main__":
+    bench()
@@ -0,0 +1,84 @@
+"""Cost of usage analytics on the update path and in the background.
+
+Shows the time a handler spends in Analytics.record, how fast batches
+are written to the SQLite store (raw events plus rollups), and how long
+the /stats report queries take on a month of rollups.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_analytics
+"""
+import os
+import random
+import tempfile
+import time
+import timeit
+
+from analytics import DOWNLOAD, NAVIGATE, SEARCH, SEARCH_MISS, START, Analytics, AnalyticsStore, SECONDS_PER_DAY
+from benchmarks.synthetic import QUERIES, iter_papers, make_catalog
+
+EVENTS_PER_DAY = 50_000
+DAYS = 30
+BATCH_SIZE = 5_000
+
+
+def synthetic_events(papers, day: int, count: int, rng: random.Random):
+    """A day of events: mostly navigation and downloads, some searches"""
+    kinds = [NAVIGATE, NAVIGATE, DOWNLOAD, SEARCH, START]
+    start = day * SECONDS_PER_DAY
+    for i in range(count):
+        kind = rng.choice(kinds)
+        user_id = rng.randrange(100_000)
+        ts = start + i * SECONDS_PER_DAY / count
+        if kind == DOWNLOAD:
+            class_num, subject, year, _ = rng.choice(papers)
+            yield ts, kind, user_id, class_num, subject, year, None
+        elif kind == SEARCH:
+            query = rng.choice(QUERIES)
+            yield ts, kind, user_id, None, None, None, query
+            if rng.random() < 0.2:
+                yield ts, SEARCH_MISS, user_id, None, None, None, f"{query} {rng.randrange(50)}"
+        else:
+            yield ts, kind, user_id, None, None, None, None
+
+
+def bench():
+    store = AnalyticsStore(os.path.join(tempfile.mkdtemp(), "analytics.db"))
+    analytics = Analytics(store, capacity=1_000_000)
+
+    number = 500_000
+    record_ns = timeit.timeit(lambda: analytics.record(DOWNLOAD, 1, "10", "Mathematics", "2023"), number=number) / number * 1e9
+    search_ns = timeit.timeit(lambda: analytics.record(SEARCH, 1, query="math 2022 class 10"), number=number) / number * 1e9
+    print(f"record: {record_ns:.0f} ns per download event, {search_ns:.0f} ns per search event")
+
+    papers = list(iter_papers(make_catalog(10_000)))
+    rng = random.Random(3)
+    today = int(time.time() // SECONDS_PER_DAY)
+    written = 0
+    started = time.perf_counter()
+    for day in range(today - DAYS + 1, today + 1):
+        batch = []
+        for event in synthetic_events(papers, day, EVENTS_PER_DAY, rng):
+            batch.append(event)
+            if len(batch) == BATCH_SIZE:
+                store.write(batch)
+                written += len(batch)
+                batch = []
+        if batch:
+            store.write(batch)
+            written += len(batch)
+    elapsed = time.perf_counter() - started
+    print(f"write: {written:,} events in batches of {BATCH_SIZE} at {written / elapsed:,.0f} events/s "
+          f"({elapsed / (written / BATCH_SIZE) * 1000:.1f} ms per batch, off the event loop)")
+
+    for days in (1, 7, 30):
+        started = time.perf_counter()
+        store.event_counts(days)
+        store.top_papers(days)
+        store.top_search_misses(days)
+        print(f"/stats over {days:>2} days: {(time.perf_counter() - started) * 1000:.1f} ms")
+    store.close()
+
+
+if __name__ == "__main__":
+    bench()
@@ -0,0 +1,53 @@
+"""Startup time and lookup latency of the SQLite catalog store.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_catalog_store
+"""
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.synthetic import iter_papers, make_catalog, percentile
+from catalog_store import CatalogStore
+
+SIZE = 50_000
+BATCH_SIZE = 1_000
+LOOKUPS = 20_000
+
+
+def main():
+    rows = list(iter_papers(make_catalog(SIZE)))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "catalog.db")
+
+        store = CatalogStore(path)
+        started = time.perf_counter()
+        for i in range(0, len(rows), BATCH_SIZE):
+            store.put_many(rows[i:i + BATCH_SIZE])
+        write_s = time.perf_counter() - started
+        store.close()
+
+        started = time.perf_counter()
+        store = CatalogStore(path)
+        papers = store.load()
+        startup_ms = (time.perf_counter() - started) * 1000
+
+        rng = random.Random(1)
+        samples = []
+        for _ in range(LOOKUPS):
+            class_num, subject, year, _ = rows[rng.randrange(len(rows))]
+            started = time.perf_counter()
+            store.get(class_num, subject, year)
+            samples.append((time.perf_counter() - started) * 1_000_000)
+        store.close()
+
+    print(f"papers:          {sum(len(y) for s in papers.values() for y in s.values())}")
+    print(f"batched writes:  {len(rows) / write_s:,.0f} rows/s ({BATCH_SIZE} rows per transaction)")
+    print(f"startup (open + load): {startup_ms:.1f} ms")
+    print(f"lookup p50: {percentile(samples, 50):.1f} us  p99: {percentile(samples, 99):.1f} us")
+
+
+if __name__ == "__main__":
+    main()
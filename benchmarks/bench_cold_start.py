@@ -0,0 +1,139 @@
+"""Time from process start to the first answered update in polling mode.
+
+Each run starts `python main.py` against a local stub Bot API whose
+getUpdates returns one /start message, and measures the wall time from
+spawning the process until the bot's reply reaches the stub. Catalog, user
+and analytics databases are kept between runs of the same tree (a
+restart, not a first install), and one untimed run warms them up.
+
+Pass source trees to compare, e.g. a checkout of an older commit:
+
+    git archive <commit> | tar -x -C /tmp/old
+
+Run from the repository root:
+
+    python -m benchmarks.bench_cold_start [tree ...]
+"""
+import asyncio
+import os
+import signal
+import statistics
+import sys
+import tempfile
+import time
+from typing import Dict, Optional, Tuple
+
+from benchmarks.stub_api_server import StubBotApi
+from webhook_server import Response, json_response
+
+TOKEN = "123:cold-start"
+RUNS = 7
+HEALTH_PORT = 18080
+START_UPDATE = {
+    "update_id": 1,
+    "message": {
+        "message_id": 1, "date": 0, "chat": {"id": 42, "type": "private"},
+        "from": {"id": 42, "is_bot": False, "first_name": "Cold"},
+        "text": "/start", "entities": [{"type": "bot_command", "offset": 0, "length": 6}],
+    },
+}
+
+
+class ColdStartApi(StubBotApi):
+    """StubBotApi that also serves getUpdates: one /start message, then empty long polls"""
+
+    def __init__(self):
+        super().__init__(TOKEN)
+        self.add_route("POST", f"/bot{TOKEN}/getUpdates", self._get_updates)
+        self.delivered = False
+        self.replied = asyncio.Event()
+        self.replied_at = 0.0
+
+    async def _get_updates(self, headers: Dict[str, str], body: bytes) -> Response:
+        if not self.delivered:
+            self.delivered = True
+            return json_response({"ok": True, "result": [START_UPDATE]})
+        await asyncio.sleep(1)
+        return json_response({"ok": True, "result": []})
+
+    def _answer(self, method: str, params: Dict[str, str], chat_id: str) -> Response:
+        if method == "sendMessage" and not self.replied.is_set():
+            self.replied_at = time.perf_counter()
+            self.replied.set()
+        return super()._answer(method, params, chat_id)
+
+
+async def time_to_first_update(tree: str, data_dir: str, profile: bool = False) -> Tuple[float, str]:
+    api = ColdStartApi()
+    await api.start("127.0.0.1", 0)
+    env = dict(
+        os.environ,
+        BOT_TOKEN=TOKEN,
+        TELEGRAM_API_BASE_URL=f"http://127.0.0.1:{api.port}",
+        CATALOG_DB_PATH=os.path.join(data_dir, "catalog.db"),
+        USER_DB_PATH=os.path.join(data_dir, "users.db"),
+        ANALYTICS_DB_PATH=os.path.join(data_dir, "analytics.db"),
+        LINK_CHECK_INTERVAL="0",
+        PORT=str(HEALTH_PORT),
+        RENDER_EXTERNAL_URL=f"http://127.0.0.1:{HEALTH_PORT}",
+        STARTUP_PROFILE="1" if profile else "0",
+    )
+    started = time.perf_counter()
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, "main.py", cwd=tree, env=env,
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL,
+    )
+    try:
+        await asyncio.wait_for(api.replied.wait(), 60)
+        elapsed = api.replied_at - started
+        # Give the profile report, printed after the reply, a moment to be written
+        await asyncio.sleep(0.2)
+    finally:
+        process.send_signal(signal.SIGTERM)
+        try:
+            output, _ = await asyncio.wait_for(process.communicate(), 15)
+        except asyncio.TimeoutError:
+            process.kill()
+            output, _ = await process.communicate()
+        await api.stop()
+    return elapsed, output.decode("utf-8", "replace")
+
+
+def profile_report(output: str) -> Optional[str]:
+    start = output.find("⏱️ Startup profile")
+    if start < 0:
+        return None
+    lines = output[start:].splitlines()
+    report = [lines[0]]
+    for line in lines[1:]:
+        if not line.startswith("  "):
+            break
+        report.append(line)
+    return "\n".join(report)
+
+
+async def bench(trees):
+    results = {}
+    report = None
+    for tree in trees:
+        with tempfile.TemporaryDirectory() as data_dir:
+            await time_to_first_update(tree, data_dir)
+            times = []
+            for run in range(RUNS):
+                elapsed, output = await time_to_first_update(tree, data_dir, profile=run == RUNS - 1)
+                times.append(elapsed)
+                if run == RUNS - 1:
+                    report = profile_report(output) or report
+            results[tree] = times
+
+    print(f"{'tree':<30} {'median ms':>10} {'min ms':>8} {'max ms':>8}   ({RUNS} runs, process start to first reply)")
+    for tree, times in results.items():
+        print(f"{tree:<30} {statistics.median(times) * 1000:>10.0f} {min(times) * 1000:>8.0f} "
+              f"{max(times) * 1000:>8.0f}")
+    if report:
+        print()
+        print(report)
+
+
+if __name__ == "__main__":
+    asyncio.run(bench(sys.argv[1:] or ["."]))
@@ -0,0 +1,92 @@
+"""Update throughput as the worker count grows, against a stub Bot with a fixed API latency.
+
+Every update is a button press that triggers answerCallbackQuery and
+editMessageText, each taking API_LATENCY seconds plus random jitter, so
+throughput is bound by how many updates are in flight. Each user's
+presses arrive back to back, like a fast double-clicker, and the run
+checks that each user's updates were answered in the order they arrived.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_dispatcher
+"""
+import asyncio
+import logging
+import time
+
+from benchmarks.bot_env import use_temp_databases
+
+use_temp_databases()
+
+from telegram import Update  # noqa: E402
+
+import main  # noqa: E402
+from benchmarks.fake_telegram import FIRST_USER_ID, callback_update  # noqa: E402
+from benchmarks.stub_bot import StubRequest  # noqa: E402
+
+WORKERS = [1, 4, 16, 64]
+USERS = 100
+API_LATENCY = 0.01
+
+
+def menu():
+    """callback_data for the presses every user makes, in order"""
+    codec = main.CALLBACK_CODEC
+    return [
+        codec.encode(main.OP_CLASS, ("10",)),
+        codec.encode(main.OP_SUBJECT, ("10", "Mathematics")),
+        codec.encode(main.OP_YEAR, ("10", "Mathematics", "2023")),
+        codec.encode(main.OP_MAIN_MENU),
+        codec.encode(main.OP_CLASS, ("9",)),
+    ]
+
+
+def expected_texts(user_id: int):
+    url = f"{main.BASE_URL}/{main.QUESTION_PAPERS['10']['Mathematics']['2023']}"
+    return [
+        main.get_message(user_id, "choose_subject", class_num="10"),
+        main.get_message(user_id, "choose_year", subject="Mathematics", class_num="10"),
+        main.get_message(user_id, "download_link", subject="Mathematics", class_num="10", year="2023", url=url),
+        main.get_message(user_id, "choose_class"),
+        main.get_message(user_id, "choose_subject", class_num="9"),
+    ]
+
+
+async def run(workers: int):
+    request = StubRequest(latency=API_LATENCY, jitter=API_LATENCY)
+    # No outbound or per-user rate limiter: this measures the dispatcher alone
+    application = main.build_application(request=request, workers=workers, rate_limiter=None, user_limiter=None)
+    presses = menu()
+    async with application:
+        await application.start()
+        updates = [
+            Update.de_json(callback_update(user * len(presses) + step, FIRST_USER_ID + user, data), application.bot)
+            for user in range(USERS)
+            for step, data in enumerate(presses)
+        ]
+        started = time.perf_counter()
+        for update in updates:
+            await application.update_queue.put(update)
+        await application.update_queue.join()
+        elapsed = time.perf_counter() - started
+        await application.stop()
+
+    # Every user's edits must follow the menu() order
+    edits = {}
+    for method, chat_id, params in request.calls:
+        if method == "editMessageText":
+            edits.setdefault(chat_id, []).append(params.get("text"))
+    in_order = all(texts == expected_texts(chat_id) for chat_id, texts in edits.items()) and len(edits) == USERS
+    print(f"{workers:>8} {len(updates) / elapsed:>12,.0f} {elapsed:>9.2f} {'yes' if in_order else 'NO':>9}")
+
+
+async def bench():
+    logging.getLogger("telegram").setLevel(logging.WARNING)
+    print(f"{'workers':>8} {'updates/s':>12} {'seconds':>9} {'in order':>9}")
+    main.load_catalog()
+    for workers in WORKERS:
+        await run(workers)
+
+
+if __name__ == "__main__":
+    asyncio.run(bench())
@@ -0,0 +1,93 @@
+"""Bytes uploaded per paper request in DELIVERY_MODE=document.
+
+Users press year buttons for a handful of papers against the local Bot
+API stand-in. The first request for each paper uploads it from
+PAPERS_DIR; every later one, including concurrent requests made while
+the first upload is in flight, is sent by the stored file_id. A second
+application, started on the same catalog database, shows that the
+file_ids survive a restart. "sent KiB" counts every byte the bot sent
+to the Bot API, not just uploads.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_documents
+"""
+import asyncio
+import logging
+import os
+import random
+import time
+
+from benchmarks.bot_env import use_temp_databases
+
+_tmp = use_temp_databases()
+os.environ["DELIVERY_MODE"] = "document"
+os.environ["PAPERS_DIR"] = os.path.join(_tmp, "papers")
+
+from telegram import Update  # noqa: E402
+
+import main  # noqa: E402
+from benchmarks.fake_telegram import FIRST_USER_ID, callback_update  # noqa: E402
+from benchmarks.stub_api_server import StubBotApi  # noqa: E402
+
+PAPER_BYTES = 400 * 1024
+USERS = 200
+
+
+def write_papers():
+    papers = [
+        (class_num, subject, year, file_path)
+        for class_num, subjects in main.QUESTION_PAPERS.items()
+        for subject, years in subjects.items()
+        for year, file_path in years.items()
+    ]
+    for _, _, _, file_path in papers:
+        path = os.path.join(main.PAPERS_DIR, file_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(os.urandom(PAPER_BYTES))
+    return papers
+
+
+async def run(label: str, papers, stub: StubBotApi):
+    main.DOCUMENT_SENDER = main.DocumentSender(main.CATALOG_STORE, main.PAPERS_DIR, concurrency=main.UPLOAD_CONCURRENCY)
+    main.DOCUMENT_SENDER.load()
+    application = main.build_application(workers=32, rate_limiter=None, user_limiter=None)
+    rng = random.Random(1)
+    async with application:
+        await application.start()
+        stub.received_bytes = 0
+        started = time.perf_counter()
+        for user in range(USERS):
+            class_num, subject, year, _ = rng.choice(papers[:8])
+            data = main.CALLBACK_CODEC.encode(main.OP_YEAR, (class_num, subject, year))
+            await application.update_queue.put(Update.de_json(callback_update(user, FIRST_USER_ID + user, data), application.bot))
+        while application.update_queue.in_flight:
+            await asyncio.sleep(0.01)
+        elapsed = time.perf_counter() - started
+        await application.stop()
+
+    sender = main.DOCUMENT_SENDER
+    sent = sender.uploads + sender.cached_sends
+    print(f"{label:>10} {sent:>6} {sender.uploads:>8} {sender.cached_sends:>7} "
+          f"{stub.received_bytes / 1024:>12,.0f} {stub.received_bytes / max(1, sent) / 1024:>12,.1f} {elapsed:>8.2f}")
+
+
+async def bench():
+    main.load_catalog()
+    papers = write_papers()
+    stub = StubBotApi(main.BOT_TOKEN, global_rate=10_000, per_chat_rate=100, per_chat_burst=100)
+    await stub.start("127.0.0.1", 0)
+    main.TELEGRAM_API_BASE_URL = f"http://127.0.0.1:{stub.port}"
+
+    print(f"{USERS} users, 8 papers of {PAPER_BYTES // 1024} KiB")
+    print(f"{'run':>10} {'sent':>6} {'uploads':>8} {'cached':>7} {'sent KiB':>12} {'KiB per send':>12} {'seconds':>8}")
+    await run("cold", papers, stub)
+    await run("restarted", papers, stub)
+    await stub.stop()
+
+
+if __name__ == "__main__":
+    logging.getLogger("telegram").setLevel(logging.WARNING)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    asyncio.run(bench())
@@ -0,0 +1,214 @@
+"""End-to-end load test of the bot's handlers with a realistic traffic mix.
+
+Updates are built as real PTB Update objects and fed through
+Application.process_update, so handler routing, the keyboard cache, the
+search index, the user store and the catalog store are all exercised.
+Bot API calls go to an in-process stub, so no network is involved.
+
+The mix replays menu navigation (class -> subject -> year -> main menu),
+searches, language switches, admin catalog views and admin add_paper
+commands. Results (throughput, latency percentiles per kind, memory
+allocated per update) are written as JSON so runs can be compared:
+
+    python -m benchmarks.bench_handlers --catalog-size 10000 --users 5000
+    python -m benchmarks.bench_handlers --compare benchmarks/results/handlers-<commit>.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Dict, Iterator, List, Tuple
+
+from benchmarks.bot_env import use_temp_databases
+
+use_temp_databases()
+
+from telegram import Update  # noqa: E402
+
+import main  # noqa: E402
+from benchmarks.fake_telegram import FIRST_USER_ID, callback_update, message_update  # noqa: E402
+from benchmarks.stub_bot import StubRequest  # noqa: E402
+from benchmarks.synthetic import QUERIES, iter_papers, make_catalog, percentile  # noqa: E402
+
+# kind -> share of sessions
+TRAFFIC_MIX = {
+    "navigate": 0.60,
+    "search": 0.20,
+    "language": 0.10,
+    "admin_view": 0.05,
+    "add_paper": 0.05,
+}
+
+
+def sessions(papers: Dict[str, Dict[str, Dict[str, str]]], users: int, count: int, seed: int) -> Iterator[Tuple[str, List[dict]]]:
+    """Yield (kind, updates) sessions drawn from TRAFFIC_MIX"""
+    rng = random.Random(seed)
+    codec = main.CALLBACK_CODEC
+    kinds = list(TRAFFIC_MIX)
+    weights = [TRAFFIC_MIX[kind] for kind in kinds]
+    classes = list(papers)
+    update_id = 0
+    for _ in range(count):
+        kind = rng.choices(kinds, weights)[0]
+        user_id = FIRST_USER_ID + rng.randrange(users)
+        updates = []
+        if kind == "navigate":
+            class_num = rng.choice(classes)
+            subject = rng.choice(list(papers[class_num]))
+            year = rng.choice(list(papers[class_num][subject]))
+            for data in (codec.encode(main.OP_CLASS, (class_num,)),
+                         codec.encode(main.OP_SUBJECT, (class_num, subject)),
+                         codec.encode(main.OP_YEAR, (class_num, subject, year)),
+                         codec.encode(main.OP_MAIN_MENU)):
+                updates.append(callback_update(update_id, user_id, data))
+                update_id += 1
+        elif kind == "search":
+            updates.append(callback_update(update_id, user_id, codec.encode(main.OP_SEARCH)))
+            updates.append(message_update(update_id + 1, user_id, rng.choice(QUERIES)))
+            update_id += 2
+        elif kind == "language":
+            language = rng.choice(["en", "hi"])
+            updates.append(callback_update(update_id, user_id, codec.encode_literal(main.OP_LANG, language)))
+            update_id += 1
+        elif kind == "admin_view":
+            updates.append(callback_update(update_id, main.ADMIN_USER_ID, codec.encode(main.OP_ADMIN_VIEW)))
+            update_id += 1
+        elif kind == "add_paper":
+            class_num = rng.choice(classes)
+            text = f"/add_paper {class_num}|Mathematics|{rng.randrange(1950, 2030)}|class{class_num}/math/new.pdf"
+            updates.append(message_update(update_id, main.ADMIN_USER_ID, text))
+            update_id += 1
+        yield kind, updates
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    return {
+        "count": len(samples),
+        "mean_ms": sum(samples) / len(samples) * 1000,
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p90_ms": percentile(samples, 90) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000,
+    }
+
+
+async def run(args) -> dict:
+    rows = list(iter_papers(make_catalog(args.catalog_size)))
+    main.CATALOG_STORE.put_many(rows)
+    main.load_catalog()
+
+    application = main.build_application(request=StubRequest(record=False), rate_limiter=None, user_limiter=None)
+    plan = list(sessions(main.QUESTION_PAPERS, args.users, args.sessions, args.seed))
+    latencies: Dict[str, List[float]] = {kind: [] for kind in TRAFFIC_MIX}
+
+    async with application:
+        bot = application.bot
+        # Warm-up pass so first-use costs (keyboard builds, cache fills) don't dominate
+        for kind, updates in plan[:args.sessions // 10]:
+            for data in updates:
+                await application.process_update(Update.de_json(data, bot))
+
+        started = time.perf_counter()
+        total_updates = 0
+        for kind, updates in plan:
+            for data in updates:
+                update = Update.de_json(data, bot)
+                update_started = time.perf_counter()
+                await application.process_update(update)
+                latencies[kind].append(time.perf_counter() - update_started)
+                total_updates += 1
+        elapsed = time.perf_counter() - started
+
+        # Separate pass for memory, since tracing slows everything down
+        sample = [data for _, updates in plan[:args.alloc_sample] for data in updates]
+        tracemalloc.start()
+        allocated = 0
+        blocks_before = sys.getallocatedblocks()
+        for data in sample:
+            update = Update.de_json(data, bot)
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            await application.process_update(update)
+            _, peak = tracemalloc.get_traced_memory()
+            allocated += peak - before
+        retained_blocks = sys.getallocatedblocks() - blocks_before
+        tracemalloc.stop()
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {
+            "catalog_size": args.catalog_size, "users": args.users, "sessions": args.sessions, "seed": args.seed,
+        },
+        "throughput_updates_per_s": total_updates / elapsed,
+        "overall": summarize([latency for samples in latencies.values() for latency in samples]),
+        "by_kind": {kind: summarize(samples) for kind, samples in latencies.items() if samples},
+        "memory": {
+            "peak_bytes_per_update": allocated / max(1, len(sample)),
+            "retained_blocks_per_update": retained_blocks / max(1, len(sample)),
+        },
+    }
+
+
+def print_report(result: dict, baseline: dict = None):
+    def delta(path: List[str]) -> str:
+        if baseline is None:
+            return ""
+        old, new = baseline, result
+        for key in path:
+            old, new = old.get(key, {}), new.get(key, {})
+        if not isinstance(old, (int, float)) or not old:
+            return ""
+        return f" ({(new - old) / old * 100:+.1f}%)"
+
+    print(f"commit {result['commit']}  config {result['config']}")
+    print(f"throughput: {result['throughput_updates_per_s']:,.0f} updates/s{delta(['throughput_updates_per_s'])}")
+    print(f"{'kind':>12} {'count':>7} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9}")
+    for kind, stats in [("overall", result["overall"])] + list(result["by_kind"].items()):
+        path = ["overall"] if kind == "overall" else ["by_kind", kind]
+        print(f"{kind:>12} {stats['count']:>7} {stats['p50_ms']:>9.3f} {stats['p90_ms']:>9.3f} "
+              f"{stats['p99_ms']:>9.3f}{delta(path + ['p99_ms'])}")
+    memory = result["memory"]
+    print(f"memory: {memory['peak_bytes_per_update'] / 1024:.1f} KiB allocated (peak) per update"
+          f"{delta(['memory', 'peak_bytes_per_update'])}, "
+          f"{memory['retained_blocks_per_update']:.2f} blocks retained per update")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--catalog-size", type=int, default=10_000)
+    parser.add_argument("--users", type=int, default=5_000)
+    parser.add_argument("--sessions", type=int, default=5_000)
+    parser.add_argument("--alloc-sample", type=int, default=500, help="sessions traced for memory")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="result file (default: benchmarks/results/handlers-<commit>.json)")
+    parser.add_argument("--compare", help="earlier result file to show changes against")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    result = asyncio.run(run(args))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(result, baseline)
+
+    output = args.output or os.path.join("benchmarks", "results", f"handlers-{result['commit'] or 'local'}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    print(f"saved {output}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,93 @@
+"""Inline query handling while users type, with and without debouncing.
+
+Each simulated user types a query one character at a time, the way
+Telegram delivers inline queries, with KEYSTROKE seconds between
+keystrokes. The table shows how many queries reached the handler, how
+many of those ran a search (result cache misses), and how long after the
+last keystroke the final answer was sent.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_inline
+"""
+import asyncio
+import logging
+import random
+import time
+
+from benchmarks.bot_env import use_temp_databases
+
+use_temp_databases()
+
+from telegram import Update  # noqa: E402
+
+import main  # noqa: E402
+from benchmarks.fake_telegram import FIRST_USER_ID, inline_query_update  # noqa: E402
+from benchmarks.stub_bot import StubRequest  # noqa: E402
+from benchmarks.synthetic import QUERIES, iter_papers, make_catalog, percentile  # noqa: E402
+
+USERS = 200
+KEYSTROKE = 0.12  # seconds between keystrokes
+DEBOUNCE = [0.0, 0.3]
+
+
+class AnswerTimingRequest(StubRequest):
+    """Records when each inline query was answered"""
+
+    def __init__(self):
+        super().__init__(record=False)
+        self.answered = {}
+
+    async def do_request(self, url, method, request_data=None, *args, **kwargs):
+        result = await super().do_request(url, method, request_data, *args, **kwargs)
+        if url.endswith("/answerInlineQuery"):
+            self.answered[request_data.parameters["inline_query_id"]] = time.perf_counter()
+        return result
+
+
+async def type_query(application, user_id: int, text: str, sent: list, first_id: int):
+    for i in range(1, len(text) + 1):
+        update = Update.de_json(inline_query_update(first_id + i, user_id, text[:i]), application.bot)
+        await application.update_queue.put(update)
+        await asyncio.sleep(KEYSTROKE)
+    sent.append((user_id, str(first_id + len(text)), time.perf_counter() - KEYSTROKE))
+
+
+async def run(debounce: float):
+    main.INLINE_DEBOUNCE = debounce
+    main.INLINE_CACHE.clear()
+    main.INLINE_CACHE.hits = main.INLINE_CACHE.misses = 0
+    request = AnswerTimingRequest()
+    application = main.build_application(request=request, workers=16, rate_limiter=None)
+    rng = random.Random(3)
+    sent = []
+    texts = [rng.choice(QUERIES) for _ in range(USERS)]
+    async with application:
+        await application.start()
+        await asyncio.gather(*(
+            type_query(application, FIRST_USER_ID + user, text, sent, user * 100)
+            for user, text in enumerate(texts)
+        ))
+        while application.update_queue.in_flight:
+            await asyncio.sleep(0.01)
+        await application.stop()
+
+    answered = request.answered
+    delays = [(answered[query_id] - last_keystroke) * 1000 for _, query_id, last_keystroke in sent if query_id in answered]
+    typed = sum(len(text) for text in texts)
+    print(f"{debounce:>9.1f} {typed:>8} {main.UPDATE_PROCESSOR.processed:>8} {main.INLINE_CACHE.misses:>8} "
+          f"{len(delays):>6}/{USERS} {percentile(delays, 50):>8.0f} {percentile(delays, 99):>8.0f}")
+
+
+async def bench():
+    main.CATALOG_STORE.put_many(list(iter_papers(make_catalog(20_000))))
+    main.load_catalog()
+    print(f"{USERS} users typing, {KEYSTROKE * 1000:.0f} ms between keystrokes, 20k papers")
+    print(f"{'debounce':>9} {'queries':>8} {'handled':>8} {'searches':>8} {'final':>10} {'p50 ms':>8} {'p99 ms':>8}")
+    for debounce in DEBOUNCE:
+        await run(debounce)
+
+
+if __name__ == "__main__":
+    logging.getLogger("telegram").setLevel(logging.WARNING)
+    asyncio.run(bench())
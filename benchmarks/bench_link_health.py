@@ -0,0 +1,69 @@
+"""Background download link checks against a local stand-in file host.
+
+Checks a catalog's worth of URLs at several concurrency levels, then
+re-checks them to show that unchanged files come back as 304s. A few
+files are missing (404) and some hosts refuse HEAD (405, falls back to
+GET).
+
+Run from the repository root:
+
+    python -m benchmarks.bench_link_health
+"""
+import asyncio
+import time
+
+from benchmarks.stub_file_server import StubFileServer
+from link_health import LinkHealth
+
+URLS = 1000
+LATENCY = 0.02  # per request, like a CDN edge
+CONCURRENCY = [1, 16, 64]
+
+
+def make_files():
+    files = {f"/papers/{i}.pdf": (100_000 + i * 37, f'"etag-{i}"') for i in range(URLS)}
+    missing = {f"/papers/{i}.pdf" for i in range(0, URLS, 50)}
+    no_head = {f"/papers/{i}.pdf" for i in range(7, URLS, 100)}
+    for path in missing:
+        del files[path]
+    return files, missing, no_head
+
+
+async def run(concurrency: int):
+    files, missing, no_head = make_files()
+    server = StubFileServer(files, no_head, latency=LATENCY)
+    await server.start()
+    base = f"http://127.0.0.1:{server.port}"
+    urls = [f"{base}/papers/{i}.pdf" for i in range(URLS)]
+
+    health = LinkHealth(ttl=0, concurrency=concurrency, batch_size=URLS)
+    health.watch(urls)
+    started = time.perf_counter()
+    await health.check_many(health.due())
+    first = time.perf_counter() - started
+
+    started = time.perf_counter()
+    await health.check_many(health.due())
+    second = time.perf_counter() - started
+
+    correct = all(
+        (health.get(url).status == 404) == (url[len(base):] in missing)
+        and (health.get(url).ok is False or health.get(url).size == files[url[len(base):]][0])
+        for url in urls
+    )
+    not_modified = server.requests.get(("HEAD", 304), 0) + server.requests.get(("GET", 304), 0)
+    await health.close()
+    await server.stop()
+    print(f"{concurrency:>11} {URLS / first:>12,.0f} {URLS / second:>12,.0f} {not_modified:>8} "
+          f"{health.broken:>7} {'yes' if correct else 'NO':>8}")
+
+
+async def main():
+    print(f"{URLS} URLs, {LATENCY * 1000:.0f} ms per request")
+    print(f"{'concurrency':>11} {'first url/s':>12} {'recheck/s':>12} {'304s':>8} {'broken':>7} {'correct':>8}")
+    for concurrency in CONCURRENCY:
+        await run(concurrency)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,45 @@
+"""Message lookup cost: main.get_language_message against the old per-call lookup.
+
+The old get_language_message indexed MESSAGES, fell back to English with
+a second lookup, and called str.format whenever kwargs were given.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_localization
+"""
+import timeit
+
+from benchmarks.bot_env import use_temp_databases
+
+use_temp_databases()
+
+import main  # noqa: E402
+from localization import Translations  # noqa: E402
+
+MESSAGES = main.MESSAGES
+NUMBER = 200_000
+
+
+def legacy_message(lang: str, key: str, **kwargs) -> str:
+    message = MESSAGES[lang].get(key, MESSAGES['en'][key])
+    return message.format(**kwargs) if kwargs else message
+
+
+def bench():
+    cases = [
+        ("static label", lambda get: get("hi", "main_menu")),
+        ("template", lambda get: get("hi", "choose_subject", class_num="10")),
+        ("4 placeholders", lambda get: get("en", "download_link", subject="Mathematics", class_num="10",
+                                            year="2023", url="https://example.org/a.pdf")),
+    ]
+    print(f"{'message':>15} {'legacy ns':>10} {'compiled ns':>12}")
+    for label, call in cases:
+        legacy = timeit.timeit(lambda: call(legacy_message), number=NUMBER) / NUMBER * 1e9
+        compiled = timeit.timeit(lambda: call(main.get_language_message), number=NUMBER) / NUMBER * 1e9
+        print(f"{label:>15} {legacy:>10.0f} {compiled:>12.0f}")
+    startup = timeit.timeit(lambda: Translations(MESSAGES, "en"), number=200) / 200 * 1e6
+    print(f"compiling {len(MESSAGES)} languages: {startup:.0f} us")
+
+
+if __name__ == "__main__":
+    bench()
@@ -0,0 +1,148 @@
+"""Update throughput with several worker processes sharing one SQLite state file.
+
+Each worker is a separate process running the full bot (catalog, search
+index, user store, handlers) against an in-process Bot API stub, with
+SHARED_STATE_URL pointing at a common SQLite file. Every worker replays
+the same number of sessions from the bench_handlers traffic mix, including
+admin add_paper commands and language changes that the other workers have
+to pick up. Throughput should grow with the number of processes until
+they run out of CPU cores.
+
+After the timed run, worker 0 adds one more paper and the others report
+how long it took to appear in their catalog. They also report their
+catalog size, which must be the same everywhere.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_multiprocess --processes 1 2 4
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.synthetic import iter_papers, make_catalog
+from catalog_store import CatalogStore
+
+PROPAGATION_PAPER = ("99", "Propagation", "2099", "class99/propagation/2099.pdf")
+
+
+async def run_worker(index: int, sessions_per_worker: int, users: int, start, results):
+    from telegram import Update
+
+    import main
+    from benchmarks.bench_handlers import sessions
+    from benchmarks.stub_bot import StubRequest
+
+    logging.getLogger().setLevel(logging.WARNING)
+    main.load_catalog()
+    application = main.build_application(request=StubRequest(record=False), rate_limiter=None, user_limiter=None)
+    plan = list(sessions(main.QUESTION_PAPERS, users, sessions_per_worker, seed=index))
+    updates = [data for _, session in plan for data in session]
+
+    async with application:
+        bot = application.bot
+        follower = asyncio.create_task(main.follow_shared_changes())
+        for data in updates[:len(updates) // 10]:
+            await application.process_update(Update.de_json(data, bot))
+
+        start.wait()
+        started = time.perf_counter()
+        for data in updates:
+            await application.process_update(Update.de_json(data, bot))
+        elapsed = time.perf_counter() - started
+
+        start.wait()
+        class_num, subject, year, _ = PROPAGATION_PAPER
+        published_at = seen_at = None
+        if index == 0:
+            await main.apply_papers([PROPAGATION_PAPER])
+            published_at = time.time()
+        deadline = time.monotonic() + 10
+        while year not in main.QUESTION_PAPERS.get(class_num, {}).get(subject, {}) and time.monotonic() < deadline:
+            await asyncio.sleep(0.002)
+        if index != 0 and year in main.QUESTION_PAPERS.get(class_num, {}).get(subject, {}):
+            seen_at = time.time()
+        # Let every worker catch up before catalog sizes are compared
+        start.wait()
+        await asyncio.sleep(main.SHARED_SYNC_INTERVAL * 2)
+        follower.cancel()
+
+    results.put({
+        "index": index,
+        "updates": len(updates),
+        "elapsed": elapsed,
+        "papers": sum(len(years) for subjects in main.QUESTION_PAPERS.values() for years in subjects.values()),
+        "published_at": published_at,
+        "seen_at": seen_at,
+    })
+    main.USER_STORE.close()
+
+
+def worker(index: int, state_dir: str, sessions_per_worker: int, users: int, start, results):
+    # Configuration is read when main is imported, so it is set before the import
+    os.environ["CATALOG_DB_PATH"] = os.path.join(state_dir, "catalog.db")
+    os.environ["USER_DB_PATH"] = os.path.join(state_dir, "users.db")
+    os.environ["SHARED_STATE_URL"] = f"sqlite:///{os.path.join(state_dir, 'shared.db')}"
+    os.environ["SHARED_SYNC_INTERVAL"] = "0.05"
+    os.environ["LINK_CHECK_INTERVAL"] = "0"
+    sys.stdout = open(os.devnull, "w")  # startup banners from every worker
+    asyncio.run(run_worker(index, sessions_per_worker, users, start, results))
+
+
+def run_level(processes: int, args) -> dict:
+    state_dir = tempfile.mkdtemp()
+    CatalogStore(os.path.join(state_dir, "catalog.db")).put_many(iter_papers(make_catalog(args.catalog_size)))
+
+    context = multiprocessing.get_context("spawn")
+    start = context.Barrier(processes)
+    results = context.Queue()
+    workers = [
+        context.Process(target=worker, args=(index, state_dir, args.sessions, args.users, start, results))
+        for index in range(processes)
+    ]
+    for process in workers:
+        process.start()
+    reports = [results.get() for _ in workers]
+    for process in workers:
+        process.join()
+
+    updates = sum(report["updates"] for report in reports)
+    published_at = next(report["published_at"] for report in reports if report["index"] == 0)
+    lags = [report["seen_at"] - published_at for report in reports if report["seen_at"] is not None]
+    return {
+        "processes": processes,
+        "updates": updates,
+        "throughput": updates / max(report["elapsed"] for report in reports),
+        "propagation_ms": max(lags) * 1000 if lags else 0.0,
+        "propagated": len(lags) == processes - 1,
+        "consistent": len({report["papers"] for report in reports}) == 1,
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--catalog-size", type=int, default=2_000)
+    parser.add_argument("--users", type=int, default=2_000)
+    parser.add_argument("--sessions", type=int, default=1_000, help="sessions replayed by each worker")
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPU cores; {args.sessions} sessions per worker, catalog of {args.catalog_size} papers")
+    print(f"{'processes':>9} {'updates':>8} {'updates/s':>10} {'scaling':>8} {'propagation ms':>15} {'consistent':>11}")
+    single = None
+    for processes in args.processes:
+        result = run_level(processes, args)
+        single = single or result["throughput"] / processes
+        print(f"{processes:>9} {result['updates']:>8} {result['throughput']:>10,.0f} "
+              f"{result['throughput'] / single / processes:>8.0%} "
+              f"{result['propagation_ms'] if result['propagated'] else float('nan'):>15.1f} "
+              f"{'yes' if result['consistent'] else 'NO':>11}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,82 @@
+"""Popularity-ordered menus and trending shortcuts on a skewed download pattern.
+
+Users ask for papers with Zipf-distributed popularity, and popularity is
+refreshed every REFRESH_EVERY downloads as the bot's background task
+would. Reaching a paper from the main menu takes three taps (class,
+subject, year), or one when it is among the trending shortcuts. The table
+compares taps per paper and the position of the wanted subject in its
+menu, without and with popularity ordering, and shows what record and
+refresh cost.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_popularity
+"""
+import random
+import time
+import timeit
+
+from benchmarks.synthetic import iter_papers, make_catalog
+from popularity import Popularity
+
+CATALOG_SIZE = 10_000
+DOWNLOADS = 200_000
+REFRESH_EVERY = 500
+ZIPF_EXPONENTS = [0.8, 1.0, 1.2]
+
+
+def simulate(papers, exponent: float, trending_size: int = 3, seed: int = 5) -> dict:
+    rng = random.Random(seed)
+    keys = [(class_num, subject, year) for class_num, subject, year, _ in iter_papers(papers)]
+    rng.shuffle(keys)
+    weights = [1 / (rank + 1) ** exponent for rank in range(len(keys))]
+    wanted = rng.choices(keys, weights, k=DOWNLOADS)
+
+    popularity = Popularity(trending_size=trending_size)
+    taps = 0
+    trending_hits = 0
+    old_positions = 0
+    new_positions = 0
+    for i, (class_num, subject, year) in enumerate(wanted):
+        if i % REFRESH_EVERY == 0:
+            popularity.refresh(papers)
+            trending = set(popularity.trending)
+        if (class_num, subject, year) in trending:
+            taps += 1
+            trending_hits += 1
+        else:
+            taps += 3
+            subjects = papers[class_num]
+            old_positions += list(subjects).index(subject)
+            new_positions += popularity.subjects(class_num, subjects).index(subject)
+        popularity.record(class_num, subject, year)
+    menu_visits = DOWNLOADS - trending_hits
+    return {
+        "taps": taps / DOWNLOADS,
+        "trending": trending_hits / DOWNLOADS,
+        "old_position": old_positions / max(1, menu_visits),
+        "new_position": new_positions / max(1, menu_visits),
+    }
+
+
+def bench():
+    papers = make_catalog(CATALOG_SIZE)
+    print(f"{CATALOG_SIZE} papers, {DOWNLOADS} downloads, refresh every {REFRESH_EVERY}")
+    print(f"{'zipf s':>7} {'taps/paper':>11} {'via trending':>13} {'subject pos (catalog order)':>28} "
+          f"{'subject pos (popular)':>22}")
+    for exponent in ZIPF_EXPONENTS:
+        result = simulate(papers, exponent)
+        print(f"{exponent:>7} {3:>5} -> {result['taps']:<4.2f} {result['trending']:>13.1%} "
+              f"{result['old_position']:>28.2f} {result['new_position']:>22.2f}")
+
+    popularity = Popularity()
+    number = 200_000
+    record_ns = timeit.timeit(lambda: popularity.record("10", "Mathematics", "2023"), number=number) / number * 1e9
+    started = time.perf_counter()
+    popularity.refresh(papers)
+    refresh_ms = (time.perf_counter() - started) * 1000
+    print(f"record: {record_ns:.0f} ns per download; refresh: {refresh_ms:.2f} ms for {CATALOG_SIZE} papers")
+
+
+if __name__ == "__main__":
+    bench()
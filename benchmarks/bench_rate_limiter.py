@@ -0,0 +1,84 @@
+"""Outbound rate limiting against a local stub Bot API server that returns 429s like Telegram.
+
+A burst of button presses from many users is replayed twice: without the
+outbound limiter (Telegram answers with 429s and handlers fail) and with
+it (calls are spread out, callback answers go first).
+
+Run from the repository root:
+
+    python -m benchmarks.bench_rate_limiter
+"""
+import asyncio
+import logging
+import time
+
+from benchmarks.bot_env import use_temp_databases
+
+use_temp_databases()
+
+from telegram import Update  # noqa: E402
+
+import main  # noqa: E402
+from benchmarks.fake_telegram import FIRST_USER_ID, callback_update  # noqa: E402
+from benchmarks.stub_api_server import StubBotApi  # noqa: E402
+from benchmarks.synthetic import percentile  # noqa: E402
+from rate_limiter import OutboundRateLimiter  # noqa: E402
+
+USERS = 40
+PRESSES = [
+    (main.OP_CLASS, ("10",)),
+    (main.OP_SUBJECT, ("10", "Mathematics")),
+    (main.OP_YEAR, ("10", "Mathematics", "2023")),
+]
+
+
+async def run(label: str, rate_limiter):
+    stub = StubBotApi(main.BOT_TOKEN)
+    await stub.start("127.0.0.1", 0)
+    main.TELEGRAM_API_BASE_URL = f"http://127.0.0.1:{stub.port}"
+    application = main.build_application(workers=32, rate_limiter=rate_limiter, user_limiter=None)
+    application.add_error_handler(lambda update, context: asyncio.sleep(0))  # 429s surface here
+
+    max_depth = 0
+    async with application:
+        await application.start()
+        stub.calls.clear()
+        started = time.perf_counter()
+        for user in range(USERS):
+            for step, (opcode, path) in enumerate(PRESSES):
+                data = main.CALLBACK_CODEC.encode(opcode, path)
+                update = callback_update(user * len(PRESSES) + step, FIRST_USER_ID + user, data)
+                await application.update_queue.put(Update.de_json(update, application.bot))
+        while application.update_queue.in_flight:
+            if rate_limiter is not None:
+                max_depth = max(max_depth, rate_limiter.queue_depth)
+            await asyncio.sleep(0.01)
+        elapsed = time.perf_counter() - started
+        await application.stop()
+    await stub.stop()
+
+    rejected = sum(1 for _, _, _, status in stub.calls if status == 429)
+    answers = [(t - started) * 1000 for t, method, _, status in stub.calls if method == "answerCallbackQuery" and status == 200]
+    edits = [(t - started) * 1000 for t, method, _, status in stub.calls if method == "editMessageText" and status == 200]
+    print(f"\n{label}")
+    print(f"  wall time: {elapsed:.2f} s, 429 responses: {rejected}")
+    print(f"  delivered: {len(answers)}/{USERS * len(PRESSES)} callback answers, {len(edits)}/{USERS * len(PRESSES)} edits")
+    if answers:
+        print(f"  callback answer after p50 {percentile(answers, 50):.0f} ms / p99 {percentile(answers, 99):.0f} ms")
+    if edits:
+        print(f"  message edit after    p50 {percentile(edits, 50):.0f} ms / p99 {percentile(edits, 99):.0f} ms")
+    if rate_limiter is not None:
+        print(f"  limiter: max queue depth {max_depth}, throttled {rate_limiter.throttled_seconds:.1f} s total, "
+              f"{rate_limiter.retries} retries")
+
+
+async def bench():
+    logging.getLogger("telegram").setLevel(logging.CRITICAL)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    main.load_catalog()
+    await run("without outbound limiter", None)
+    await run("with OutboundRateLimiter", OutboundRateLimiter())
+
+
+if __name__ == "__main__":
+    asyncio.run(bench())
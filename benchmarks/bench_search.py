@@ -0,0 +1,36 @@
+"""Query latency of the search index at several catalog sizes.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_search
+"""
+import time
+
+from benchmarks.synthetic import QUERIES, make_catalog, percentile
+from search_index import SearchIndex
+
+SIZES = [100, 10_000, 100_000]
+ROUNDS = 200
+
+
+def main():
+    print(f"{'papers':>8} {'build ms':>10} {'p50 us':>10} {'p99 us':>10}")
+    for size in SIZES:
+        catalog = make_catalog(size)
+        index = SearchIndex()
+        started = time.perf_counter()
+        index.build(catalog)
+        build_ms = (time.perf_counter() - started) * 1000
+
+        samples = []
+        for _ in range(ROUNDS):
+            for query in QUERIES:
+                started = time.perf_counter()
+                index.search(query, limit=10)
+                samples.append((time.perf_counter() - started) * 1_000_000)
+
+        print(f"{size:>8} {build_ms:>10.1f} {percentile(samples, 50):>10.1f} {percentile(samples, 99):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Per-user rate limiting of incoming updates under a flood from one user.
+
+One user hammers two buttons (with double taps) while USERS ordinary
+users each walk through the menu once, against a stub Bot API with a
+fixed latency. The flood fills the bounded update queue, so without a
+per-user limit everyone else waits behind it. The table shows the Bot API
+calls made, the updates dropped and when the last ordinary user got their
+last answer, without and with the limiter. It is followed by the cost of
+a check and the memory held per tracked user.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_user_limiter
+"""
+import asyncio
+import itertools
+import logging
+import time
+import timeit
+import tracemalloc
+
+from benchmarks.bot_env import use_temp_databases
+
+use_temp_databases()
+
+from telegram import Update  # noqa: E402
+
+import main  # noqa: E402
+from benchmarks.fake_telegram import FIRST_USER_ID, callback_update  # noqa: E402
+from benchmarks.stub_bot import StubRequest  # noqa: E402
+from rate_limiter import UserRateLimiter  # noqa: E402
+
+USERS = 50
+FLOOD = 1_000
+API_LATENCY = 0.01
+SPAMMER_ID = FIRST_USER_ID - 1
+TRACKED_USERS = 100_000
+
+
+class TimedStubRequest(StubRequest):
+    """StubRequest that also records when each chat last got an answer"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.last_answer = {}
+
+    async def do_request(self, url: str, method: str, request_data=None, *args, **kwargs):
+        result = await super().do_request(url, method, request_data, *args, **kwargs)
+        if request_data is not None and "chat_id" in request_data.parameters:
+            self.last_answer[request_data.parameters["chat_id"]] = time.perf_counter()
+        return result
+
+
+def updates(bot):
+    codec = main.CALLBACK_CODEC
+    spam = [codec.encode(main.OP_CLASS, ("10",)), codec.encode(main.OP_CLASS, ("9",))]
+    menu = [
+        codec.encode(main.OP_CLASS, ("10",)),
+        codec.encode(main.OP_SUBJECT, ("10", "Mathematics")),
+        codec.encode(main.OP_YEAR, ("10", "Mathematics", "2023")),
+    ]
+    # Spam presses come in double taps; ordinary presses are spread through the flood
+    ordinary = [(user, data) for data in menu for user in range(USERS)]
+    every = FLOOD // len(ordinary)
+    result = []
+    for i in range(FLOOD):
+        result.append(callback_update(len(result), SPAMMER_ID, spam[i // 2 % 2]))
+        if i % every == 0 and ordinary:
+            user, data = ordinary.pop(0)
+            result.append(callback_update(len(result), FIRST_USER_ID + user, data))
+    return [Update.de_json(update, bot) for update in result]
+
+
+async def run(label: str, user_limiter):
+    request = TimedStubRequest(latency=API_LATENCY)
+    application = main.build_application(request=request, rate_limiter=None, user_limiter=user_limiter)
+    async with application:
+        await application.start()
+        batch = updates(application.bot)
+        started = time.perf_counter()
+        for update in batch:
+            await application.update_queue.put(update)
+        await application.update_queue.join()
+        await application.stop()
+
+    ordinary_done = max(request.last_answer[FIRST_USER_ID + user] for user in range(USERS)) - started
+    spammer_calls = sum(1 for _, chat_id, _ in request.calls if chat_id == SPAMMER_ID)
+    dropped = (user_limiter.duplicates, user_limiter.throttled, user_limiter.dropped_banned) if user_limiter else (0, 0, 0)
+    print(f"{label:<16} {len(request.calls):>9} {spammer_calls:>13} {dropped[0]:>10} {dropped[1]:>10} "
+          f"{dropped[2]:>8} {ordinary_done:>18.2f}")
+
+
+def bench_check():
+    limiter = UserRateLimiter(rate=1e9, burst=10)
+    users = list(range(FIRST_USER_ID, FIRST_USER_ID + TRACKED_USERS))
+    number = 500_000
+    next_user = itertools.cycle(users).__next__
+    allowed = timeit.timeit(lambda: limiter.check(next_user()), number=number)
+
+    flooded = UserRateLimiter(ban_after=10 ** 9)
+    throttled = timeit.timeit(lambda: flooded.check(1), number=number)
+    duplicate = timeit.timeit(lambda: flooded.check(2, "same"), number=number)
+    print(f"check: {allowed / number * 1e9:.0f} ns allowed, {throttled / number * 1e9:.0f} ns throttled, "
+          f"{duplicate / number * 1e9:.0f} ns double tap")
+
+    tracemalloc.start()
+    limiter = UserRateLimiter()
+    before = tracemalloc.get_traced_memory()[0]
+    for user in users:
+        limiter.check(user, "button")
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    print(f"state: {size / TRACKED_USERS:.0f} bytes per tracked user ({TRACKED_USERS:,} users)")
+
+
+async def bench():
+    logging.getLogger("telegram").setLevel(logging.WARNING)
+    logging.getLogger("rate_limiter").setLevel(logging.ERROR)
+    main.load_catalog()
+    print(f"1 user sending {FLOOD} presses, {USERS} users pressing 3 buttons each, "
+          f"{API_LATENCY * 1000:.0f} ms per Bot API call")
+    print(f"{'':<16} {'API calls':>9} {'spammer edits':>13} {'double tap':>10} {'throttled':>10} "
+          f"{'banned':>8} {'others done at (s)':>18}")
+    await run("no limit", None)
+    await run("UserRateLimiter", UserRateLimiter())
+    bench_check()
+
+
+if __name__ == "__main__":
+    asyncio.run(bench())
@@ -0,0 +1,76 @@
+"""Memory per million users and get/set latency of the user store.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_user_store
+"""
+import gc
+import os
+import tempfile
+import time
+import tracemalloc
+
+from user_store import UserStore
+
+USERS = 1_000_000
+FIRST_USER_ID = 6_000_000_000  # realistic Telegram ids are larger than the small int cache
+
+
+def measure(fill) -> float:
+    gc.collect()
+    tracemalloc.start()
+    container = fill()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del container
+    return current / (1024 * 1024)
+
+
+def fill_nested_dict():
+    user_data = {}
+    for user_id in range(FIRST_USER_ID, FIRST_USER_ID + USERS):
+        user_data[user_id] = {'language': 'hi' if user_id % 3 == 0 else 'en'}
+    return user_data
+
+
+def fill_user_store(path):
+    def fill():
+        store = UserStore(path, ["en", "hi"], max_bytes=1 << 40, flush_batch_size=USERS + 1)
+        for user_id in range(FIRST_USER_ID, FIRST_USER_ID + USERS):
+            store._remember(user_id, 1 if user_id % 3 == 0 else 0)
+        return store
+    return fill
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "users.db")
+        print(f"memory per {USERS:,} users")
+        print(f"  nested dict (old user_data): {measure(fill_nested_dict):7.1f} MiB")
+        print(f"  UserStore cache:             {measure(fill_user_store(path)):7.1f} MiB")
+
+        store = UserStore(path, ["en", "hi"], max_bytes=100_000 * 128)
+        started = time.perf_counter()
+        for user_id in range(FIRST_USER_ID, FIRST_USER_ID + 200_000):
+            store.set_language(user_id, "hi")
+        set_us = (time.perf_counter() - started) / 200_000 * 1_000_000
+        store.flush()
+
+        started = time.perf_counter()
+        for user_id in range(FIRST_USER_ID + 100_000, FIRST_USER_ID + 200_000):
+            store.get_language(user_id)
+        hit_us = (time.perf_counter() - started) / 100_000 * 1_000_000
+
+        started = time.perf_counter()
+        for user_id in range(FIRST_USER_ID, FIRST_USER_ID + 10_000):
+            store.get_language(user_id)
+        miss_us = (time.perf_counter() - started) / 10_000 * 1_000_000
+        store.close()
+
+    print(f"set (incl. batched flushes): {set_us:.2f} us")
+    print(f"get, cached:                 {hit_us:.2f} us")
+    print(f"get, evicted (read from disk): {miss_us:.2f} us")
+
+
+if __name__ == "__main__":
+    main()
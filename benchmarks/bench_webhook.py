@@ -0,0 +1,62 @@
+"""Throughput and latency of webhook delivery using a local fake Telegram sender.
+
+Telegram delivers updates over up to `max_connections` parallel keep-alive
+connections; this opens the same number of connections against the
+webhook server and measures how quickly updates reach the update queue.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_webhook
+"""
+import asyncio
+import time
+
+from telegram import Update
+
+from benchmarks.fake_telegram import FIRST_USER_ID, callback_update, send_updates
+from benchmarks.synthetic import percentile
+from webhook_server import WebhookServer
+
+CONNECTIONS = [1, 10, 40]
+UPDATES_PER_CONNECTION = 500
+PATH = "/telegram"
+SECRET = "benchmark-secret"
+
+
+async def run(connections: int):
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def handle_update(data: dict):
+        await queue.put(Update.de_json(data, None))
+
+    server = WebhookServer(handle_update, PATH, SECRET)
+    await server.start("127.0.0.1", 0)
+
+    async def drain():
+        while True:
+            await queue.get()
+
+    consumer = asyncio.create_task(drain())
+    batches = [
+        [callback_update(c * UPDATES_PER_CONNECTION + i, FIRST_USER_ID + c, "class_10") for i in range(UPDATES_PER_CONNECTION)]
+        for c in range(connections)
+    ]
+    started = time.perf_counter()
+    results = await asyncio.gather(*(send_updates("127.0.0.1", server.port, PATH, batch, SECRET) for batch in batches))
+    elapsed = time.perf_counter() - started
+    consumer.cancel()
+    await server.stop()
+
+    latencies = [latency * 1000 for batch in results for latency in batch]
+    total = connections * UPDATES_PER_CONNECTION
+    print(f"{connections:>11} {total / elapsed:>12,.0f} {percentile(latencies, 50):>8.2f} {percentile(latencies, 99):>8.2f}")
+
+
+async def main():
+    print(f"{'connections':>11} {'updates/s':>12} {'p50 ms':>8} {'p99 ms':>8}")
+    for connections in CONNECTIONS:
+        await run(connections)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,17 @@
+"""Environment for benchmarks that import main"""
+import os
+import tempfile
+
+
+def use_temp_databases() -> str:
+    """Point the catalog, user and analytics databases at a fresh temporary directory.
+
+    Call it before importing main, which opens the databases named by the
+    environment at import time. Paths already set in the environment are
+    kept. Returns the directory.
+    """
+    path = tempfile.mkdtemp()
+    os.environ.setdefault("CATALOG_DB_PATH", os.path.join(path, "catalog.db"))
+    os.environ.setdefault("USER_DB_PATH", os.path.join(path, "users.db"))
+    os.environ.setdefault("ANALYTICS_DB_PATH", os.path.join(path, "analytics.db"))
+    return path
@@ -0,0 +1,82 @@
+"""Fake Telegram senders and update payloads for offline load tests"""
+import asyncio
+import json
+import time
+from typing import List, Optional
+
+FIRST_USER_ID = 6_000_000_000
+
+
+def message_update(update_id: int, user_id: int, text: str) -> dict:
+    user = {"id": user_id, "is_bot": False, "first_name": "Test", "username": f"user{user_id}"}
+    message = {
+        "message_id": update_id,
+        "date": int(time.time()),
+        "chat": {"id": user_id, "type": "private"},
+        "from": user,
+        "text": text,
+    }
+    if text.startswith("/"):
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+    return {"update_id": update_id, "message": message}
+
+
+def callback_update(update_id: int, user_id: int, data: str) -> dict:
+    user = {"id": user_id, "is_bot": False, "first_name": "Test", "username": f"user{user_id}"}
+    return {
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id),
+            "from": user,
+            "chat_instance": str(user_id),
+            "data": data,
+            "message": {
+                "message_id": 1,
+                "date": int(time.time()),
+                "chat": {"id": user_id, "type": "private"},
+                "text": "menu",
+            },
+        },
+    }
+
+
+def inline_query_update(update_id: int, user_id: int, query: str) -> dict:
+    user = {"id": user_id, "is_bot": False, "first_name": "Test", "username": f"user{user_id}"}
+    return {
+        "update_id": update_id,
+        "inline_query": {"id": str(update_id), "from": user, "query": query, "offset": ""},
+    }
+
+
+async def send_updates(host: str, port: int, path: str, updates: List[dict],
+                       secret_token: Optional[str] = None) -> List[float]:
+    """POST updates one after another over a single keep-alive connection, returning latencies in seconds"""
+    reader, writer = await asyncio.open_connection(host, port)
+    secret_header = f"X-Telegram-Bot-Api-Secret-Token: {secret_token}\r\n" if secret_token else ""
+    latencies = []
+    try:
+        for update in updates:
+            body = json.dumps(update).encode("utf-8")
+            request = (
+                f"POST {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                f"{secret_header}Content-Length: {len(body)}\r\n\r\n"
+            ).encode("latin-1") + body
+            started = time.perf_counter()
+            writer.write(request)
+            await writer.drain()
+            
+            status_line = await reader.readline()
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b""):
+                    break
+                if line.lower().startswith(b"content-length:"):
+                    length = int(line.split(b":", 1)[1])
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - started)
+            if b" 200 " not in status_line:
+                raise RuntimeError(f"webhook rejected update: {status_line!r}")
+    finally:
+        writer.close()
+    return latencies
@@ -0,0 +1,82 @@
+"""A local HTTP stand-in for the Telegram Bot API that enforces flood limits"""
+import hashlib
+import time
+from typing import Dict, List, Tuple
+from urllib.parse import parse_qs
+
+from rate_limiter import TokenBucket
+from webhook_server import HttpServer, Response, json_response
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "Stub", "username": "stub_bot"}
+METHODS = ["getMe", "answerCallbackQuery", "editMessageText", "sendMessage", "sendDocument", "answerInlineQuery",
+           "deleteWebhook", "setWebhook"]
+
+
+class StubBotApi(HttpServer):
+    """Answers Bot API calls for one token, returning 429 like Telegram when limits are exceeded.
+
+    `calls` records (arrival time, method, chat id, status) for every request,
+    and `received_bytes` the size of every request body. sendDocument
+    answers with a file_id, whether the document was uploaded or passed by
+    URL or file_id.
+    """
+
+    def __init__(self, token: str, global_rate: float = 30, per_chat_rate: float = 1, per_chat_burst: float = 4):
+        super().__init__()
+        self.per_chat_rate = per_chat_rate
+        self.per_chat_burst = per_chat_burst
+        self._global = TokenBucket(global_rate, global_rate)
+        self._chats: Dict[str, TokenBucket] = {}
+        self.calls: List[Tuple[float, str, str, int]] = []
+        self.received_bytes = 0
+        for method in METHODS:
+            self.add_route("POST", f"/bot{token}/{method}", self._handler(method))
+
+    def _handler(self, method: str):
+        async def handle(headers: Dict[str, str], body: bytes) -> Response:
+            self.received_bytes += len(body)
+            if headers.get("content-type", "").startswith("multipart/form-data"):
+                params = _multipart_fields(headers["content-type"], body)
+            else:
+                params = {key: values[0] for key, values in parse_qs(body.decode("utf-8")).items()}
+            chat_id = params.get("chat_id", "")
+            response = self._answer(method, params, chat_id)
+            self.calls.append((time.perf_counter(), method, chat_id, response[0]))
+            return response
+        return handle
+
+    def _answer(self, method: str, params: Dict[str, str], chat_id: str) -> Response:
+        if method in ("getMe", "setWebhook", "deleteWebhook"):
+            return json_response({"ok": True, "result": BOT_USER if method == "getMe" else True})
+        
+        limited = self._global.try_take() > 0
+        if not limited and chat_id and method != "answerCallbackQuery":
+            bucket = self._chats.setdefault(chat_id, TokenBucket(self.per_chat_rate, self.per_chat_burst))
+            limited = bucket.try_take() > 0
+        if limited:
+            return json_response({
+                "ok": False, "error_code": 429, "description": "Too Many Requests: retry after 1",
+                "parameters": {"retry_after": 1}
+            }, 429)
+        
+        if method in ("sendMessage", "sendDocument"):
+            result = {"message_id": 1, "date": int(time.time()), "chat": {"id": int(chat_id), "type": "private"},
+                      "text": params.get("text", "")}
+            if method == "sendDocument":
+                document = params.get("document", "")
+                file_id = document if document.startswith("file-") else "file-" + hashlib.sha1(document.encode()).hexdigest()
+                result["document"] = {"file_id": file_id, "file_unique_id": file_id[-16:]}
+        else:
+            result = True
+        return json_response({"ok": True, "result": result})
+
+
+def _multipart_fields(content_type: str, body: bytes) -> Dict[str, str]:
+    """Form fields of a multipart body; file parts are represented by a hash of their content"""
+    boundary = content_type.split("boundary=", 1)[1].strip('"').encode()
+    fields = {}
+    for part in body.split(b"--" + boundary)[1:-1]:
+        head, _, value = part.strip(b"\r\n").partition(b"\r\n\r\n")
+        name = head.split(b'name="', 1)[1].split(b'"', 1)[0].decode()
+        fields[name] = hashlib.sha1(value).hexdigest() if b"filename=" in head else value.decode("utf-8")
+    return fields
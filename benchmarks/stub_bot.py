@@ -0,0 +1,62 @@
+"""A Bot API stand-in: a PTB request object that answers every call locally"""
+import asyncio
+import json
+import random
+import time
+from typing import Dict, List, Optional, Tuple
+
+from telegram.request import BaseRequest, RequestData
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "Stub", "username": "stub_bot"}
+
+
+def _message_result(params: Dict) -> Dict:
+    chat_id = params.get("chat_id", 1)
+    return {
+        "message_id": 1,
+        "date": int(time.time()),
+        "chat": {"id": chat_id, "type": "private"},
+        "from": BOT_USER,
+        "text": params.get("text", ""),
+    }
+
+
+class StubRequest(BaseRequest):
+    """Answers Bot API calls after `latency` (plus up to `jitter`) seconds, recording every call.
+
+    `calls` keeps (method, chat id, parameters) in completion order so
+    benchmarks can check per-chat ordering.
+    """
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, record: bool = True):
+        self.latency = latency
+        self.jitter = jitter
+        self.record = record
+        self.calls: List[Tuple[str, Optional[int], Dict]] = []
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    async def do_request(self, url: str, method: str, request_data: Optional[RequestData] = None,
+                         read_timeout=None, write_timeout=None, connect_timeout=None,
+                         pool_timeout=None) -> Tuple[int, bytes]:
+        api_method = url.rsplit("/", 1)[-1]
+        params = request_data.parameters if request_data else {}
+        if self.latency or self.jitter:
+            await asyncio.sleep(self.latency + random.uniform(0, self.jitter))
+        if self.record:
+            self.calls.append((api_method, params.get("chat_id"), params))
+
+        if api_method == "getMe":
+            result = BOT_USER
+        elif api_method in ("sendMessage", "sendDocument"):
+            result = _message_result(params)
+        elif api_method == "getUpdates":
+            await asyncio.sleep(1)
+            result = []
+        else:
+            result = True
+        return 200, json.dumps({"ok": True, "result": result}).encode("utf-8")
@@ -0,0 +1,72 @@
+"""A local HTTP stand-in for the static host that serves paper PDFs"""
+import asyncio
+from typing import Dict, Optional, Set, Tuple
+
+
+class StubFileServer:
+    """Answers HEAD and GET for a fixed set of files.
+
+    `files` maps a path to (size, etag). Unknown paths get 404, paths in
+    `no_head` answer HEAD with 405 like some static hosts, and a matching
+    If-None-Match gets 304. Each response is delayed by `latency`.
+    `requests` counts (method, status) pairs.
+    """
+
+    def __init__(self, files: Dict[str, Tuple[int, str]], no_head: Set[str] = frozenset(), latency: float = 0.0):
+        self.files = files
+        self.no_head = no_head
+        self.latency = latency
+        self.requests: Dict[Tuple[str, int], int] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0):
+        self._server = await asyncio.start_server(self._serve, host, port)
+
+    @property
+    def port(self) -> int:
+        return self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    def _answer(self, method: str, path: str, headers: Dict[str, str]) -> Tuple[int, Dict[str, str], int]:
+        """(status, headers, body length)"""
+        if path not in self.files:
+            return 404, {}, 0
+        if method == "HEAD" and path in self.no_head:
+            return 405, {"Allow": "GET"}, 0
+        size, etag = self.files[path]
+        if headers.get("if-none-match") == etag:
+            return 304, {"ETag": etag}, 0
+        return 200, {"ETag": etag, "Content-Type": "application/pdf"}, size
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, _ = request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+                status, extra, length = self._answer(method, target, headers)
+                self.requests[(method, status)] = self.requests.get((method, status), 0) + 1
+                head = f"HTTP/1.1 {status} X\r\nContent-Length: {length}\r\n"
+                head += "".join(f"{name}: {value}\r\n" for name, value in extra.items())
+                writer.write(head.encode("latin-1") + b"\r\n")
+                if method == "GET" and length:
+                    writer.write(b"\0" * length)
+                await writer.drain()
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
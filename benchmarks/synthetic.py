@@ -0,0 +1,52 @@
+"""Synthetic catalogs and queries for the benchmark scripts"""
+import random
+from typing import Dict, List
+
+SUBJECTS = [
+    "Mathematics", "Science", "English", "Hindi", "Social Science",
+    "Physics", "Chemistry", "Biology", "Economics",
+]
+CLASSES = [str(n) for n in range(6, 13)]
+
+QUERIES = [
+    "math 2022 class 10", "गणित 2022 कक्षा 10", "physics", "phy 12", "science 9 2023",
+    "english", "hindi 2019", "bio", "economics 11 2015", "sst 10", "chem 2020",
+    "2023", "xyz", "mathematics 12 2001",
+    # typos, ordinals and Devanagari digits
+    "mathmatics 10", "phisics 2021", "chemestry", "12th biolgy", "१० गणित", "12वीं भौतिकी", "scince 2019",
+]
+
+
+def make_catalog(size: int, seed: int = 42) -> Dict[str, Dict[str, Dict[str, str]]]:
+    """Build a QUESTION_PAPERS style catalog with exactly `size` papers"""
+    rng = random.Random(seed)
+    papers: Dict[str, Dict[str, Dict[str, str]]] = {}
+    count = 0
+    variant = 0
+    while count < size:
+        for class_num in CLASSES:
+            for base in SUBJECTS:
+                subject = base if variant == 0 else f"{base} {variant}"
+                years = papers.setdefault(class_num, {}).setdefault(subject, {})
+                for year in range(2023, 1990, -1):
+                    if count >= size:
+                        return papers
+                    if rng.random() < 0.1:
+                        continue
+                    years[str(year)] = f"class{class_num}/{subject.lower().replace(' ', '_')}/{year}.pdf"
+                    count += 1
+        variant += 1
+    return papers
+
+
+def iter_papers(papers: Dict[str, Dict[str, Dict[str, str]]]):
+    """Yield (class_num, subject, year, file_path) for every paper"""
+    for class_num, subjects in papers.items():
+        for subject, years in subjects.items():
+            for year, file_path in years.items():
+                yield class_num, subject, year, file_path
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
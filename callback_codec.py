@@ -0,0 +1,124 @@
+from typing import Collection, Dict, Iterable, Optional, Tuple, Union
+
+from catalog_store import TokenPath
+
+# (opcode, argument); the argument is a TokenPath, a literal string or None
+Callback = Tuple[int, Union[TokenPath, str, None]]
+
+# base64url digits; opcodes and token numbers are written with these
+ALPHABET = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_"
+_DIGITS = {char: value for value, char in enumerate(ALPHABET)}
+
+# Separates the opcode from a literal argument ("B.en")
+LITERAL_MARK = "."
+
+# Telegram rejects longer callback_data
+MAX_CALLBACK_BYTES = 64
+
+# Argument shapes an opcode accepts: None (no argument), LITERAL, or the
+# length of a catalog path (1 class, 2 subject, 3 paper)
+LITERAL = "literal"
+ArgumentShape = Union[None, str, int]
+
+
+def encode_int(value: int) -> str:
+    """Write a non-negative integer in base64url digits, most significant first"""
+    digits = ALPHABET[value & 63]
+    value >>= 6
+    while value:
+        digits = ALPHABET[value & 63] + digits
+        value >>= 6
+    return digits
+
+
+def decode_int(digits: str) -> Optional[int]:
+    """Inverse of encode_int; None for empty, non-canonical or invalid input"""
+    if not digits or (len(digits) > 1 and digits[0] == ALPHABET[0]):
+        return None
+    value = 0
+    for char in digits:
+        digit = _DIGITS.get(char)
+        if digit is None:
+            return None
+        value = (value << 6) | digit
+    return value
+
+
+class CallbackCodec:
+    """Compact callback_data backed by a server-side token table.
+
+    callback_data is one opcode character, followed by either the token of
+    a catalog path in base64url digits or LITERAL_MARK and a short literal
+    such as a language code. A year button is a few bytes however long the
+    subject name is, and subjects may contain any character.
+
+    Tokens come from the catalog store so they stay valid across restarts
+    and on buttons in old messages. Decoded callbacks are kept in a table
+    keyed by the callback_data string, so a button press is a single dict
+    lookup; a string is only parsed the first time it is seen.
+
+    `arguments` maps each opcode to the argument shapes it accepts. Data
+    with an unknown opcode or an argument of the wrong shape, which only
+    forged or outdated buttons can carry, decodes to None, so handlers can
+    unpack their argument without checking it.
+    """
+
+    def __init__(self, arguments: Dict[int, Collection[ArgumentShape]]):
+        self._arguments = arguments
+        self._tokens: Dict[TokenPath, int] = {}
+        self._paths: Dict[int, TokenPath] = {}
+        self._decoded: Dict[str, Callback] = {}
+
+    def __len__(self) -> int:
+        return len(self._tokens)
+
+    def load(self, tokens: Iterable[Tuple[int, TokenPath]]):
+        """Add (token, path) pairs from the catalog store"""
+        for token, path in tokens:
+            self._tokens[path] = token
+            self._paths[token] = path
+
+    def encode(self, opcode: int, path: Optional[TokenPath] = None) -> str:
+        """callback_data for an opcode and an optional catalog path"""
+        data = ALPHABET[opcode]
+        if path is not None:
+            data += encode_int(self._tokens[path])
+        if data not in self._decoded:
+            self._decoded[data] = (opcode, path)
+        return data
+
+    def encode_literal(self, opcode: int, value: str) -> str:
+        """callback_data for an opcode with a short literal argument"""
+        data = ALPHABET[opcode] + LITERAL_MARK + value
+        if len(data.encode()) > MAX_CALLBACK_BYTES:
+            raise ValueError(f"callback literal too long: {value!r}")
+        if data not in self._decoded:
+            self._decoded[data] = (opcode, value)
+        return data
+
+    def decode(self, data: Optional[str]) -> Optional[Callback]:
+        """Return (opcode, argument) for callback_data, or None if it is not ours"""
+        callback = self._decoded.get(data)
+        if callback is None and data:
+            callback = self._parse(data)
+            # Literals that were never issued are not remembered, so junk
+            # callback_data cannot grow the table
+            if callback is not None and not isinstance(callback[1], str):
+                self._decoded[data] = callback
+        return callback
+
+    def _parse(self, data: str) -> Optional[Callback]:
+        shapes = self._arguments.get(_DIGITS.get(data[0]))
+        if shapes is None:
+            return None
+        rest = data[1:]
+        if not rest:
+            argument, shape = None, None
+        elif rest[0] == LITERAL_MARK:
+            argument, shape = rest[1:], LITERAL
+        else:
+            argument = self._paths.get(decode_int(rest))
+            if argument is None:
+                return None
+            shape = len(argument)
+        return (_DIGITS[data[0]], argument) if shape in shapes else None
@@ -0,0 +1,152 @@
+import csv
+import json
+from typing import IO, Iterable, Iterator, List, Optional, Tuple
+
+from catalog_store import PaperRow
+
+# CSV columns are read by position in this order; a header row, if any, is skipped
+CSV_HEADER = ["class", "subject", "year", "file_url"]
+
+# Accepted keys for the file field in JSONL objects
+FILE_FIELDS = ("file_url", "file_path", "url")
+
+# (line number, parsed row or None, error message or None)
+ImportResult = Tuple[int, Optional[PaperRow], Optional[str]]
+
+NOT_UTF8 = "not UTF-8 text, save the file as UTF-8"
+
+# Longest class, subject or year name; they become button labels
+MAX_NAME_LENGTH = 64
+MAX_URL_LENGTH = 2048
+
+# (name in error messages, longest value) for each field of a row
+_FIELD_LIMITS = (("class", MAX_NAME_LENGTH), ("subject", MAX_NAME_LENGTH), ("year", MAX_NAME_LENGTH), ("file URL", MAX_URL_LENGTH))
+
+# Longest field value quoted in an error message
+MAX_FIELD_SHOWN = 40
+
+
+def _shown(value: str) -> str:
+    return repr(value if len(value) <= MAX_FIELD_SHOWN else value[:MAX_FIELD_SHOWN] + "...")
+
+
+def validate_row(fields: List[str]) -> PaperRow:
+    """Check one Class|Subject|Year|FileURL record, raising ValueError with the reason.
+
+    Fields only have to be non-empty and not too long; names such as
+    "LKG" or "2023-24" are fine.
+    """
+    if len(fields) != 4:
+        raise ValueError(f"expected 4 fields, got {len(fields)}")
+    row = tuple(field.strip() for field in fields)
+    for value, (name, max_length) in zip(row, _FIELD_LIMITS):
+        if not value:
+            raise ValueError(f"{name} is empty")
+        if len(value) > max_length:
+            raise ValueError(f"{name} is longer than {max_length} characters: {_shown(value)}")
+    return row
+
+
+def _jsonl_fields(line: str) -> List[str]:
+    record = json.loads(line)
+    if not isinstance(record, dict):
+        raise ValueError("expected a JSON object")
+    file_url = next((record[name] for name in FILE_FIELDS if name in record), "")
+    return [str(record.get("class", "")), str(record.get("subject", "")), str(record.get("year", "")), str(file_url)]
+
+
+def _decode_lines(stream: IO[bytes], bad: List[int]) -> Iterator[str]:
+    """UTF-8 lines of a binary stream; a line that is not UTF-8 comes out blank and its number is put in `bad`"""
+    for line_num, line in enumerate(stream, 1):
+        try:
+            yield line.decode("utf-8-sig" if line_num == 1 else "utf-8")
+        except UnicodeDecodeError:
+            bad[0] = line_num
+            yield "\n"
+
+
+def iter_import_rows(stream: IO[bytes], fmt: str) -> Iterator[ImportResult]:
+    """Parse an uploaded catalog file, opened in binary mode, one line at a time.
+
+    `fmt` is "csv" or "jsonl". Bad rows are reported with their line number
+    instead of aborting the import. That includes lines that are not UTF-8
+    (such as a CSV saved by Excel as cp1252) and CSV lines the csv module
+    cannot parse.
+    """
+    bad = [0]
+    lines = _decode_lines(stream, bad)
+    if fmt == "csv":
+        reader = csv.reader(lines)
+        while True:
+            try:
+                fields = next(reader, None)
+            except csv.Error as e:  # e.g. a field over csv.field_size_limit()
+                yield reader.line_num, None, str(e)
+                continue
+            if fields is None:
+                break
+            if bad[0] == reader.line_num:
+                yield reader.line_num, None, NOT_UTF8
+                continue
+            if not fields or not any(field.strip() for field in fields):
+                continue
+            if reader.line_num == 1 and fields[0].strip().lower() == "class":
+                continue  # header
+            try:
+                yield reader.line_num, validate_row(fields), None
+            except ValueError as e:
+                yield reader.line_num, None, str(e)
+    elif fmt == "jsonl":
+        for line_num, line in enumerate(lines, 1):
+            if bad[0] == line_num:
+                yield line_num, None, NOT_UTF8
+                continue
+            if not line.strip():
+                continue
+            try:
+                yield line_num, validate_row(_jsonl_fields(line)), None
+            except ValueError as e:  # json.JSONDecodeError is a ValueError too
+                yield line_num, None, str(e)
+    else:
+        raise ValueError(f"unsupported import format: {fmt}")
+
+
+def iter_batches(results: Iterable[ImportResult], batch_size: int) -> Iterator[Tuple[List[PaperRow], List[Tuple[int, str]]]]:
+    """Group parsed rows into batches of valid rows plus the errors seen alongside them.
+
+    A batch is yielded once it holds `batch_size` rows or `batch_size`
+    errors, so a file of bad rows is not collected in memory either.
+    """
+    rows: List[PaperRow] = []
+    errors: List[Tuple[int, str]] = []
+    for line_num, row, error in results:
+        if row is None:
+            errors.append((line_num, error))
+        else:
+            rows.append(row)
+        if len(rows) >= batch_size or len(errors) >= batch_size:
+            yield rows, errors
+            rows, errors = [], []
+    if rows or errors:
+        yield rows, errors
+
+
+def write_export(rows: Iterable[PaperRow], stream: IO[str], fmt: str) -> int:
+    """Write catalog rows to a stream as CSV or JSONL, returning the row count"""
+    count = 0
+    if fmt == "csv":
+        writer = csv.writer(stream)
+        writer.writerow(CSV_HEADER)
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    elif fmt == "jsonl":
+        for class_num, subject, year, file_url in rows:
+            stream.write(json.dumps(
+                {"class": class_num, "subject": subject, "year": year, "file_url": file_url},
+                ensure_ascii=False
+            ) + "\n")
+            count += 1
+    else:
+        raise ValueError(f"unsupported export format: {fmt}")
+    return count
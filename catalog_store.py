@@ -0,0 +1,193 @@
+import sqlite3
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from sqlite_db import connect
+
+# (class_num, subject, year, file_path)
+PaperRow = Tuple[str, str, str, str]
+
+# (class_num,), (class_num, subject) or (class_num, subject, year)
+TokenPath = Tuple[str, ...]
+
+
+def class_sort_key(class_num: str) -> Tuple[int, int, str]:
+    """Numeric classes in numeric order ("6" before "10"), then any others alphabetically"""
+    return (0, int(class_num), "") if class_num.isdigit() else (1, 0, class_num)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS papers (
+    class_num TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    year TEXT NOT NULL,
+    file_path TEXT NOT NULL,
+    PRIMARY KEY (class_num, subject, year)
+) WITHOUT ROWID
+"""
+
+# Stable numbers for classes, subjects and papers, used in callback_data.
+# `kind` is the length of the path: 1 class, 2 subject, 3 paper; the fields
+# past it are stored as '' and never read.
+_TOKEN_SCHEMA = """
+CREATE TABLE IF NOT EXISTS callback_tokens (
+    token INTEGER PRIMARY KEY,
+    kind INTEGER NOT NULL,
+    class_num TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    year TEXT NOT NULL,
+    UNIQUE (kind, class_num, subject, year)
+)
+"""
+
+# Telegram file_id of each paper's first upload, valid while file_path is unchanged
+_FILE_ID_SCHEMA = """
+CREATE TABLE IF NOT EXISTS file_ids (
+    class_num TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    year TEXT NOT NULL,
+    file_path TEXT NOT NULL,
+    file_id TEXT NOT NULL,
+    PRIMARY KEY (class_num, subject, year)
+) WITHOUT ROWID
+"""
+
+_INSERT_TOKEN = "INSERT OR IGNORE INTO callback_tokens (kind, class_num, subject, year) VALUES (?, ?, ?, ?)"
+
+# Gives every stored class, subject and paper a token (databases created before tokens existed)
+_BACKFILL_TOKENS = """
+INSERT OR IGNORE INTO callback_tokens (kind, class_num, subject, year)
+SELECT DISTINCT 1, class_num, '', '' FROM papers
+UNION ALL SELECT DISTINCT 2, class_num, subject, '' FROM papers
+UNION ALL SELECT 3, class_num, subject, year FROM papers
+"""
+
+
+def _token_key(path: TokenPath) -> Tuple[int, str, str, str]:
+    """(kind, class_num, subject, year) of a token path"""
+    return (len(path),) + (path + ("", ""))[:3]
+
+
+def _token_rows(rows: Iterable[PaperRow]) -> Set[Tuple[int, str, str, str]]:
+    """callback_tokens rows for the classes, subjects and papers in a batch"""
+    needed = set()
+    for class_num, subject, year, _ in rows:
+        needed.add(_token_key((class_num,)))
+        needed.add(_token_key((class_num, subject)))
+        needed.add(_token_key((class_num, subject, year)))
+    return needed
+
+
+class CatalogStore:
+    """SQLite-backed question paper catalog.
+
+    The database runs in WAL mode so writes are appended to the write-ahead
+    log and readers are never blocked; SQLite folds the log back into the
+    main file on checkpoint. Rows are keyed by (class, subject, year), so
+    single paper lookups use the primary key index. The connection is only
+    opened on first use.
+    """
+
+    def __init__(self, path: str, mmap_size: int = 64 * 1024 * 1024):
+        self.path = path
+        self.mmap_size = mmap_size
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = connect(self.path)
+            conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+            conn.execute(_SCHEMA)
+            conn.execute(_TOKEN_SCHEMA)
+            conn.execute(_FILE_ID_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM papers").fetchone()[0]
+
+    def seed(self, papers: Dict[str, Dict[str, Dict[str, str]]]):
+        """Insert papers from a QUESTION_PAPERS style dict, keeping any stored rows"""
+        rows = [
+            (class_num, subject, year, file_path)
+            for class_num, subjects in papers.items()
+            for subject, years in subjects.items()
+            for year, file_path in years.items()
+        ]
+        with self._lock, self.conn:
+            self.conn.executemany("INSERT OR IGNORE INTO papers VALUES (?, ?, ?, ?)", rows)
+            self.conn.executemany(_INSERT_TOKEN, _token_rows(rows))
+
+    def load(self) -> Dict[str, Dict[str, Dict[str, str]]]:
+        """Read the whole catalog into a QUESTION_PAPERS style dict"""
+        papers: Dict[str, Dict[str, Dict[str, str]]] = {}
+        for class_num, subject, year, file_path in self.conn.execute("SELECT * FROM papers"):
+            papers.setdefault(class_num, {}).setdefault(subject, {})[year] = file_path
+        return papers
+
+    def get(self, class_num: str, subject: str, year: str) -> Optional[str]:
+        row = self.conn.execute(
+            "SELECT file_path FROM papers WHERE class_num = ? AND subject = ? AND year = ?",
+            (class_num, subject, year)
+        ).fetchone()
+        return row[0] if row else None
+
+    def put_many(self, rows: Iterable[PaperRow]):
+        """Insert or replace papers, and their callback tokens, in a single transaction"""
+        rows = list(rows)
+        with self._lock, self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO papers VALUES (?, ?, ?, ?)", rows)
+            self.conn.executemany(_INSERT_TOKEN, _token_rows(rows))
+
+    def load_tokens(self) -> List[Tuple[int, TokenPath]]:
+        """Read every callback token, assigning missing ones first"""
+        papers = len(self)
+        tokened = self.conn.execute("SELECT COUNT(*) FROM callback_tokens WHERE kind = 3").fetchone()[0]
+        if tokened < papers:
+            with self._lock, self.conn:
+                self.conn.execute(_BACKFILL_TOKENS)
+        return [
+            (token, (class_num, subject, year)[:kind])
+            for token, kind, class_num, subject, year in self.conn.execute("SELECT * FROM callback_tokens")
+        ]
+
+    def get_tokens(self, paths: Iterable[TokenPath]) -> List[Tuple[int, TokenPath]]:
+        """Look up the callback tokens of specific classes, subjects or papers"""
+        tokens = []
+        for path in paths:
+            found = self.conn.execute(
+                "SELECT token FROM callback_tokens WHERE kind = ? AND class_num = ? AND subject = ? AND year = ?",
+                _token_key(path)
+            ).fetchone()
+            if found:
+                tokens.append((found[0], path))
+        return tokens
+
+    def iter_rows(self) -> Iterator[PaperRow]:
+        """Yield every paper ordered by class, subject and year"""
+        yield from self.conn.execute("SELECT * FROM papers ORDER BY class_num, subject, year")
+
+    def load_file_ids(self) -> Dict[Tuple[str, str, str], Tuple[str, str]]:
+        """Read every stored upload as (class, subject, year) -> (file_path, file_id)"""
+        return {
+            (class_num, subject, year): (file_path, file_id)
+            for class_num, subject, year, file_path, file_id in self.conn.execute("SELECT * FROM file_ids")
+        }
+
+    def put_file_id(self, class_num: str, subject: str, year: str, file_path: str, file_id: str):
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO file_ids VALUES (?, ?, ?, ?, ?)", (class_num, subject, year, file_path, file_id)
+            )
+
+    def delete_file_id(self, class_num: str, subject: str, year: str):
+        with self._lock, self.conn:
+            self.conn.execute(
+                "DELETE FROM file_ids WHERE class_num = ? AND subject = ? AND year = ?", (class_num, subject, year)
+            )
@@ -0,0 +1,104 @@
+from bisect import insort
+from typing import Dict, List, Optional, Tuple
+
+from catalog_store import class_sort_key
+
+# Leaves room for the title and total under Telegram's 4096 character message limit
+PAGE_CHARS = 3500
+
+# Years listed per subject line; the newest are shown and the rest counted
+MAX_YEARS_SHOWN = 20
+
+
+class CatalogSummary:
+    """Paper counts and the admin catalog pages, updated as papers are added.
+
+    Counts per class and in total are adjusted on `add` instead of being
+    recounted. Each subject's summary line is rendered once and again only
+    when that subject gets a paper. Pages are runs of lines that fit in
+    `page_chars` characters; the page layout is recomputed from line
+    lengths after a change, and only the page being viewed is joined
+    into text.
+    """
+
+    def __init__(self, page_chars: int = PAGE_CHARS, max_years_shown: int = MAX_YEARS_SHOWN):
+        self.page_chars = page_chars
+        self.max_years_shown = max_years_shown
+        self._years: Dict[str, Dict[str, List[str]]] = {}  # class -> subject -> sorted years
+        self._lines: Dict[Tuple[str, str], str] = {}
+        self._pages: Optional[List[List[Tuple[str, str]]]] = None  # (class, subject) lines on each page
+        self.class_counts: Dict[str, int] = {}
+        self.total = 0
+
+    def build(self, papers: Dict[str, Dict[str, Dict[str, str]]]):
+        """Rebuild from a QUESTION_PAPERS style catalog"""
+        self._years = {}
+        self._lines = {}
+        self.class_counts = {}
+        self.total = 0
+        for class_num, subjects in papers.items():
+            self._years[class_num] = {}
+            for subject, years in subjects.items():
+                self._years[class_num][subject] = sorted(years)
+                self._lines[class_num, subject] = self._render_line(class_num, subject)
+                self.class_counts[class_num] = self.class_counts.get(class_num, 0) + len(years)
+                self.total += len(years)
+        self._pages = None
+
+    def add(self, class_num: str, subject: str, year: str):
+        """Count a new paper; papers already counted are ignored"""
+        years = self._years.setdefault(class_num, {}).setdefault(subject, [])
+        if year in years:
+            return
+        insort(years, year)
+        self._lines[class_num, subject] = self._render_line(class_num, subject)
+        self.class_counts[class_num] = self.class_counts.get(class_num, 0) + 1
+        self.total += 1
+        self._pages = None
+
+    def _render_line(self, class_num: str, subject: str) -> str:
+        years = self._years[class_num][subject]
+        shown = ", ".join(years[-self.max_years_shown:])
+        if len(years) > self.max_years_shown:
+            shown = f"…, {shown}"
+        return f"  • {subject}: {len(years)} papers ({shown})"
+
+    @staticmethod
+    def _class_header(class_num: str) -> str:
+        return f"**Class {class_num}:**"
+
+    def _layout(self) -> List[List[Tuple[str, str]]]:
+        if self._pages is not None:
+            return self._pages
+        pages: List[List[Tuple[str, str]]] = [[]]
+        used = 0
+        for class_num in sorted(self._years, key=class_sort_key):
+            header = len(self._class_header(class_num)) + 2
+            for position, subject in enumerate(self._years[class_num]):
+                # A class header is repeated at the top of a page it continues on
+                cost = len(self._lines[class_num, subject]) + 1 + (header if position == 0 else 0)
+                if pages[-1] and used + cost > self.page_chars:
+                    pages.append([])
+                    used = header if position else 0
+                pages[-1].append((class_num, subject))
+                used += cost
+        self._pages = pages
+        return pages
+
+    @property
+    def pages(self) -> int:
+        return len(self._layout())
+
+    def page(self, index: int) -> str:
+        """Text of one page; `index` is clamped to the pages there are"""
+        pages = self._layout()
+        lines = []
+        current = None
+        for class_num, subject in pages[max(0, min(index, len(pages) - 1))]:
+            if class_num != current:
+                if current is not None:
+                    lines.append("")
+                lines.append(self._class_header(class_num))
+                current = class_num
+            lines.append(self._lines[class_num, subject])
+        return "\n".join(lines)
@@ -0,0 +1,192 @@
+import asyncio
+import errno
+import logging
+import os
+import tempfile
+from typing import IO, Dict, Optional, Tuple
+
+import httpx
+from telegram import Bot, InlineKeyboardMarkup, InputFile
+from telegram.error import BadRequest
+
+from catalog_store import CatalogStore
+
+logger = logging.getLogger(__name__)
+
+# (class_num, subject, year)
+PaperKey = Tuple[str, str, str]
+
+CHUNK_SIZE = 64 * 1024
+
+# Largest file a bot may upload; Telegram rejects bigger ones only after the whole upload
+MAX_UPLOAD_BYTES = 50 * 1024 * 1024
+
+
+class _StreamedFile(InputFile):
+    """InputFile that gives httpx the open file to stream, where InputFile would read it into memory"""
+
+    def __init__(self, f: IO[bytes], filename: str):
+        super().__init__(b"", filename=filename)
+        self.input_file_content = f  # httpx seeks to the start before each attempt
+
+
+def _too_large() -> OSError:
+    return OSError(errno.EFBIG, f"paper is over the {MAX_UPLOAD_BYTES} byte upload limit")
+
+
+class DocumentSender:
+    """Sends papers as Telegram documents, uploading each file at most once.
+
+    The file_id Telegram returns for the first upload of a paper is stored
+    in the catalog store and reused for every later send, so repeat sends
+    upload nothing. A stored file_id is dropped when the paper's file_path
+    changes or Telegram rejects it.
+
+    First uploads wait for one of `concurrency` upload slots. Users asking
+    for a paper that is already being uploaded wait for that upload instead
+    of starting another. Files are sent without loading them into memory:
+    from `papers_dir` when the file is there (streamed multipart upload),
+    otherwise by URL so Telegram fetches the file itself; if Telegram cannot
+    fetch it, the file is streamed to a temporary file and uploaded from
+    there. Catalog paths that resolve outside `papers_dir` are never read.
+
+    Uploads go through the bot, so they share its rate limiter, connection
+    pool and error handling. Files over MAX_UPLOAD_BYTES raise OSError
+    (EFBIG) before they are uploaded, and the caller sends the link.
+    """
+
+    def __init__(self, store: CatalogStore, papers_dir: Optional[str] = None, concurrency: int = 2,
+                 timeout: float = 120):
+        self.store = store
+        self.papers_dir = os.path.realpath(papers_dir) if papers_dir else None
+        self.timeout = timeout
+        self._client: Optional[httpx.AsyncClient] = None  # for downloads Telegram could not fetch
+        self._file_ids: Dict[PaperKey, Tuple[str, str]] = {}  # key -> (file_path, file_id)
+        self._uploads: Dict[PaperKey, asyncio.Future] = {}
+        self._slots = asyncio.Semaphore(concurrency)
+        self.waiting = 0
+        self.uploads = 0
+        self.cached_sends = 0
+
+    def __len__(self) -> int:
+        return len(self._file_ids)
+
+    def load(self):
+        """Read stored file_ids from the catalog store"""
+        self._file_ids = self.store.load_file_ids()
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _local_path(self, file_path: str) -> Optional[str]:
+        """The paper's file in papers_dir, or None if it is not there or the path leads outside it"""
+        if not self.papers_dir:
+            return None
+        path = os.path.realpath(os.path.join(self.papers_dir, file_path))
+        if os.path.commonpath([path, self.papers_dir]) != self.papers_dir:
+            logger.warning("Paper path is outside PAPERS_DIR, not reading it", extra={"file_path": file_path})
+            return None
+        return path if os.path.isfile(path) else None
+
+    def file_id(self, key: PaperKey, file_path: str) -> Optional[str]:
+        stored = self._file_ids.get(key)
+        return stored[1] if stored is not None and stored[0] == file_path else None
+
+    async def _remember(self, key: PaperKey, file_path: str, file_id: str):
+        self._file_ids[key] = (file_path, file_id)
+        await asyncio.to_thread(self.store.put_file_id, *key, file_path, file_id)
+
+    async def _forget(self, key: PaperKey):
+        self._file_ids.pop(key, None)
+        await asyncio.to_thread(self.store.delete_file_id, *key)
+
+    async def send(self, bot: Bot, chat_id: int, key: PaperKey, file_path: str, url: str, caption: str,
+                   reply_markup: Optional[InlineKeyboardMarkup] = None):
+        """Send a paper to a chat, uploading it only if it has no usable file_id"""
+        file_id = self.file_id(key, file_path)
+        if file_id is not None:
+            try:
+                await bot.send_document(chat_id, file_id, caption=caption, reply_markup=reply_markup)
+                self.cached_sends += 1
+                return
+            except BadRequest as e:
+                logger.warning("Stored file_id rejected, uploading again", extra={"paper": key, "error": str(e)})
+                await self._forget(key)
+
+        pending = self._uploads.get(key)
+        if pending is not None:
+            # Someone else is uploading this paper; reuse their file_id
+            file_id = await asyncio.shield(pending)
+            await bot.send_document(chat_id, file_id, caption=caption, reply_markup=reply_markup)
+            self.cached_sends += 1
+            return
+
+        pending = self._uploads[key] = asyncio.get_running_loop().create_future()
+        try:
+            self.waiting += 1
+            try:
+                await self._slots.acquire()
+            finally:
+                self.waiting -= 1
+            try:
+                file_id = await self._upload(bot, chat_id, file_path, url, caption, reply_markup)
+            finally:
+                self._slots.release()
+            self.uploads += 1
+            pending.set_result(file_id)
+            await self._remember(key, file_path, file_id)
+        except asyncio.CancelledError:
+            pending.cancel()
+            raise
+        except Exception as e:
+            pending.set_exception(e)
+            # Nobody may be waiting on the future; don't warn about an unretrieved exception
+            pending.exception()
+            raise
+        finally:
+            del self._uploads[key]
+
+    async def _upload(self, bot: Bot, chat_id: int, file_path: str, url: str, caption: str,
+                      reply_markup: Optional[InlineKeyboardMarkup]) -> str:
+        """Send a file for the first time and return its file_id"""
+        local_path = self._local_path(file_path)
+        if local_path is not None:
+            size = os.path.getsize(local_path)
+            if size > MAX_UPLOAD_BYTES:
+                raise _too_large()
+            return await self._post_file(bot, chat_id, local_path, caption, reply_markup)
+        try:
+            message = await bot.send_document(chat_id, url, caption=caption, reply_markup=reply_markup)
+            return message.document.file_id
+        except BadRequest as e:
+            logger.warning("Telegram could not fetch paper URL, uploading it", extra={"url": url, "error": str(e)})
+
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self.timeout, follow_redirects=True)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            local_path = os.path.join(tmp_dir, os.path.basename(file_path) or "paper.pdf")
+            async with self._client.stream("GET", url) as response:
+                response.raise_for_status()
+                length = response.headers.get("content-length", "")
+                if length.isdecimal() and int(length) > MAX_UPLOAD_BYTES:
+                    raise _too_large()
+                size = 0
+                with open(local_path, "wb") as f:
+                    async for chunk in response.aiter_bytes(CHUNK_SIZE):
+                        size += len(chunk)
+                        if size > MAX_UPLOAD_BYTES:
+                            raise _too_large()
+                        f.write(chunk)
+            return await self._post_file(bot, chat_id, local_path, caption, reply_markup)
+
+    async def _post_file(self, bot: Bot, chat_id: int, path: str, caption: str,
+                         reply_markup: Optional[InlineKeyboardMarkup]) -> str:
+        """sendDocument with the multipart body streamed from disk"""
+        with open(path, "rb") as f:
+            message = await bot.send_document(
+                chat_id, _StreamedFile(f, os.path.basename(path)), caption=caption, reply_markup=reply_markup,
+                write_timeout=self.timeout, read_timeout=self.timeout,
+            )
+        return message.document.file_id
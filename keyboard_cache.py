@@ -0,0 +1,52 @@
+from typing import Callable, Dict, Optional, Tuple
+
+from telegram import InlineKeyboardMarkup
+
+# (menu, class_num, subject, language, is_admin)
+KeyboardKey = Tuple[str, Optional[str], Optional[str], str, bool]
+
+
+class KeyboardCache:
+    """Built InlineKeyboardMarkup objects, keyed by menu and the values they depend on.
+
+    Markups are immutable, so one instance can be sent to every user that
+    shares the same key. Entries are dropped with `invalidate` when the
+    catalog changes underneath them.
+    """
+
+    def __init__(self):
+        self._entries: Dict[KeyboardKey, InlineKeyboardMarkup] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def get(self, key: KeyboardKey, build: Callable[[], InlineKeyboardMarkup]) -> InlineKeyboardMarkup:
+        """Return the cached markup for key, building it on a miss"""
+        markup = self._entries.get(key)
+        if markup is None:
+            self.misses += 1
+            markup = self._entries[key] = build()
+        else:
+            self.hits += 1
+        return markup
+
+    def invalidate(self, menu: str, class_num: Optional[str] = None, subject: Optional[str] = None):
+        """Drop cached markups for a menu, optionally only for one class/subject"""
+        stale = [
+            key for key in self._entries
+            if key[0] == menu
+            and (class_num is None or key[1] == class_num)
+            and (subject is None or key[2] == subject)
+        ]
+        for key in stale:
+            del self._entries[key]
+
+    def clear(self):
+        self._entries.clear()
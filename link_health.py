@@ -0,0 +1,150 @@
+import asyncio
+import heapq
+import logging
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+class LinkInfo(NamedTuple):
+    status: int  # HTTP status of the last check, 0 if the request failed
+    size: Optional[int]  # bytes, from Content-Length
+    etag: Optional[str]
+    checked_at: float  # time.monotonic()
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status < 400
+
+
+def format_size(size: int) -> str:
+    """Human readable file size ("1.4 MB")"""
+    value = float(size)
+    for unit in ("B", "KB", "MB"):
+        if value < 1024:
+            return f"{value:.0f} {unit}" if unit == "B" else f"{value:.1f} {unit}"
+        value /= 1024
+    return f"{value:.1f} GB"
+
+
+class LinkHealth:
+    """Cached HEAD metadata (status, size, ETag) for download URLs.
+
+    Handlers only read the cache with `get`, so showing a download link
+    never waits on the network. `run` re-checks watched URLs in the
+    background: unchecked ones first, then entries older than `ttl`,
+    oldest first and at most `batch_size` per pass. Requests share one
+    pooled httpx client with at most `concurrency` in flight, and re-checks
+    send If-None-Match so unchanged files answer 304 without a body.
+    """
+
+    def __init__(self, ttl: float = 6 * 3600, interval: float = 60, concurrency: int = 16,
+                 batch_size: int = 200, timeout: float = 10):
+        self.ttl = ttl
+        self.interval = interval
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self._watched: Dict[str, None] = {}  # insertion ordered set
+        self._entries: Dict[str, LinkInfo] = {}
+        self._client: Optional[httpx.AsyncClient] = None
+        self.checks = 0
+        self.failures = 0
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                follow_redirects=True,
+                limits=httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency),
+            )
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def __len__(self) -> int:
+        return len(self._watched)
+
+    @property
+    def broken(self) -> int:
+        return sum(1 for info in self._entries.values() if not info.ok)
+
+    def watch(self, urls: Iterable[str]):
+        """Start checking URLs"""
+        for url in urls:
+            self._watched[url] = None
+
+    def discard(self, url: str):
+        """Stop checking a URL and forget its metadata"""
+        self._watched.pop(url, None)
+        self._entries.pop(url, None)
+
+    def get(self, url: str) -> Optional[LinkInfo]:
+        """Last known metadata for a URL, without touching the network"""
+        return self._entries.get(url)
+
+    def due(self, now: Optional[float] = None) -> List[str]:
+        """URLs to check on the next pass"""
+        now = time.monotonic() if now is None else now
+        unchecked = [url for url in self._watched if url not in self._entries]
+        if len(unchecked) >= self.batch_size:
+            return unchecked[:self.batch_size]
+        expired = [url for url, info in self._entries.items() if now - info.checked_at >= self.ttl]
+        oldest = heapq.nsmallest(self.batch_size - len(unchecked), expired, key=lambda url: self._entries[url].checked_at)
+        return unchecked + oldest
+
+    async def check(self, url: str) -> LinkInfo:
+        """HEAD a URL now and cache the result"""
+        previous = self._entries.get(url)
+        headers = {"If-None-Match": previous.etag} if previous is not None and previous.etag else {}
+        self.checks += 1
+        try:
+            response = await self.client.head(url, headers=headers)
+            if response.status_code in (405, 501):
+                # Server does not implement HEAD; read the headers of a GET and drop the body
+                async with self.client.stream("GET", url, headers=headers) as response:
+                    pass
+        except httpx.HTTPError as e:
+            self.failures += 1
+            logger.warning("Link check failed", extra={"url": url, "error": str(e)})
+            info = LinkInfo(0, None, None, time.monotonic())
+        else:
+            if response.status_code == 304 and previous is not None:
+                info = previous._replace(checked_at=time.monotonic())
+            else:
+                length = response.headers.get("content-length", "")
+                info = LinkInfo(
+                    response.status_code,
+                    int(length) if length.isdigit() else None,
+                    response.headers.get("etag"),
+                    time.monotonic(),
+                )
+        if url in self._watched:
+            self._entries[url] = info
+        return info
+
+    async def check_many(self, urls: Iterable[str]):
+        """Check URLs concurrently, at most `concurrency` at a time"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def check_one(url: str):
+            async with semaphore:
+                await self.check(url)
+
+        await asyncio.gather(*(check_one(url) for url in urls))
+
+    async def run(self):
+        """Keep the cache fresh until cancelled"""
+        while True:
+            due = self.due()
+            if due:
+                await self.check_many(due)
+                logger.info("Checked download links", extra={"checked": len(due), "broken": self.broken})
+            await asyncio.sleep(self.interval)
@@ -2,44 +2,280 @@ import asyncio
 import logging
 import json
 import os
-import threading
-import time
-import requests
+import secrets
+import signal
+import tempfile
 from typing import Dict, List, Optional
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import Application, CommandHandler, CallbackQueryHandler, MessageHandler, filters, ContextTypes
-from telegram.constants import ParseMode
-from flask import Flask
+from startup_profile import StartupProfile
 
-# Flask app for keeping the service alive
-app = Flask(__name__)
+# STARTUP_PROFILE=1 prints how long each import and startup step took once the first update is handled
+STARTUP = StartupProfile(enabled=os.environ.get('STARTUP_PROFILE') == '1')
+
+import httpx
+from telegram import (Update, InlineKeyboardButton, InlineKeyboardMarkup, InlineQueryResultArticle,
+                      InlineQueryResultCachedDocument, InputTextMessageContent)
+from telegram.ext import (Application, BaseRateLimiter, CommandHandler, CallbackQueryHandler, InlineQueryHandler,
+                          MessageHandler, TypeHandler, filters, ContextTypes)
+from telegram.constants import MessageLimit, ParseMode
+from telegram.error import TelegramError
+from telegram.request import BaseRequest
+STARTUP.mark("import telegram")
+from search_index import SearchIndex, tokenize
+from keyboard_cache import KeyboardCache
+from query_cache import QueryCache
+from catalog_store import CatalogStore, PaperRow, class_sort_key
+from callback_codec import LITERAL, CallbackCodec
+from link_health import LinkHealth, format_size
+from document_sender import DocumentSender
+from user_store import UserStore
+from analytics import DOWNLOAD, NAVIGATE, SEARCH, SEARCH_MISS, START, SECONDS_PER_DAY, Analytics, AnalyticsStore
+from popularity import Popularity
+from shared_state import open_shared_state
+from localization import Translations
+from webhook_server import HttpServer, WebhookServer, json_response, text_response
+from update_dispatcher import BoundedUpdateQueue, PerUserUpdateProcessor
+from rate_limiter import OutboundRateLimiter, UserRateLimiter
+from metrics import Registry, TimedHTTPXRequest, instrument
+from structured_logging import setup_logging, stop_logging
+STARTUP.mark("import bot modules")
 
-@app.route('/')
 def home():
     return "📚 Question Paper Bot is running! 🤖"
 
-@app.route('/health')
 def health():
     return {"status": "healthy", "bot": "question_paper_bot"}
 
 def run_flask():
-    """Run Flask server in background"""
-    app.run(host='0.0.0.0', port=8080)
+    """Serve the health endpoints with Flask (HEALTH_SERVER=flask), in a background thread"""
+    # Imported only in this mode: Flask adds ~90 ms to every start
+    from flask import Flask
+    app = Flask(__name__)
+    app.add_url_rule('/', 'home', home)
+    app.add_url_rule('/health', 'health', health)
+    app.add_url_rule('/metrics', 'metrics', lambda: (REGISTRY.render(), 200, {'Content-Type': 'text/plain; version=0.0.4'}))
+    app.run(host='0.0.0.0', port=PORT)
 
-# Configure logging
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
+# Configure logging: records are written by a background thread so handlers never block on stdout
+setup_logging(level=logging.INFO, fmt=os.environ.get('LOG_FORMAT', 'text'))
 logger = logging.getLogger(__name__)
 
+# Metrics exported on /metrics
+REGISTRY = Registry()
+HANDLER_SECONDS = REGISTRY.histogram("bot_handler_seconds", "Time spent handling an update", ("handler", "route"))
+HANDLERS_IN_FLIGHT = REGISTRY.gauge("bot_handlers_in_flight", "Updates currently inside a handler")
+TELEGRAM_API_SECONDS = REGISTRY.histogram("bot_telegram_api_seconds", "Bot API request duration", ("method", "status"))
+REGISTRY.gauge("bot_updates_in_flight", "Updates queued or being processed",
+               lambda: UPDATE_QUEUE.in_flight if UPDATE_QUEUE else 0)
+REGISTRY.counter("bot_updates_throttled_total", "Times the update queue was full and applied backpressure",
+                 read=lambda: UPDATE_QUEUE.throttled_puts if UPDATE_QUEUE else 0)
+REGISTRY.counter("bot_updates_duplicate_total", "Button presses dropped as double taps",
+                 read=lambda: USER_LIMITER.duplicates if USER_LIMITER else 0)
+REGISTRY.counter("bot_updates_user_throttled_total", "Updates dropped by the per-user rate limit",
+                 read=lambda: USER_LIMITER.throttled if USER_LIMITER else 0)
+REGISTRY.counter("bot_updates_banned_total", "Updates dropped from temporarily banned users",
+                 read=lambda: USER_LIMITER.dropped_banned if USER_LIMITER else 0)
+REGISTRY.counter("bot_user_bans_total", "Temporary bans for flooding", read=lambda: USER_LIMITER.bans if USER_LIMITER else 0)
+REGISTRY.gauge("bot_users_banned", "Users currently banned", lambda: USER_LIMITER.banned if USER_LIMITER else 0)
+REGISTRY.gauge("bot_user_limiter_users", "Users tracked by the per-user rate limit",
+               lambda: len(USER_LIMITER) if USER_LIMITER else 0)
+REGISTRY.counter("bot_inline_queries_debounced_total", "Inline queries dropped because the user kept typing",
+                 read=lambda: UPDATE_PROCESSOR.debounced if UPDATE_PROCESSOR else 0)
+REGISTRY.counter("bot_inline_cache_hits_total", "Inline query result cache hits", read=lambda: INLINE_CACHE.hits)
+REGISTRY.counter("bot_inline_cache_misses_total", "Inline query result cache misses", read=lambda: INLINE_CACHE.misses)
+REGISTRY.counter("bot_keyboard_cache_hits_total", "Keyboard cache hits", read=lambda: KEYBOARD_CACHE.hits)
+REGISTRY.counter("bot_keyboard_cache_misses_total", "Keyboard cache misses", read=lambda: KEYBOARD_CACHE.misses)
+REGISTRY.gauge("bot_keyboard_cache_hit_ratio", "Keyboard cache hit ratio", lambda: KEYBOARD_CACHE.hit_ratio)
+REGISTRY.gauge("bot_user_cache_users", "Users held in the in-memory user cache", lambda: len(USER_STORE))
+REGISTRY.counter("bot_user_cache_evictions_total", "Users evicted from the user cache", read=lambda: USER_STORE.evictions)
+REGISTRY.gauge("bot_outbound_queue_depth", "Bot API calls waiting for the rate limiter", lambda: RATE_LIMITER.queue_depth)
+REGISTRY.counter("bot_outbound_throttled_seconds_total", "Time Bot API calls spent waiting for the rate limiter",
+                 read=lambda: RATE_LIMITER.throttled_seconds)
+REGISTRY.counter("bot_outbound_retries_total", "Bot API calls retried after a 429", read=lambda: RATE_LIMITER.retries)
+REGISTRY.gauge("bot_links_watched", "Download links checked in the background", lambda: len(LINK_HEALTH))
+REGISTRY.gauge("bot_links_broken", "Download links that failed their last check", lambda: LINK_HEALTH.broken)
+REGISTRY.counter("bot_link_checks_total", "Download link checks sent", read=lambda: LINK_HEALTH.checks)
+REGISTRY.counter("bot_link_check_failures_total", "Download link checks that got no response",
+                 read=lambda: LINK_HEALTH.failures)
+REGISTRY.counter("bot_document_uploads_total", "Papers uploaded to Telegram", read=lambda: DOCUMENT_SENDER.uploads)
+REGISTRY.counter("bot_document_cached_sends_total", "Papers sent by stored file_id",
+                 read=lambda: DOCUMENT_SENDER.cached_sends)
+REGISTRY.gauge("bot_document_upload_queue_depth", "Uploads waiting for a free upload slot", lambda: DOCUMENT_SENDER.waiting)
+REGISTRY.gauge("bot_document_file_ids", "Papers with a stored Telegram file_id", lambda: len(DOCUMENT_SENDER))
+REGISTRY.counter("bot_analytics_events_total", "Usage events recorded", read=lambda: ANALYTICS.recorded)
+REGISTRY.counter("bot_analytics_events_dropped_total", "Usage events dropped because the buffer was full",
+                 read=lambda: ANALYTICS.dropped)
+REGISTRY.counter("bot_analytics_events_written_total", "Usage events written to the analytics store",
+                 read=lambda: ANALYTICS.written)
+REGISTRY.gauge("bot_analytics_events_buffered", "Usage events waiting to be written", lambda: len(ANALYTICS))
+SHARED_CHANGES_APPLIED = REGISTRY.counter("bot_shared_changes_applied_total", "Changes from other workers applied",
+                                          ("channel",))
+SHARED_STATE_RELOADS = REGISTRY.counter("bot_shared_state_reloads_total",
+                                        "Full reloads after missing changes from other workers", ("channel",))
+
+# Callback opcodes. They are written into callback_data on buttons users
+# already have, so existing values must never change.
+OP_MAIN_MENU = 0
+OP_LANG = 1
+OP_CLASS = 2
+OP_SUBJECT = 3
+OP_YEAR = 4
+OP_BACK_TO_CLASS = 5
+OP_BACK_TO_SUBJECT = 6
+OP_ADMIN_ADD = 7
+OP_ADMIN_VIEW = 8
+OP_ADMIN_PANEL = 9
+OP_SEARCH = 10
+
+# Argument shapes each opcode accepts; anything else decodes to None and shows the main menu
+CALLBACK_ARGUMENTS = {
+    OP_MAIN_MENU: (None,),
+    OP_LANG: (LITERAL,),
+    OP_CLASS: (1,),
+    OP_SUBJECT: (2,),
+    OP_YEAR: (3,),
+    OP_BACK_TO_CLASS: (None,),
+    OP_BACK_TO_SUBJECT: (1,),
+    OP_ADMIN_ADD: (None,),
+    OP_ADMIN_VIEW: (None, LITERAL),
+    OP_ADMIN_PANEL: (None,),
+    OP_SEARCH: (None,),
+}
+
+# Route label reported for each opcode; anything else is "other"
+CALLBACK_ROUTES = {
+    OP_MAIN_MENU: "main", OP_LANG: "lang", OP_CLASS: "class", OP_SUBJECT: "subject", OP_YEAR: "year",
+    OP_BACK_TO_CLASS: "back", OP_BACK_TO_SUBJECT: "back",
+    OP_ADMIN_ADD: "admin", OP_ADMIN_VIEW: "admin", OP_ADMIN_PANEL: "admin", OP_SEARCH: "search",
+}
+
+def callback_route(update: Update) -> str:
+    callback = CALLBACK_CODEC.decode(update.callback_query.data)
+    return CALLBACK_ROUTES.get(callback[0], "other") if callback else "other"
+
+def timed(handler_name: str, route=None):
+    """Record a handler's latency in HANDLER_SECONDS"""
+    return instrument(HANDLER_SECONDS, HANDLERS_IN_FLIGHT, handler_name, route)
+
 # Configuration - Using environment variables for security
 BOT_TOKEN = os.environ.get('BOT_TOKEN', '7526389597:AAHixmzjTvtFDC8uuSWGQbnECYHnyFV_qD4')
 ADMIN_USER_ID = int(os.environ.get('ADMIN_USER_ID', '6645404238'))
 BASE_URL = os.environ.get('BASE_URL', 'https://doubtsolved.netlify.app/papers')
+CATALOG_DB_PATH = os.environ.get('CATALOG_DB_PATH', 'catalog.db')
+IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', '500'))
+MAX_IMPORT_ERRORS_SHOWN = 20
+USER_DB_PATH = os.environ.get('USER_DB_PATH', 'users.db')
+USER_CACHE_MAX_BYTES = int(os.environ.get('USER_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+USER_FLUSH_INTERVAL = int(os.environ.get('USER_FLUSH_INTERVAL', '30'))  # seconds
+LOCALE_DIR = os.environ.get('LOCALE_DIR', 'locales')  # extra languages as <lang>.json, loaded on first use
+
+# Webhook mode (opt-in): set WEBHOOK_URL to the service's public URL
+WEBHOOK_URL = os.environ.get('WEBHOOK_URL', '').rstrip('/')
+WEBHOOK_PATH = os.environ.get('WEBHOOK_PATH', '/telegram')
+# Telegram sends the secret with every update, and requests without it are rejected. Without one,
+# anyone who finds WEBHOOK_PATH could post updates as the admin, so a random secret is generated
+# at each start when it is unset. Set it explicitly when several processes serve one WEBHOOK_URL.
+WEBHOOK_SECRET = os.environ.get('WEBHOOK_SECRET') or (secrets.token_urlsafe(32) if WEBHOOK_URL else None)
+PORT = int(os.environ.get('PORT', '8080'))
+# Health checks in polling mode: "asyncio" serves them from the bot's event loop, "flask" from a Flask thread
+HEALTH_SERVER = os.environ.get('HEALTH_SERVER', 'asyncio')
+
+# Concurrent update processing: handlers run in parallel across users, in order per user
+UPDATE_WORKERS = int(os.environ.get('UPDATE_WORKERS', '8'))
+MAX_PENDING_UPDATES = int(os.environ.get('MAX_PENDING_UPDATES', '256'))
+UPDATE_QUEUE: Optional[BoundedUpdateQueue] = None  # set by build_application
+UPDATE_PROCESSOR: Optional[PerUserUpdateProcessor] = None  # set by build_application
 
-# Data structure for storing question papers
-QUESTION_PAPERS = {
+# Per-user limits on incoming updates (inline queries are debounced instead); USER_RATE=0 turns them off
+USER_RATE = float(os.environ.get('USER_RATE', '1'))  # updates per second, sustained
+USER_BURST = int(os.environ.get('USER_BURST', '8'))
+DUPLICATE_CALLBACK_WINDOW = float(os.environ.get('DUPLICATE_CALLBACK_WINDOW', '1'))  # seconds a double tap is ignored
+USER_BAN_AFTER = int(os.environ.get('USER_BAN_AFTER', '30'))  # throttled updates within a minute
+USER_BAN_SECONDS = float(os.environ.get('USER_BAN_SECONDS', '300'))
+USER_LIMITER = UserRateLimiter(
+    rate=USER_RATE,
+    burst=USER_BURST,
+    duplicate_window=DUPLICATE_CALLBACK_WINDOW,
+    ban_after=USER_BAN_AFTER,
+    ban_seconds=USER_BAN_SECONDS,
+    exempt=(ADMIN_USER_ID,)
+) if USER_RATE > 0 else None
+
+# Inline mode (@bot math 10 2023); needs /setinline in BotFather
+INLINE_DEBOUNCE = float(os.environ.get('INLINE_DEBOUNCE', '0.3'))  # seconds a query waits for the next keystroke
+INLINE_CACHE_TIME = int(os.environ.get('INLINE_CACHE_TIME', '300'))  # seconds Telegram may cache an answer
+INLINE_CACHE_SIZE = int(os.environ.get('INLINE_CACHE_SIZE', '4096'))
+INLINE_MAX_RESULTS = 20
+
+# Outbound Bot API calls: Telegram allows ~30 messages/s overall and ~1/s per chat
+OUTBOUND_GLOBAL_RATE = float(os.environ.get('OUTBOUND_GLOBAL_RATE', '30'))
+OUTBOUND_CHAT_RATE = float(os.environ.get('OUTBOUND_CHAT_RATE', '1'))
+OUTBOUND_CHAT_BURST = float(os.environ.get('OUTBOUND_CHAT_BURST', '3'))
+OUTBOUND_POOL_SIZE = int(os.environ.get('OUTBOUND_POOL_SIZE', str(max(8, UPDATE_WORKERS * 2))))
+TELEGRAM_API_BASE_URL = os.environ.get('TELEGRAM_API_BASE_URL', '').rstrip('/')  # e.g. a local stub server
+
+RATE_LIMITER = OutboundRateLimiter(
+    global_rate=OUTBOUND_GLOBAL_RATE,
+    per_chat_rate=OUTBOUND_CHAT_RATE,
+    per_chat_burst=OUTBOUND_CHAT_BURST
+)
+
+# Background HEAD checks of download links; LINK_CHECK_INTERVAL=0 turns them off
+LINK_CHECK_INTERVAL = float(os.environ.get('LINK_CHECK_INTERVAL', '60'))  # seconds between passes
+LINK_CHECK_TTL = float(os.environ.get('LINK_CHECK_TTL', str(6 * 3600)))  # seconds before a link is re-checked
+LINK_CHECK_CONCURRENCY = int(os.environ.get('LINK_CHECK_CONCURRENCY', '16'))
+LINK_CHECK_BATCH_SIZE = int(os.environ.get('LINK_CHECK_BATCH_SIZE', '200'))
+
+LINK_HEALTH = LinkHealth(
+    ttl=LINK_CHECK_TTL,
+    interval=LINK_CHECK_INTERVAL,
+    concurrency=LINK_CHECK_CONCURRENCY,
+    batch_size=LINK_CHECK_BATCH_SIZE
+)
+
+# Paper delivery: "link" sends a download link, "document" sends the PDF itself through Telegram
+DELIVERY_MODE = os.environ.get('DELIVERY_MODE', 'link')
+PAPERS_DIR = os.environ.get('PAPERS_DIR') or None  # local copies of the papers, uploaded from disk when present
+UPLOAD_CONCURRENCY = int(os.environ.get('UPLOAD_CONCURRENCY', '2'))
+
+# Usage analytics: events are buffered in memory and written to ANALYTICS_DB_PATH in batches
+ANALYTICS_DB_PATH = os.environ.get('ANALYTICS_DB_PATH', 'analytics.db')
+ANALYTICS_BUFFER_SIZE = int(os.environ.get('ANALYTICS_BUFFER_SIZE', '100000'))  # events; oldest dropped when full
+ANALYTICS_FLUSH_INTERVAL = float(os.environ.get('ANALYTICS_FLUSH_INTERVAL', '5'))  # seconds
+ANALYTICS_RETENTION_DAYS = int(os.environ.get('ANALYTICS_RETENTION_DAYS', '30'))  # raw events; rollups are kept
+STATS_DEFAULT_DAYS = 7
+STATS_TOP_N = 10
+
+ANALYTICS = Analytics(
+    AnalyticsStore(ANALYTICS_DB_PATH, retention_days=ANALYTICS_RETENTION_DAYS),
+    capacity=ANALYTICS_BUFFER_SIZE,
+    interval=ANALYTICS_FLUSH_INTERVAL
+)
+
+# Menu order by recent downloads: subjects most downloaded lately come first, and the
+# class menu starts with shortcuts to trending papers
+POPULARITY_HALF_LIFE_DAYS = float(os.environ.get('POPULARITY_HALF_LIFE_DAYS', '7'))
+POPULARITY_REFRESH_INTERVAL = float(os.environ.get('POPULARITY_REFRESH_INTERVAL', '60'))  # seconds between menu reorders
+TRENDING_SIZE = int(os.environ.get('TRENDING_SIZE', '3'))  # 0 hides the trending shortcuts
+
+POPULARITY = Popularity(half_life=POPULARITY_HALF_LIFE_DAYS * SECONDS_PER_DAY, trending_size=TRENDING_SIZE)
+
+# Shared state for running several workers: "" keeps everything in this process,
+# "sqlite:///shared.db" or "redis://host:6379/0" shares it between processes. All workers must use the
+# same CATALOG_DB_PATH and USER_DB_PATH files: catalog changes are announced on the feeds but read from those.
+SHARED_STATE_URL = os.environ.get('SHARED_STATE_URL', '')
+SHARED_SYNC_INTERVAL = float(os.environ.get('SHARED_SYNC_INTERVAL', '1'))  # seconds between reads of other workers' changes
+SEARCH_PROMPT_TTL = 600  # seconds a "send your search query" prompt stays active
+
+SHARED_STATE = open_shared_state(SHARED_STATE_URL)
+
+# Change feeds read by every worker: catalog rows added, users whose language changed
+CATALOG_CHANNEL = "catalog"
+USERS_CHANNEL = "users"
+SHARED_POSITIONS: Dict[str, int] = {}  # channel -> last change applied by this worker
+PUBLISHED_CHANGES = set()  # (channel, seq) of this worker's own changes, already applied
+
+# Papers written to the catalog store on startup; rows already stored are kept
+SEED_PAPERS = {
     "6": {
         "Mathematics": {"2023": "class6/math/2023.pdf", "2022": "class6/math/2022.pdf"},
         "Science": {"2023": "class6/science/2023.pdf", "2022": "class6/science/2022.pdf"},
@@ -90,9 +326,34 @@ QUESTION_PAPERS = {
     }
 }
 
+# Persistent catalog, loaded into QUESTION_PAPERS at startup
+CATALOG_STORE = CatalogStore(CATALOG_DB_PATH)
+
+# In-memory copy of the catalog: class -> subject -> year -> file path
+QUESTION_PAPERS: Dict[str, Dict[str, Dict[str, str]]] = {}
+
+# Paper counts and admin catalog pages; built on the first admin view, then updated by add_paper
+CATALOG_SUMMARY = None
+
+# Search index over QUESTION_PAPERS, built at startup and updated by add_paper
+SEARCH_INDEX = SearchIndex()
+
+# Menu keyboards, invalidated by add_paper when the part of the catalog they show changes
+KEYBOARD_CACHE = KeyboardCache()
+
+# Encodes button callback_data using tokens from CATALOG_STORE
+CALLBACK_CODEC = CallbackCodec(CALLBACK_ARGUMENTS)
+
+# Inline query answers by (normalized query, language), cleared when the catalog changes
+INLINE_CACHE = QueryCache(INLINE_CACHE_SIZE, ttl=INLINE_CACHE_TIME)
+
+# Sends papers as documents in DELIVERY_MODE "document", reusing stored file_ids
+DOCUMENT_SENDER = DocumentSender(CATALOG_STORE, PAPERS_DIR, concurrency=UPLOAD_CONCURRENCY)
+
 # Multi-language support
 MESSAGES = {
     "en": {
+        "language_name": "🇬🇧 English",
         "welcome": "🎓 Welcome to Question Paper Bot!\n\nI can help you download previous year question papers for Classes 6-12.\n\nChoose your preferred language:",
         "language_set": "✅ Language set to English\n\nLet's get started! Choose your class:",
         "choose_class": "📚 Choose your class:",
@@ -100,22 +361,40 @@ MESSAGES = {
         "choose_year": "📅 Choose the year for {subject} - Class {class_num}:",
         "download_link": "📥 Here's your download link:\n\n**{subject} - Class {class_num} ({year})**\n\n🔗 [Download PDF]({url})",
         "paper_not_found": "❌ Sorry, this paper is not available yet.",
+        "file_size": "\n📦 Size: {size}",
+        "document_caption": "📄 {subject} - Class {class_num} ({year})",
+        "link_broken": "\n\n⚠️ This link did not work when we last checked it. Please try again later.",
         "main_menu": "🏠 Main Menu",
         "back": "⬅️ Back",
         "search": "🔍 Search",
         "search_prompt": "🔍 Enter your search query (e.g., 'Math 2022 Class 10'):",
         "search_results": "🔍 Search Results for '{query}':",
         "no_results": "❌ No results found for '{query}'",
+        "inline_description": "Class {class_num} • {year}",
         "admin_panel": "🛠️ Admin Panel",
         "admin_welcome": "🛠️ Admin Panel\n\nChoose an action:",
         "add_paper": "➕ Add Paper",
         "view_papers": "📋 View Papers",
+        "trending_paper": "🔥 {subject} - Class {class_num} ({year})",
+        "previous_page": "◀️ Previous",
+        "next_page": "Next ▶️",
         "unauthorized": "❌ Unauthorized access!",
-        "add_paper_format": "To add a new paper, send the details in this format:\n\n`/add_paper Class|Subject|Year|FileURL`\n\nExample:\n`/add_paper 10|Mathematics|2024|class10/math/2024.pdf`",
+        "add_paper_format": "To add a new paper, send the details in this format:\n\n`/add_paper Class|Subject|Year|FileURL`\n\nExample:\n`/add_paper 10|Mathematics|2024|class10/math/2024.pdf`\n\nTo add many papers at once, upload a `.csv` or `.jsonl` file with the columns `class,subject,year,file_url`.\nUse /export\\_papers (or `/export_papers jsonl`) to download the catalog.",
         "paper_added": "✅ Paper added successfully!\n\nClass: {class_num}\nSubject: {subject}\nYear: {year}",
-        "paper_add_error": "❌ Error adding paper. Please check the format."
+        "paper_add_error": "❌ Error adding paper. Please check the format.",
+        "import_started": "⏳ Importing papers...",
+        "import_summary": "📥 Import finished\n\nAdded/updated: {added}\nRejected rows: {rejected}",
+        "import_errors": "Errors:\n{errors}",
+        "import_more_errors": "...and {count} more",
+        "import_bad_format": "❌ Please upload a .csv or .jsonl file.",
+        "export_caption": "📤 Catalog export: {count} papers",
+        "stats_summary": "📊 Usage in the last {days} days\n\nStarts: {starts}\nSearches: {searches} ({misses} without results)\nDownloads: {downloads}",
+        "stats_top_papers": "🏆 Most downloaded:\n{papers}",
+        "stats_search_misses": "🔎 Searches without results:\n{queries}",
+        "stats_none": "none yet"
     },
     "hi": {
+        "language_name": "🇮🇳 हिंदी",
         "welcome": "🎓 प्रश्न पत्र बॉट में आपका स्वागत है!\n\nमैं आपको कक्षा 6-12 के पिछले वर्ष के प्रश्न पत्र डाउनलोड करने में मदद कर सकता हूं।\n\nअपनी पसंदीदा भाषा चुनें:",
         "language_set": "✅ भाषा हिंदी में सेट की गई\n\nचलिए शुरू करते हैं! अपनी कक्षा चुनें:",
         "choose_class": "📚 अपनी कक्षा चुनें:",
@@ -123,72 +402,332 @@ MESSAGES = {
         "choose_year": "📅 {subject} - कक्षा {class_num} के लिए वर्ष चुनें:",
         "download_link": "📥 यहाँ आपका डाउनलोड लिंक है:\n\n**{subject} - कक्षा {class_num} ({year})**\n\n🔗 [PDF डाउनलोड करें]({url})",
         "paper_not_found": "❌ क्षमा करें, यह प्रश्न पत्र अभी तक उपलब्ध नहीं है।",
+        "file_size": "\n📦 आकार: {size}",
+        "document_caption": "📄 {subject} - कक्षा {class_num} ({year})",
+        "link_broken": "\n\n⚠️ पिछली जाँच में यह लिंक काम नहीं कर रहा था। कृपया बाद में पुनः प्रयास करें।",
         "main_menu": "🏠 मुख्य मेनू",
         "back": "⬅️ वापस",
         "search": "🔍 खोजें",
         "search_prompt": "🔍 अपनी खोज क्वेरी दर्ज करें (जैसे 'गणित 2022 कक्षा 10'):",
         "search_results": "🔍 '{query}' के लिए खोज परिणाम:",
         "no_results": "❌ '{query}' के लिए कोई परिणाम नहीं मिला",
+        "inline_description": "कक्षा {class_num} • {year}",
         "admin_panel": "🛠️ एडमिन पैनल",
         "admin_welcome": "🛠️ एडमिन पैनल\n\nकोई कार्य चुनें:",
         "add_paper": "➕ प्रश्न पत्र जोड़ें",
         "view_papers": "📋 प्रश्न पत्र देखें",
+        "trending_paper": "🔥 {subject} - कक्षा {class_num} ({year})",
+        "previous_page": "◀️ पिछला",
+        "next_page": "अगला ▶️",
         "unauthorized": "❌ अनधिकृत पहुंच!",
-        "add_paper_format": "नया प्रश्न पत्र जोड़ने के लिए, इस प्रारूप में विवरण भेजें:\n\n`/add_paper Class|Subject|Year|FileURL`\n\nउदाहरण:\n`/add_paper 10|Mathematics|2024|class10/math/2024.pdf`",
+        "add_paper_format": "नया प्रश्न पत्र जोड़ने के लिए, इस प्रारूप में विवरण भेजें:\n\n`/add_paper Class|Subject|Year|FileURL`\n\nउदाहरण:\n`/add_paper 10|Mathematics|2024|class10/math/2024.pdf`\n\nएक साथ कई प्रश्न पत्र जोड़ने के लिए `class,subject,year,file_url` कॉलम वाली `.csv` या `.jsonl` फ़ाइल अपलोड करें।\nकैटलॉग डाउनलोड करने के लिए /export\\_papers (या `/export_papers jsonl`) का उपयोग करें।",
         "paper_added": "✅ प्रश्न पत्र सफलतापूर्वक जोड़ा गया!\n\nकक्षा: {class_num}\nविषय: {subject}\nवर्ष: {year}",
-        "paper_add_error": "❌ प्रश्न पत्र जोड़ने में त्रुटि। कृपया प्रारूप जांचें।"
+        "paper_add_error": "❌ प्रश्न पत्र जोड़ने में त्रुटि। कृपया प्रारूप जांचें।",
+        "import_started": "⏳ प्रश्न पत्र आयात किए जा रहे हैं...",
+        "import_summary": "📥 आयात पूरा हुआ\n\nजोड़े/अपडेट किए गए: {added}\nअस्वीकृत पंक्तियाँ: {rejected}",
+        "import_errors": "त्रुटियाँ:\n{errors}",
+        "import_more_errors": "...और {count} अन्य",
+        "import_bad_format": "❌ कृपया .csv या .jsonl फ़ाइल अपलोड करें।",
+        "export_caption": "📤 कैटलॉग निर्यात: {count} प्रश्न पत्र",
+        "stats_summary": "📊 पिछले {days} दिनों का उपयोग\n\nशुरुआत: {starts}\nखोजें: {searches} ({misses} बिना परिणाम)\nडाउनलोड: {downloads}",
+        "stats_top_papers": "🏆 सबसे अधिक डाउनलोड:\n{papers}",
+        "stats_search_misses": "🔎 बिना परिणाम वाली खोजें:\n{queries}",
+        "stats_none": "अभी कुछ नहीं"
     }
 }
 
-# User data storage (in production, use a proper database)
-user_data = {}
+# User language preferences: LRU-capped in memory, written to disk in batches
+# MESSAGES compiled once; placeholders are checked here, so a bad template fails at startup
+TRANSLATIONS = Translations(MESSAGES, "en", LOCALE_DIR)
+
+USER_STORE = UserStore(USER_DB_PATH, TRANSLATIONS.languages, max_bytes=USER_CACHE_MAX_BYTES)
 
 def get_user_language(user_id: int) -> str:
-    return user_data.get(user_id, {}).get('language', 'en')
+    return USER_STORE.get_language(user_id)
+
+async def set_user_language(user_id: int, language: str):
+    USER_STORE.set_language(user_id, language)
+    # Other workers cache the new language as published; it reaches disk with the next flush here
+    await publish_change(USERS_CHANNEL, [user_id, language])
 
-def set_user_language(user_id: int, language: str):
-    if user_id not in user_data:
-        user_data[user_id] = {}
-    user_data[user_id]['language'] = language
+async def flush_user_store():
+    """Periodically write buffered language changes to disk"""
+    while True:
+        await asyncio.sleep(USER_FLUSH_INTERVAL)
+        try:
+            await asyncio.to_thread(USER_STORE.flush)
+        except Exception as e:
+            logger.error("Failed to flush user store", extra={"error": str(e)})
+
+async def follow_shared_changes():
+    """Periodically apply catalog and language changes made by other workers"""
+    while True:
+        await asyncio.sleep(SHARED_SYNC_INTERVAL)
+        try:
+            await apply_shared_changes()
+        except Exception as e:
+            logger.error("Failed to apply shared changes", extra={"error": str(e)})
+
+async def refresh_popularity():
+    """Periodically reorder menus by recent downloads"""
+    while True:
+        await asyncio.sleep(POPULARITY_REFRESH_INTERVAL)
+        apply_popularity()
+
+async def post_init(application: Application):
+    """Start background tasks and, when polling, the health server once the bot's event loop is running"""
+    STARTUP.mark("connect to Telegram")
+    if not WEBHOOK_URL and HEALTH_SERVER == "asyncio":
+        server = HttpServer()
+        add_health_routes(server)
+        await server.start("0.0.0.0", PORT)
+        application.bot_data['health_server'] = server
+    tasks = [asyncio.create_task(flush_user_store())]
+    tasks.append(asyncio.create_task(keep_alive()))
+    if LINK_CHECK_INTERVAL > 0:
+        tasks.append(asyncio.create_task(LINK_HEALTH.run()))
+    if SHARED_STATE.shared:
+        tasks.append(asyncio.create_task(follow_shared_changes()))
+    tasks.append(asyncio.create_task(ANALYTICS.run()))
+    tasks.append(asyncio.create_task(refresh_popularity()))
+    application.bot_data['background_tasks'] = tasks
+
+async def post_shutdown(application: Application):
+    """Stop background tasks and flush pending state"""
+    for task in application.bot_data.get('background_tasks', []):
+        task.cancel()
+    if 'health_server' in application.bot_data:
+        await application.bot_data['health_server'].stop()
+    await LINK_HEALTH.close()
+    await DOCUMENT_SENDER.close()
+    USER_STORE.close()
+    ANALYTICS.close()
+    SHARED_STATE.close()
+
+# Bound directly, without a wrapper: static labels are looked up for every keyboard button
+get_language_message = TRANSLATIONS.get
 
 def get_message(user_id: int, key: str, **kwargs) -> str:
-    lang = get_user_language(user_id)
-    message = MESSAGES[lang].get(key, MESSAGES['en'][key])
-    return message.format(**kwargs) if kwargs else message
+    return TRANSLATIONS.get(get_user_language(user_id), key, **kwargs)
+
+def paper_url(file_path: str) -> str:
+    return f"{BASE_URL}/{file_path}"
+
+def load_catalog():
+    """Seed the catalog store and load it into memory"""
+    global CATALOG_SUMMARY
+    # Changes published from here on are applied on top of what is loaded now
+    SHARED_POSITIONS[CATALOG_CHANNEL] = SHARED_STATE.last_seq(CATALOG_CHANNEL)
+    SHARED_POSITIONS.setdefault(USERS_CHANNEL, SHARED_STATE.last_seq(USERS_CHANNEL))
+    CATALOG_STORE.seed(SEED_PAPERS)
+    QUESTION_PAPERS.clear()
+    QUESTION_PAPERS.update(CATALOG_STORE.load())
+    CALLBACK_CODEC.load(CATALOG_STORE.load_tokens())
+    SEARCH_INDEX.build(QUESTION_PAPERS)
+    CATALOG_SUMMARY = None
+    KEYBOARD_CACHE.clear()
+    INLINE_CACHE.clear()
+    if DELIVERY_MODE == "document":
+        DOCUMENT_SENDER.load()
+    LINK_HEALTH.watch(
+        paper_url(file_path)
+        for subjects in QUESTION_PAPERS.values()
+        for years in subjects.values()
+        for file_path in years.values()
+    )
+
+def get_catalog_summary():
+    """The admin catalog summary, built from QUESTION_PAPERS on first use"""
+    global CATALOG_SUMMARY
+    if CATALOG_SUMMARY is None:
+        from catalog_summary import CatalogSummary
+        CATALOG_SUMMARY = CatalogSummary()
+        CATALOG_SUMMARY.build(QUESTION_PAPERS)
+    return CATALOG_SUMMARY
+
+async def apply_papers(rows: List[PaperRow]):
+    """Save a batch of papers to the catalog store, update this worker's copy and tell the other workers"""
+    CATALOG_STORE.put_many(rows)
+    refresh_papers(rows)
+    await publish_change(CATALOG_CHANNEL, rows)
+
+def refresh_papers(rows: List[PaperRow]):
+    """Update the in-memory catalog, index and keyboards for papers already saved to the catalog store"""
+    # Collect stale keyboards so each one is dropped once per batch
+    stale_menus = set()
+    new_paths = []
+    for class_num, subject, year, file_path in rows:
+        if class_num not in QUESTION_PAPERS:
+            QUESTION_PAPERS[class_num] = {}
+            stale_menus.add(("class", None, None))
+            new_paths.append((class_num,))
+        if subject not in QUESTION_PAPERS[class_num]:
+            QUESTION_PAPERS[class_num][subject] = {}
+            stale_menus.add(("subject", class_num, None))
+            new_paths.append((class_num, subject))
+        if year not in QUESTION_PAPERS[class_num][subject]:
+            stale_menus.add(("year", class_num, subject))
+            new_paths.append((class_num, subject, year))
+            SEARCH_INDEX.add(class_num, subject, year)
+            if CATALOG_SUMMARY is not None:
+                CATALOG_SUMMARY.add(class_num, subject, year)
+        elif QUESTION_PAPERS[class_num][subject][year] != file_path:
+            LINK_HEALTH.discard(paper_url(QUESTION_PAPERS[class_num][subject][year]))
+        
+        QUESTION_PAPERS[class_num][subject][year] = file_path
+        LINK_HEALTH.watch([paper_url(file_path)])
+    
+    # Buttons for new classes, subjects and papers need their tokens before the keyboards are rebuilt
+    CALLBACK_CODEC.load(CATALOG_STORE.get_tokens(new_paths))
+    
+    for menu, class_num, subject in stale_menus:
+        KEYBOARD_CACHE.invalidate(menu, class_num, subject)
+    INLINE_CACHE.clear()
+
+def apply_popularity():
+    """Recompute menu orders and trending papers, dropping only the keyboards that change"""
+    changed_classes, trending_changed = POPULARITY.refresh(QUESTION_PAPERS)
+    for class_num in changed_classes:
+        KEYBOARD_CACHE.invalidate("subject", class_num)
+    if trending_changed:
+        KEYBOARD_CACHE.invalidate("class")
+
+def load_popularity():
+    """Start popularity from the download rollups"""
+    # Downloads older than 8 half-lives weigh less than 0.4% and are skipped
+    days = max(1, round(POPULARITY_HALF_LIFE_DAYS * 8))
+    for day, class_num, subject, year, count in ANALYTICS.store.daily_downloads(days):
+        POPULARITY.record(class_num, subject, year, count, at=(day + 0.5) * SECONDS_PER_DAY)
+    apply_popularity()
+
+async def call_shared_state(method, *args, **kwargs):
+    """Call a SHARED_STATE method; stores shared with other processes are called from a thread"""
+    if SHARED_STATE.shared:
+        # May wait on another process's SQLite write lock, or on the network for Redis
+        return await asyncio.to_thread(method, *args, **kwargs)
+    return method(*args, **kwargs)
 
-def keep_alive():
-    """Keep the service alive by pinging itself"""
+async def publish_change(channel: str, change):
+    """Tell other workers about a change this worker has already applied"""
+    if SHARED_STATE.shared:
+        seq = await call_shared_state(SHARED_STATE.publish, channel, json.dumps(change))
+        PUBLISHED_CHANGES.add((channel, seq))
+
+async def apply_shared_changes():
+    """Apply changes other workers published since the last call"""
+    for channel in (CATALOG_CHANNEL, USERS_CHANNEL):
+        after = SHARED_POSITIONS.get(channel, 0)
+        changes = await call_shared_state(SHARED_STATE.read, channel, after)
+        if changes and changes[0][0] != after + 1:
+            # Changes were dropped from the feed before this worker read them
+            SHARED_STATE_RELOADS.inc(channel)
+            logger.warning("Missed shared changes, reloading", extra={"channel": channel, "after": after})
+            if channel == CATALOG_CHANNEL:
+                load_catalog()
+                continue
+            USER_STORE.forget()
+            SHARED_POSITIONS[channel] = changes[0][0] - 1
+        for seq, message in changes:
+            if seq != SHARED_POSITIONS.get(channel, 0) + 1:
+                # A change numbered before this one is not stored yet; read on from here next time
+                break
+            SHARED_POSITIONS[channel] = seq
+            if (channel, seq) in PUBLISHED_CHANGES:
+                PUBLISHED_CHANGES.discard((channel, seq))
+                continue
+            if channel == CATALOG_CHANNEL:
+                rows = [tuple(row) for row in json.loads(message)]
+                if rows and CATALOG_STORE.get(*rows[0][:3]) is None:
+                    # Without the rows (and their callback tokens) the menus can't be built
+                    logger.error("Shared catalog change is missing from the catalog database; "
+                                 "all workers must use the same CATALOG_DB_PATH", extra={"seq": seq})
+                    continue
+                refresh_papers(rows)
+            else:
+                USER_STORE.cache_language(*json.loads(message))
+            SHARED_CHANGES_APPLIED.inc(channel)
+
+async def keep_alive():
+    """Keep the service alive by pinging itself from the bot's event loop"""
     service_url = os.environ.get('RENDER_EXTERNAL_URL')
-    if service_url:
+    if not service_url:
+        return
+    delay = 300  # The service has just started, so the first ping can wait too
+    async with httpx.AsyncClient(timeout=10) as client:
         while True:
+            await asyncio.sleep(delay)
             try:
-                requests.get(f"{service_url}/health", timeout=10)
-                print("🏓 Keep-alive ping sent")
-                time.sleep(300)  # Ping every 5 minutes
-            except Exception as e:
-                print(f"❌ Keep-alive ping failed: {e}")
-                time.sleep(60)  # Retry after 1 minute on error
+                await client.get(f"{service_url}/health")
+                logger.info("Keep-alive ping sent")
+                delay = 300  # Ping every 5 minutes
+            except httpx.HTTPError as e:
+                logger.warning("Keep-alive ping failed", extra={"error": str(e)})
+                delay = 60  # Retry after 1 minute on error
+
+async def home_route(headers: Dict[str, str], body: bytes):
+    return text_response(home())
+
+async def health_route(headers: Dict[str, str], body: bytes):
+    return json_response(health())
+
+async def metrics_route(headers: Dict[str, str], body: bytes):
+    return 200, "text/plain; version=0.0.4", REGISTRY.render().encode("utf-8")
+
+def add_health_routes(server: HttpServer):
+    server.add_route("GET", "/", home_route)
+    server.add_route("GET", "/health", health_route)
+    server.add_route("GET", "/metrics", metrics_route)
+
+async def run_webhook(application: Application):
+    """Receive updates and serve health checks from one asyncio HTTP server"""
+    async def handle_update(data: dict):
+        await application.update_queue.put(Update.de_json(data, application.bot))
+    
+    server = WebhookServer(handle_update, WEBHOOK_PATH, WEBHOOK_SECRET)
+    add_health_routes(server)
+    
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+    
+    async with application:
+        await post_init(application)
+        await application.start()
+        await server.start("0.0.0.0", PORT)
+        await application.bot.set_webhook(
+            f"{WEBHOOK_URL}{WEBHOOK_PATH}",
+            secret_token=WEBHOOK_SECRET,
+            allowed_updates=Update.ALL_TYPES
+        )
+        
+        print(f"✅ Bot is now running in webhook mode on port {PORT}")
+        print(f"🔗 Webhook URL: {WEBHOOK_URL}{WEBHOOK_PATH}")
+        print("🛑 Press Ctrl+C to stop the bot")
+        print("-" * 50)
+        
+        try:
+            await stop_event.wait()
+        finally:
+            await server.stop()
+            await application.stop()
+            await post_shutdown(application)
 
+@timed("start")
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Start command handler"""
     user_id = update.effective_user.id
     username = update.effective_user.username or "Unknown"
     
-    print(f"👤 User {username} (ID: {user_id}) started the bot")
-    
-    keyboard = [
-        [
-            InlineKeyboardButton("🇬🇧 English", callback_data="lang_en"),
-            InlineKeyboardButton("🇮🇳 हिंदी", callback_data="lang_hi")
-        ]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
+    logger.info("User started the bot", extra={"user_id": user_id, "username": username})
+    ANALYTICS.record(START, user_id)
     
     await update.message.reply_text(
-        MESSAGES['en']['welcome'],
-        reply_markup=reply_markup
+        get_language_message("en", "welcome"),
+        reply_markup=create_language_keyboard()
     )
 
+@timed("admin")
 async def admin(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Admin panel command"""
     user_id = update.effective_user.id
@@ -197,12 +736,12 @@ async def admin(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text(get_message(user_id, "unauthorized"))
         return
     
-    print(f"🛠️ Admin {user_id} accessed admin panel")
+    logger.info("Admin accessed admin panel", extra={"user_id": user_id})
     
     keyboard = [
-        [InlineKeyboardButton(get_message(user_id, "add_paper"), callback_data="admin_add")],
-        [InlineKeyboardButton(get_message(user_id, "view_papers"), callback_data="admin_view")],
-        [InlineKeyboardButton(get_message(user_id, "main_menu"), callback_data="main_menu")]
+        [InlineKeyboardButton(get_message(user_id, "add_paper"), callback_data=CALLBACK_CODEC.encode(OP_ADMIN_ADD))],
+        [InlineKeyboardButton(get_message(user_id, "view_papers"), callback_data=CALLBACK_CODEC.encode(OP_ADMIN_VIEW))],
+        [InlineKeyboardButton(get_message(user_id, "main_menu"), callback_data=CALLBACK_CODEC.encode(OP_MAIN_MENU))]
     ]
     reply_markup = InlineKeyboardMarkup(keyboard)
     
@@ -211,8 +750,10 @@ async def admin(update: Update, context: ContextTypes.DEFAULT_TYPE):
         reply_markup=reply_markup
     )
 
+@timed("add_paper")
 async def add_paper(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Add new paper command (admin only)"""
+    from catalog_io import validate_row  # admin only, so not loaded at startup
     user_id = update.effective_user.id
     
     if user_id != ADMIN_USER_ID:
@@ -228,16 +769,12 @@ async def add_paper(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     try:
         paper_info = " ".join(context.args)
-        class_num, subject, year, file_url = paper_info.split("|")
+        # Same checks as a bulk import: fields are stripped, non-empty and length-bounded
+        class_num, subject, year, file_url = validate_row(paper_info.split("|"))
         
-        if class_num not in QUESTION_PAPERS:
-            QUESTION_PAPERS[class_num] = {}
-        if subject not in QUESTION_PAPERS[class_num]:
-            QUESTION_PAPERS[class_num][subject] = {}
-        
-        QUESTION_PAPERS[class_num][subject][year] = file_url
+        await apply_papers([(class_num, subject, year, file_url)])
         
-        print(f"📄 Paper added: Class {class_num} - {subject} - {year}")
+        logger.info("Paper added", extra={"class_num": class_num, "subject": subject, "year": year})
         
         await update.message.reply_text(
             get_message(user_id, "paper_added", class_num=class_num, subject=subject, year=year)
@@ -246,13 +783,29 @@ async def add_paper(update: Update, context: ContextTypes.DEFAULT_TYPE):
     except ValueError:
         await update.message.reply_text(get_message(user_id, "paper_add_error"))
 
-def create_class_keyboard(user_id: int) -> InlineKeyboardMarkup:
-    """Create keyboard for class selection"""
+def build_language_keyboard() -> InlineKeyboardMarkup:
+    """Build keyboard for language selection, two languages per row"""
+    buttons = [
+        InlineKeyboardButton(get_language_message(lang, "language_name"),
+                             callback_data=CALLBACK_CODEC.encode_literal(OP_LANG, lang))
+        for lang in TRANSLATIONS.languages
+    ]
+    return InlineKeyboardMarkup([buttons[i:i + 2] for i in range(0, len(buttons), 2)])
+
+def build_class_keyboard(lang: str, is_admin: bool) -> InlineKeyboardMarkup:
+    """Build keyboard for class selection"""
     keyboard = []
-    row = []
     
-    for i, class_num in enumerate(sorted(QUESTION_PAPERS.keys())):
-        row.append(InlineKeyboardButton(f"Class {class_num}", callback_data=f"class_{class_num}"))
+    # Shortcuts straight to the most downloaded papers, so most users skip the menus
+    for class_num, subject, year in POPULARITY.trending:
+        keyboard.append([InlineKeyboardButton(
+            get_language_message(lang, "trending_paper", subject=subject, class_num=class_num, year=year),
+            callback_data=CALLBACK_CODEC.encode(OP_YEAR, (class_num, subject, year))
+        )])
+    
+    row = []
+    for i, class_num in enumerate(sorted(QUESTION_PAPERS.keys(), key=class_sort_key)):
+        row.append(InlineKeyboardButton(f"Class {class_num}", callback_data=CALLBACK_CODEC.encode(OP_CLASS, (class_num,))))
         if (i + 1) % 3 == 0:  # 3 buttons per row
             keyboard.append(row)
             row = []
@@ -261,37 +814,37 @@ def create_class_keyboard(user_id: int) -> InlineKeyboardMarkup:
         keyboard.append(row)
     
     # Add search and admin panel buttons
-    keyboard.append([InlineKeyboardButton(get_message(user_id, "search"), callback_data="search")])
+    keyboard.append([InlineKeyboardButton(get_language_message(lang, "search"), callback_data=CALLBACK_CODEC.encode(OP_SEARCH))])
     
     # Add admin panel button only for admin
-    if user_id == ADMIN_USER_ID:
-        keyboard.append([InlineKeyboardButton(get_message(user_id, "admin_panel"), callback_data="admin_panel")])
+    if is_admin:
+        keyboard.append([InlineKeyboardButton(get_language_message(lang, "admin_panel"), callback_data=CALLBACK_CODEC.encode(OP_ADMIN_PANEL))])
     
-    keyboard.append([InlineKeyboardButton(get_message(user_id, "main_menu"), callback_data="main_menu")])
+    keyboard.append([InlineKeyboardButton(get_language_message(lang, "main_menu"), callback_data=CALLBACK_CODEC.encode(OP_MAIN_MENU))])
     
     return InlineKeyboardMarkup(keyboard)
 
-def create_subject_keyboard(user_id: int, class_num: str) -> InlineKeyboardMarkup:
-    """Create keyboard for subject selection"""
+def build_subject_keyboard(lang: str, class_num: str) -> InlineKeyboardMarkup:
+    """Build keyboard for subject selection"""
     keyboard = []
     
-    for subject in QUESTION_PAPERS[class_num].keys():
-        keyboard.append([InlineKeyboardButton(subject, callback_data=f"subject_{class_num}_{subject}")])
+    for subject in POPULARITY.subjects(class_num, QUESTION_PAPERS[class_num]):
+        keyboard.append([InlineKeyboardButton(subject, callback_data=CALLBACK_CODEC.encode(OP_SUBJECT, (class_num, subject)))])
     
-    keyboard.append([InlineKeyboardButton(get_message(user_id, "back"), callback_data="back_to_class")])
-    keyboard.append([InlineKeyboardButton(get_message(user_id, "main_menu"), callback_data="main_menu")])
+    keyboard.append([InlineKeyboardButton(get_language_message(lang, "back"), callback_data=CALLBACK_CODEC.encode(OP_BACK_TO_CLASS))])
+    keyboard.append([InlineKeyboardButton(get_language_message(lang, "main_menu"), callback_data=CALLBACK_CODEC.encode(OP_MAIN_MENU))])
     
     return InlineKeyboardMarkup(keyboard)
 
-def create_year_keyboard(user_id: int, class_num: str, subject: str) -> InlineKeyboardMarkup:
-    """Create keyboard for year selection"""
+def build_year_keyboard(lang: str, class_num: str, subject: str) -> InlineKeyboardMarkup:
+    """Build keyboard for year selection"""
     keyboard = []
     
     years = sorted(QUESTION_PAPERS[class_num][subject].keys(), reverse=True)
     row = []
     
     for i, year in enumerate(years):
-        row.append(InlineKeyboardButton(year, callback_data=f"year_{class_num}_{subject}_{year}"))
+        row.append(InlineKeyboardButton(year, callback_data=CALLBACK_CODEC.encode(OP_YEAR, (class_num, subject, year))))
         if (i + 1) % 3 == 0:  # 3 buttons per row
             keyboard.append(row)
             row = []
@@ -299,202 +852,370 @@ def create_year_keyboard(user_id: int, class_num: str, subject: str) -> InlineKe
     if row:  # Add remaining buttons
         keyboard.append(row)
     
-    keyboard.append([InlineKeyboardButton(get_message(user_id, "back"), callback_data=f"back_to_subject_{class_num}")])
-    keyboard.append([InlineKeyboardButton(get_message(user_id, "main_menu"), callback_data="main_menu")])
+    keyboard.append([InlineKeyboardButton(get_language_message(lang, "back"), callback_data=CALLBACK_CODEC.encode(OP_BACK_TO_SUBJECT, (class_num,)))])
+    keyboard.append([InlineKeyboardButton(get_language_message(lang, "main_menu"), callback_data=CALLBACK_CODEC.encode(OP_MAIN_MENU))])
     
     return InlineKeyboardMarkup(keyboard)
 
-async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Handle button callbacks"""
-    query = update.callback_query
-    await query.answer()
-    
+def build_main_menu_keyboard(lang: str) -> InlineKeyboardMarkup:
+    """Build keyboard with a single main menu button"""
+    return InlineKeyboardMarkup([[
+        InlineKeyboardButton(get_language_message(lang, "main_menu"), callback_data=CALLBACK_CODEC.encode(OP_MAIN_MENU))
+    ]])
+
+@timed("import_papers")
+async def import_papers(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Bulk import papers from an uploaded CSV/JSONL document (admin only)"""
+    from catalog_io import iter_batches, iter_import_rows  # admin only, so not loaded at startup
     user_id = update.effective_user.id
-    data = query.data
     
-    # Language selection
-    if data.startswith("lang_"):
-        language = data.split("_")[1]
-        set_user_language(user_id, language)
-        
-        keyboard = create_class_keyboard(user_id)
-        await query.edit_message_text(
-            get_message(user_id, "language_set"),
-            reply_markup=keyboard
-        )
+    if user_id != ADMIN_USER_ID:
+        await update.message.reply_text(get_message(user_id, "unauthorized"))
+        return
     
-    # Main menu
-    elif data == "main_menu":
-        keyboard = create_class_keyboard(user_id)
-        await query.edit_message_text(
-            get_message(user_id, "choose_class"),
-            reply_markup=keyboard
-        )
+    document = update.message.document
+    fmt = os.path.splitext(document.file_name or "")[1].lower().lstrip(".")
+    if fmt not in ("csv", "jsonl"):
+        await update.message.reply_text(get_message(user_id, "import_bad_format"))
+        return
     
-    # Class selection
-    elif data.startswith("class_"):
-        class_num = data.split("_")[1]
-        keyboard = create_subject_keyboard(user_id, class_num)
-        await query.edit_message_text(
-            get_message(user_id, "choose_subject", class_num=class_num),
-            reply_markup=keyboard
-        )
+    await update.message.reply_text(get_message(user_id, "import_started"))
     
-    # Subject selection
-    elif data.startswith("subject_"):
-        parts = data.split("_")
-        class_num = parts[1]
-        subject = "_".join(parts[2:])  # Handle subjects with underscores
+    added = 0
+    rejected = 0
+    errors = []  # only the first MAX_IMPORT_ERRORS_SHOWN, the rest are counted
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            # Download to disk and parse line by line instead of holding the upload in memory
+            path = os.path.join(tmp_dir, f"import.{fmt}")
+            telegram_file = await document.get_file()
+            await telegram_file.download_to_drive(path)
+            
+            with open(path, "rb") as stream:
+                for rows, batch_errors in iter_batches(iter_import_rows(stream, fmt), IMPORT_BATCH_SIZE):
+                    if rows:
+                        await apply_papers(rows)
+                        added += len(rows)
+                    rejected += len(batch_errors)
+                    errors.extend(batch_errors[:MAX_IMPORT_ERRORS_SHOWN - len(errors)])
+                    await asyncio.sleep(0)  # Let other updates run between batches
+    finally:
+        # Batches already applied stay in the catalog, so the admin gets the summary even if the import failed
+        logger.info("Papers imported", extra={"user_id": user_id, "added": added, "rejected": rejected})
         
-        keyboard = create_year_keyboard(user_id, class_num, subject)
-        await query.edit_message_text(
-            get_message(user_id, "choose_year", subject=subject, class_num=class_num),
-            reply_markup=keyboard
-        )
+        summary = get_message(user_id, "import_summary", added=added, rejected=rejected)
+        if errors:
+            lines = [f"• line {line_num}: {error}" for line_num, error in errors]
+            if rejected > len(errors):
+                lines.append(get_message(user_id, "import_more_errors", count=rejected - len(errors)))
+            summary += "\n\n" + get_message(user_id, "import_errors", errors="\n".join(lines))
+        
+        # Never let an oversized summary make the reply fail
+        await update.message.reply_text(summary[:MessageLimit.MAX_TEXT_LENGTH])
+
+@timed("export_papers")
+async def export_papers(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Export the catalog as a CSV/JSONL document (admin only)"""
+    from catalog_io import write_export  # admin only, so not loaded at startup
+    user_id = update.effective_user.id
     
-    # Year selection
-    elif data.startswith("year_"):
-        parts = data.split("_")
-        class_num = parts[1]
-        subject = "_".join(parts[2:-1])  # Handle subjects with underscores
-        year = parts[-1]
+    if user_id != ADMIN_USER_ID:
+        await update.message.reply_text(get_message(user_id, "unauthorized"))
+        return
+    
+    fmt = context.args[0].lower() if context.args else "csv"
+    if fmt not in ("csv", "jsonl"):
+        await update.message.reply_text(get_message(user_id, "import_bad_format"))
+        return
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, f"papers.{fmt}")
+        with open(path, "w", newline="", encoding="utf-8") as stream:
+            count = write_export(CATALOG_STORE.iter_rows(), stream, fmt)
         
-        if class_num in QUESTION_PAPERS and subject in QUESTION_PAPERS[class_num] and year in QUESTION_PAPERS[class_num][subject]:
-            file_path = QUESTION_PAPERS[class_num][subject][year]
-            download_url = f"{BASE_URL}/{file_path}"
-            
-            await query.edit_message_text(
-                get_message(user_id, "download_link", subject=subject, class_num=class_num, year=year, url=download_url),
-                parse_mode=ParseMode.MARKDOWN,
-                disable_web_page_preview=True,
-                reply_markup=InlineKeyboardMarkup([[
-                    InlineKeyboardButton(get_message(user_id, "main_menu"), callback_data="main_menu")
-                ]])
-            )
-        else:
-            await query.edit_message_text(
-                get_message(user_id, "paper_not_found"),
-                reply_markup=InlineKeyboardMarkup([[
-                    InlineKeyboardButton(get_message(user_id, "main_menu"), callback_data="main_menu")
-                ]])
+        with open(path, "rb") as stream:
+            await update.message.reply_document(
+                stream,
+                filename=f"papers.{fmt}",
+                caption=get_message(user_id, "export_caption", count=count)
             )
+
+@timed("stats")
+async def stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Usage report from the analytics rollups (admin only)"""
+    user_id = update.effective_user.id
     
-    # Back navigation
-    elif data == "back_to_class":
-        keyboard = create_class_keyboard(user_id)
-        await query.edit_message_text(
-            get_message(user_id, "choose_class"),
-            reply_markup=keyboard
-        )
+    if user_id != ADMIN_USER_ID:
+        await update.message.reply_text(get_message(user_id, "unauthorized"))
+        return
     
-    elif data.startswith("back_to_subject_"):
-        class_num = data.split("_")[-1]
-        keyboard = create_subject_keyboard(user_id, class_num)
-        await query.edit_message_text(
-            get_message(user_id, "choose_subject", class_num=class_num),
-            reply_markup=keyboard
-        )
+    days = int(context.args[0]) if context.args and context.args[0].isdecimal() else STATS_DEFAULT_DAYS
+    days = max(1, min(days, 366))
     
-    # Admin panel callbacks
-    elif data == "admin_add":
-        if user_id != ADMIN_USER_ID:
-            await query.answer("❌ Unauthorized!", show_alert=True)
-            return
-        
-        await query.edit_message_text(
-            get_message(user_id, "add_paper_format"),
-            parse_mode=ParseMode.MARKDOWN,
-            reply_markup=InlineKeyboardMarkup([[
-                InlineKeyboardButton(get_message(user_id, "main_menu"), callback_data="main_menu")
-            ]])
-        )
+    # Include events still in the buffer
+    await ANALYTICS.flush()
+    store = ANALYTICS.store
+    counts = await asyncio.to_thread(store.event_counts, days)
+    papers = await asyncio.to_thread(store.top_papers, days, STATS_TOP_N)
+    misses = await asyncio.to_thread(store.top_search_misses, days, STATS_TOP_N)
     
-    elif data == "admin_view":
-        if user_id != ADMIN_USER_ID:
-            await query.answer("❌ Unauthorized!", show_alert=True)
-            return
-        
-        # Generate papers summary
-        total_papers = 0
-        papers_summary = "📋 **Current Papers Database:**\n\n"
+    none = get_message(user_id, "stats_none")
+    paper_lines = [f"{rank}. {subject} - Class {class_num} ({year}): {count}"
+                   for rank, (class_num, subject, year, count) in enumerate(papers, 1)]
+    miss_lines = [f"{rank}. {query}: {count}" for rank, (query, count) in enumerate(misses, 1)]
+    text = "\n\n".join([
+        get_message(user_id, "stats_summary", days=days, starts=counts.get(START, 0), searches=counts.get(SEARCH, 0),
+                    misses=counts.get(SEARCH_MISS, 0), downloads=counts.get(DOWNLOAD, 0)),
+        get_message(user_id, "stats_top_papers", papers="\n".join(paper_lines) or none),
+        get_message(user_id, "stats_search_misses", queries="\n".join(miss_lines) or none),
+    ])
+    await update.message.reply_text(text)
+
+def create_class_keyboard(user_id: int) -> InlineKeyboardMarkup:
+    """Create keyboard for class selection"""
+    lang = get_user_language(user_id)
+    is_admin = user_id == ADMIN_USER_ID
+    return KEYBOARD_CACHE.get(("class", None, None, lang, is_admin), lambda: build_class_keyboard(lang, is_admin))
+
+def create_subject_keyboard(user_id: int, class_num: str) -> InlineKeyboardMarkup:
+    """Create keyboard for subject selection"""
+    lang = get_user_language(user_id)
+    return KEYBOARD_CACHE.get(("subject", class_num, None, lang, False), lambda: build_subject_keyboard(lang, class_num))
+
+def create_year_keyboard(user_id: int, class_num: str, subject: str) -> InlineKeyboardMarkup:
+    """Create keyboard for year selection"""
+    lang = get_user_language(user_id)
+    return KEYBOARD_CACHE.get(("year", class_num, subject, lang, False), lambda: build_year_keyboard(lang, class_num, subject))
+
+def create_language_keyboard() -> InlineKeyboardMarkup:
+    """Create keyboard for language selection"""
+    return KEYBOARD_CACHE.get(("language", None, None, "", False), build_language_keyboard)
+
+def create_main_menu_keyboard(user_id: int) -> InlineKeyboardMarkup:
+    """Create keyboard with a single main menu button"""
+    lang = get_user_language(user_id)
+    return KEYBOARD_CACHE.get(("main_menu", None, None, lang, False), lambda: build_main_menu_keyboard(lang))
+
+async def on_language(update: Update, context: ContextTypes.DEFAULT_TYPE, language: str):
+    """Language selection"""
+    user_id = update.effective_user.id
+    await set_user_language(user_id, language)
+    
+    await update.callback_query.edit_message_text(
+        get_message(user_id, "language_set"),
+        reply_markup=create_class_keyboard(user_id)
+    )
+
+async def on_main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE, _=None):
+    """Main menu, back to class selection, and buttons from menus that no longer exist"""
+    user_id = update.effective_user.id
+    await update.callback_query.edit_message_text(
+        get_message(user_id, "choose_class"),
+        reply_markup=create_class_keyboard(user_id)
+    )
+
+async def on_class(update: Update, context: ContextTypes.DEFAULT_TYPE, path: tuple):
+    """Class selection"""
+    class_num, = path
+    ANALYTICS.record(NAVIGATE, update.effective_user.id, class_num)
+    await on_back_to_subject(update, context, path)
+
+async def on_back_to_subject(update: Update, context: ContextTypes.DEFAULT_TYPE, path: tuple):
+    """Back navigation to a class's subjects, not counted as navigation"""
+    user_id = update.effective_user.id
+    class_num, = path
+    await update.callback_query.edit_message_text(
+        get_message(user_id, "choose_subject", class_num=class_num),
+        reply_markup=create_subject_keyboard(user_id, class_num)
+    )
+
+async def on_subject(update: Update, context: ContextTypes.DEFAULT_TYPE, path: tuple):
+    """Subject selection"""
+    user_id = update.effective_user.id
+    class_num, subject = path
+    ANALYTICS.record(NAVIGATE, user_id, class_num, subject)
+    await update.callback_query.edit_message_text(
+        get_message(user_id, "choose_year", subject=subject, class_num=class_num),
+        reply_markup=create_year_keyboard(user_id, class_num, subject)
+    )
+
+async def on_year(update: Update, context: ContextTypes.DEFAULT_TYPE, path: tuple):
+    """Year selection"""
+    query = update.callback_query
+    user_id = update.effective_user.id
+    class_num, subject, year = path
+    
+    if class_num in QUESTION_PAPERS and subject in QUESTION_PAPERS[class_num] and year in QUESTION_PAPERS[class_num][subject]:
+        file_path = QUESTION_PAPERS[class_num][subject][year]
+        download_url = paper_url(file_path)
+        ANALYTICS.record(DOWNLOAD, user_id, class_num, subject, year)
+        POPULARITY.record(class_num, subject, year)
         
-        for class_num in sorted(QUESTION_PAPERS.keys()):
-            papers_summary += f"**Class {class_num}:**\n"
-            for subject, years in QUESTION_PAPERS[class_num].items():
-                papers_summary += f"  • {subject}: {len(years)} papers ({', '.join(sorted(years.keys()))})\n"
-                total_papers += len(years)
-            papers_summary += "\n"
+        if DELIVERY_MODE == "document":
+            try:
+                await DOCUMENT_SENDER.send(
+                    context.bot,
+                    query.message.chat_id,
+                    (class_num, subject, year),
+                    file_path,
+                    download_url,
+                    caption=get_message(user_id, "document_caption", subject=subject, class_num=class_num, year=year),
+                    reply_markup=create_main_menu_keyboard(user_id)
+                )
+                return
+            except (TelegramError, httpx.HTTPError, OSError) as e:
+                logger.warning("Sending paper as a document failed, sending the link instead",
+                               extra={"file_path": file_path, "error": str(e)})
         
-        papers_summary += f"**Total Papers: {total_papers}**"
+        text = get_message(user_id, "download_link", subject=subject, class_num=class_num, year=year, url=download_url)
+        # Metadata from the last background check; links not checked yet are shown as before
+        link = LINK_HEALTH.get(download_url)
+        if link is not None and not link.ok:
+            text += get_message(user_id, "link_broken")
+        elif link is not None and link.size is not None:
+            text += get_message(user_id, "file_size", size=format_size(link.size))
         
         await query.edit_message_text(
-            papers_summary,
+            text,
             parse_mode=ParseMode.MARKDOWN,
-            reply_markup=InlineKeyboardMarkup([
-                [InlineKeyboardButton(get_message(user_id, "admin_panel"), callback_data="admin_panel")],
-                [InlineKeyboardButton(get_message(user_id, "main_menu"), callback_data="main_menu")]
-            ])
+            disable_web_page_preview=True,
+            reply_markup=create_main_menu_keyboard(user_id)
         )
-    
-    elif data == "admin_panel":
-        if user_id != ADMIN_USER_ID:
-            await query.answer("❌ Unauthorized!", show_alert=True)
-            return
-        
-        keyboard = [
-            [InlineKeyboardButton(get_message(user_id, "add_paper"), callback_data="admin_add")],
-            [InlineKeyboardButton(get_message(user_id, "view_papers"), callback_data="admin_view")],
-            [InlineKeyboardButton(get_message(user_id, "main_menu"), callback_data="main_menu")]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
+    else:
         await query.edit_message_text(
-            get_message(user_id, "admin_welcome"),
-            reply_markup=reply_markup
+            get_message(user_id, "paper_not_found"),
+            reply_markup=create_main_menu_keyboard(user_id)
         )
+
+async def on_admin_add(update: Update, context: ContextTypes.DEFAULT_TYPE, _=None):
+    """Admin panel: how to add papers"""
+    query = update.callback_query
+    user_id = update.effective_user.id
+    if user_id != ADMIN_USER_ID:
+        await query.answer("❌ Unauthorized!", show_alert=True)
+        return
     
-    # Search functionality
-    elif data == "search":
-        context.user_data['waiting_for_search'] = True
-        await query.edit_message_text(
-            get_message(user_id, "search_prompt"),
-            reply_markup=InlineKeyboardMarkup([[
-                InlineKeyboardButton(get_message(user_id, "main_menu"), callback_data="main_menu")
-            ]])
-        )
+    await query.edit_message_text(
+        get_message(user_id, "add_paper_format"),
+        parse_mode=ParseMode.MARKDOWN,
+        reply_markup=create_main_menu_keyboard(user_id)
+    )
 
+async def on_admin_view(update: Update, context: ContextTypes.DEFAULT_TYPE, page: Optional[str] = None):
+    """Admin panel: catalog summary, one page at a time"""
+    query = update.callback_query
+    user_id = update.effective_user.id
+    if user_id != ADMIN_USER_ID:
+        await query.answer("❌ Unauthorized!", show_alert=True)
+        return
+    
+    summary = get_catalog_summary()
+    pages = summary.pages
+    page = min(int(page), pages - 1) if page and page.isdecimal() else 0
+    papers_summary = (
+        f"📋 **Current Papers Database** ({page + 1}/{pages}):\n\n"
+        f"{summary.page(page)}\n\n"
+        f"**Total Papers: {summary.total}**"
+    )
+    
+    keyboard = []
+    navigation = []
+    if page > 0:
+        navigation.append(InlineKeyboardButton(get_message(user_id, "previous_page"),
+                                               callback_data=CALLBACK_CODEC.encode_literal(OP_ADMIN_VIEW, str(page - 1))))
+    if page < pages - 1:
+        navigation.append(InlineKeyboardButton(get_message(user_id, "next_page"),
+                                               callback_data=CALLBACK_CODEC.encode_literal(OP_ADMIN_VIEW, str(page + 1))))
+    if navigation:
+        keyboard.append(navigation)
+    keyboard.append([InlineKeyboardButton(get_message(user_id, "admin_panel"), callback_data=CALLBACK_CODEC.encode(OP_ADMIN_PANEL))])
+    keyboard.append([InlineKeyboardButton(get_message(user_id, "main_menu"), callback_data=CALLBACK_CODEC.encode(OP_MAIN_MENU))])
+    
+    await query.edit_message_text(
+        papers_summary,
+        parse_mode=ParseMode.MARKDOWN,
+        reply_markup=InlineKeyboardMarkup(keyboard)
+    )
+
+async def on_admin_panel(update: Update, context: ContextTypes.DEFAULT_TYPE, _=None):
+    """Admin panel"""
+    query = update.callback_query
+    user_id = update.effective_user.id
+    if user_id != ADMIN_USER_ID:
+        await query.answer("❌ Unauthorized!", show_alert=True)
+        return
+    
+    keyboard = [
+        [InlineKeyboardButton(get_message(user_id, "add_paper"), callback_data=CALLBACK_CODEC.encode(OP_ADMIN_ADD))],
+        [InlineKeyboardButton(get_message(user_id, "view_papers"), callback_data=CALLBACK_CODEC.encode(OP_ADMIN_VIEW))],
+        [InlineKeyboardButton(get_message(user_id, "main_menu"), callback_data=CALLBACK_CODEC.encode(OP_MAIN_MENU))]
+    ]
+    await query.edit_message_text(
+        get_message(user_id, "admin_welcome"),
+        reply_markup=InlineKeyboardMarkup(keyboard)
+    )
+
+async def on_search(update: Update, context: ContextTypes.DEFAULT_TYPE, _=None):
+    """Search button: wait for a query"""
+    user_id = update.effective_user.id
+    # Kept in shared state, since the query may arrive at another worker
+    await call_shared_state(SHARED_STATE.set, f"search:{user_id}", "1", ttl=SEARCH_PROMPT_TTL)
+    await update.callback_query.edit_message_text(
+        get_message(user_id, "search_prompt"),
+        reply_markup=create_main_menu_keyboard(user_id)
+    )
+
+# Opcode -> handler(update, context, argument)
+CALLBACK_HANDLERS = {
+    OP_MAIN_MENU: on_main_menu,
+    OP_LANG: on_language,
+    OP_CLASS: on_class,
+    OP_SUBJECT: on_subject,
+    OP_YEAR: on_year,
+    OP_BACK_TO_CLASS: on_main_menu,
+    OP_BACK_TO_SUBJECT: on_back_to_subject,
+    OP_ADMIN_ADD: on_admin_add,
+    OP_ADMIN_VIEW: on_admin_view,
+    OP_ADMIN_PANEL: on_admin_panel,
+    OP_SEARCH: on_search,
+}
+
+@timed("button_callback", callback_route)
+async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle button callbacks"""
+    query = update.callback_query
+    await query.answer()
+    
+    callback = CALLBACK_CODEC.decode(query.data)
+    handler = CALLBACK_HANDLERS.get(callback[0]) if callback else None
+    if handler is None:
+        # Buttons from before the callback format changed, or from removed catalog entries
+        await on_main_menu(update, context)
+        return
+    await handler(update, context, callback[1])
+
+@timed("handle_search")
 async def handle_search(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle search queries"""
     user_id = update.effective_user.id
     
-    if not context.user_data.get('waiting_for_search'):
+    if await call_shared_state(SHARED_STATE.pop, f"search:{user_id}") is None:
         return
     
-    context.user_data['waiting_for_search'] = False
     query = update.message.text.lower()
-    results = []
-    
-    # Search through all papers
-    for class_num, subjects in QUESTION_PAPERS.items():
-        for subject, years in subjects.items():
-            for year, file_path in years.items():
-                search_text = f"{subject} {year} class {class_num}".lower()
-                if any(term in search_text for term in query.split()):
-                    results.append({
-                        'class': class_num,
-                        'subject': subject,
-                        'year': year,
-                        'file_path': file_path
-                    })
+    results = SEARCH_INDEX.search(query, limit=10)
+    ANALYTICS.record(SEARCH, user_id, query=query)
+    if not results:
+        ANALYTICS.record(SEARCH_MISS, user_id, query=" ".join(query.split()))
     
     if results:
         keyboard = []
-        for result in results[:10]:  # Limit to 10 results
-            button_text = f"{result['subject']} - Class {result['class']} ({result['year']})"
-            callback_data = f"year_{result['class']}_{result['subject']}_{result['year']}"
+        for class_num, subject, year in results:
+            button_text = f"{subject} - Class {class_num} ({year})"
+            callback_data = CALLBACK_CODEC.encode(OP_YEAR, (class_num, subject, year))
             keyboard.append([InlineKeyboardButton(button_text, callback_data=callback_data)])
         
-        keyboard.append([InlineKeyboardButton(get_message(user_id, "main_menu"), callback_data="main_menu")])
+        keyboard.append([InlineKeyboardButton(get_message(user_id, "main_menu"), callback_data=CALLBACK_CODEC.encode(OP_MAIN_MENU))])
         
         await update.message.reply_text(
             get_message(user_id, "search_results", query=query),
@@ -503,42 +1224,134 @@ async def handle_search(update: Update, context: ContextTypes.DEFAULT_TYPE):
     else:
         await update.message.reply_text(
             get_message(user_id, "no_results", query=query),
-            reply_markup=InlineKeyboardMarkup([[
-                InlineKeyboardButton(get_message(user_id, "main_menu"), callback_data="main_menu")
-            ]])
+            reply_markup=create_main_menu_keyboard(user_id)
         )
 
+def build_inline_results(query: str, lang: str) -> list:
+    """Inline results for a query: cached documents in document mode when available, otherwise download links"""
+    results = []
+    for class_num, subject, year in SEARCH_INDEX.search(query, limit=INLINE_MAX_RESULTS):
+        file_path = QUESTION_PAPERS[class_num][subject][year]
+        result_id = CALLBACK_CODEC.encode(OP_YEAR, (class_num, subject, year))
+        title = f"{subject} ({year})"
+        description = get_language_message(lang, "inline_description", class_num=class_num, year=year)
+        file_id = DOCUMENT_SENDER.file_id((class_num, subject, year), file_path) if DELIVERY_MODE == "document" else None
+        if file_id is not None:
+            results.append(InlineQueryResultCachedDocument(
+                result_id, title, file_id, description=description,
+                caption=get_language_message(lang, "document_caption", subject=subject, class_num=class_num, year=year)
+            ))
+        else:
+            text = get_language_message(lang, "download_link", subject=subject, class_num=class_num, year=year,
+                                        url=paper_url(file_path))
+            results.append(InlineQueryResultArticle(
+                result_id, title,
+                InputTextMessageContent(text, parse_mode=ParseMode.MARKDOWN, disable_web_page_preview=True),
+                description=description
+            ))
+    return results
+
+@timed("inline_query")
+async def inline_query(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Answer @bot queries from the search index"""
+    query = update.inline_query
+    lang = get_user_language(update.effective_user.id)
+    
+    # Word order, case and stop words don't change the results, so they share a cache entry
+    key = (" ".join(sorted(set(tokenize(query.query)))), lang)
+    results = INLINE_CACHE.get(key)
+    if results is None:
+        results = build_inline_results(query.query, lang) if key[0] else []
+        INLINE_CACHE.put(key, results)
+    
+    # Answers depend on the user's language, so Telegram must not share them between users
+    await query.answer(results, cache_time=INLINE_CACHE_TIME, is_personal=True)
+
+async def report_startup(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    report = STARTUP.finish("first update handled")
+    if report:
+        print(report)
+
+def build_application(request: Optional[BaseRequest] = None, workers: int = UPDATE_WORKERS,
+                      rate_limiter: Optional[BaseRateLimiter] = RATE_LIMITER,
+                      user_limiter: Optional[UserRateLimiter] = USER_LIMITER) -> Application:
+    """Create the bot application and register handlers"""
+    global UPDATE_QUEUE, UPDATE_PROCESSOR
+    print("🔧 Creating bot application...")
+    UPDATE_QUEUE = BoundedUpdateQueue(MAX_PENDING_UPDATES)
+    UPDATE_PROCESSOR = PerUserUpdateProcessor(workers, MAX_PENDING_UPDATES, inline_debounce=INLINE_DEBOUNCE,
+                                              user_limiter=user_limiter)
+    builder = (
+        Application.builder()
+        .token(BOT_TOKEN)
+        .concurrent_updates(UPDATE_PROCESSOR)
+        .update_queue(UPDATE_QUEUE)
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+    )
+    if rate_limiter is not None:
+        builder = builder.rate_limiter(rate_limiter)
+    if TELEGRAM_API_BASE_URL:
+        builder = builder.base_url(f"{TELEGRAM_API_BASE_URL}/bot")
+    if request is not None:
+        builder = builder.request(request).get_updates_request(request)
+    else:
+        # Keep-alive connections shared by all workers instead of PTB's single-connection default.
+        # Both pools use one SSL context: loading the CA bundle takes ~45 ms per context at startup.
+        ssl_context = httpx.create_ssl_context()
+        builder = (
+            builder
+            .request(TimedHTTPXRequest(TELEGRAM_API_SECONDS, ssl_context, connection_pool_size=OUTBOUND_POOL_SIZE))
+            .get_updates_request(TimedHTTPXRequest(TELEGRAM_API_SECONDS, ssl_context))
+        )
+    application = builder.build()
+    
+    # Add handlers
+    print("📝 Adding command handlers...")
+    application.add_handler(CommandHandler("start", start))
+    application.add_handler(CommandHandler("admin", admin))
+    application.add_handler(CommandHandler("add_paper", add_paper))
+    application.add_handler(CommandHandler("export_papers", export_papers))
+    application.add_handler(CommandHandler("stats", stats))
+    application.add_handler(MessageHandler(filters.Document.ALL, import_papers))
+    application.add_handler(CallbackQueryHandler(button_callback))
+    application.add_handler(InlineQueryHandler(inline_query))
+    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_search))
+    if STARTUP.enabled:
+        # Runs after the handler that answered the update, so the profile ends with the first reply sent
+        application.add_handler(TypeHandler(Update, report_startup), group=1)
+    
+    return application
+
 def main():
     """Main function to run the bot"""
+    STARTUP.mark("module setup")
     try:
-        print("🌐 Starting Flask server...")
-        # Start Flask in background thread
-        flask_thread = threading.Thread(target=run_flask)
-        flask_thread.daemon = True
-        flask_thread.start()
+        print("📇 Loading catalog and building search index...")
+        load_catalog()
+        STARTUP.mark("load catalog")
+        load_popularity()
+        STARTUP.mark("load popularity")
+        print(f"📚 {sum(len(years) for subjects in QUESTION_PAPERS.values() for years in subjects.values())} papers loaded from {CATALOG_DB_PATH}")
         
-        print("🏓 Starting keep-alive service...")
-        # Start keep-alive in background thread
-        keep_alive_thread = threading.Thread(target=keep_alive)
-        keep_alive_thread.daemon = True
-        keep_alive_thread.start()
+        application = build_application()
+        STARTUP.mark("build application")
         
-        # Create application
-        print("🔧 Creating bot application...")
-        application = Application.builder().token(BOT_TOKEN).build()
+        if WEBHOOK_URL:
+            print("🌐 Starting webhook server...")
+            asyncio.run(run_webhook(application))
+            return
         
-        # Add handlers
-        print("📝 Adding command handlers...")
-        application.add_handler(CommandHandler("start", start))
-        application.add_handler(CommandHandler("admin", admin))
-        application.add_handler(CommandHandler("add_paper", add_paper))
-        application.add_handler(CallbackQueryHandler(button_callback))
-        application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_search))
+        if HEALTH_SERVER == "flask":
+            import threading
+            print("🌐 Starting Flask server...")
+            threading.Thread(target=run_flask, daemon=True).start()
         
-        # Run the bot
+        # Run the bot; the health server and keep-alive pings start on its event loop (post_init)
         print("🤖 Bot is starting...")
         print("✅ Bot is now running! Send /start to your bot on Telegram to test.")
-        print(f"🌐 Flask server running on port 8080")
+        print(f"🌐 Health server running on port {PORT}")
+        print("📈 Metrics available at /metrics")
         print(f"👤 Admin User ID: {ADMIN_USER_ID}")
         print(f"📚 Base URL: {BASE_URL}")
         print("🛑 Press Ctrl+C to stop the bot")
@@ -549,6 +1362,8 @@ def main():
     except Exception as e:
         print(f"❌ Error starting bot: {e}")
         print("🔍 Please check your BOT_TOKEN and internet connection")
+    finally:
+        stop_logging()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,174 @@
+import functools
+import ssl
+import time
+from bisect import bisect_left
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+import httpx
+from telegram.request import HTTPXRequest
+
+# Seconds; covers in-memory handlers up to slow Bot API round-trips
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: Labels, extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """Monotonic counter, optionally split by labels or read from a callback at scrape time"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = (),
+                 read: Optional[Callable[[], float]] = None):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.read = read
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self) -> List[str]:
+        if self.read:
+            return [f"{self.name} {self.read()}"]
+        return [f"{self.name}{_format_labels(self.label_names, labels)} {value}" for labels, value in self._values.items()]
+
+
+class Gauge:
+    """Value that goes up and down, or is read from a callback at scrape time"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, read: Optional[Callable[[], float]] = None):
+        self.name = name
+        self.help_text = help_text
+        self.read = read
+        self.value = 0.0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def dec(self, amount: float = 1):
+        self.value -= amount
+
+    def samples(self) -> List[str]:
+        return [f"{self.name} {self.read() if self.read else self.value}"]
+
+
+class Histogram:
+    """Fixed-bucket histogram; observe() is a bisect and three additions"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (last one is +Inf), sum, count]
+        self._series: Dict[Labels, List[Any]] = {}
+
+    def observe(self, value: float, *labels: str):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def samples(self) -> List[str]:
+        lines = []
+        for labels, (counts, total, count) in self._series.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, labels)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, labels)} {count}")
+        return lines
+
+
+class Registry:
+    """Collection of metrics rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics: List[Any] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help_text: str, label_names: Sequence[str] = (),
+                read: Optional[Callable[[], float]] = None) -> Counter:
+        return self.register(Counter(name, help_text, label_names, read))
+
+    def gauge(self, name: str, help_text: str, read: Optional[Callable[[], float]] = None) -> Gauge:
+        return self.register(Gauge(name, help_text, read))
+
+    def histogram(self, name: str, help_text: str, label_names: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help_text, label_names, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+def instrument(histogram: Histogram, in_flight: Gauge, name: str,
+               route: Optional[Callable[[Any], str]] = None):
+    """Decorate an async update handler to record its latency as (handler, route)"""
+    def decorate(handler: Callable[..., Awaitable[Any]]):
+        @functools.wraps(handler)
+        async def wrapper(update, context):
+            label = route(update) if route else ""
+            in_flight.inc()
+            started = time.perf_counter()
+            try:
+                return await handler(update, context)
+            finally:
+                histogram.observe(time.perf_counter() - started, name, label)
+                in_flight.dec()
+        return wrapper
+    return decorate
+
+
+class TimedHTTPXRequest(HTTPXRequest):
+    """PTB's HTTPX request that records the duration of every Bot API call by method.
+
+    Requests given the same `ssl_context` share it instead of each loading
+    the CA bundle into a new one.
+    """
+
+    def __init__(self, histogram: Histogram, ssl_context: Optional[ssl.SSLContext] = None, **kwargs):
+        self.ssl_context = ssl_context  # set first: HTTPXRequest.__init__ builds the client
+        super().__init__(**kwargs)
+        self.histogram = histogram
+
+    def _build_client(self) -> httpx.AsyncClient:
+        if self.ssl_context is None:
+            return super()._build_client()
+        return httpx.AsyncClient(verify=self.ssl_context, **self._client_kwargs)
+
+    async def do_request(self, url: str, method: str, *args, **kwargs):
+        started = time.perf_counter()
+        status = "error"
+        try:
+            code, payload = await super().do_request(url, method, *args, **kwargs)
+            status = str(code)
+            return code, payload
+        finally:
+            self.histogram.observe(time.perf_counter() - started, url.rsplit("/", 1)[-1], status)
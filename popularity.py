@@ -0,0 +1,102 @@
+import heapq
+import time
+from typing import Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+# (class_num, subject, year)
+PaperKey = Tuple[str, str, str]
+
+# Scores are rescaled once they grow past 2**RESCALE_EXPONENT
+RESCALE_EXPONENT = 64
+
+
+class DecayedCounter:
+    """Counts that lose half their weight every `half_life` seconds.
+
+    Each event adds 2**((t - origin) / half_life) instead of decaying
+    every stored score over time, so `add` is O(1) and scores stay directly
+    comparable: the decay factor is the same for every key. The stored
+    values are divided back down when the exponent gets large.
+    """
+
+    def __init__(self, half_life: float):
+        self.half_life = half_life
+        self._origin = time.time()
+        self._scores: Dict[Hashable, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+    def _rescale(self, now: float):
+        factor = 2.0 ** (-(now - self._origin) / self.half_life)
+        self._scores = {key: score * factor for key, score in self._scores.items() if score * factor > 1e-9}
+        self._origin = now
+
+    def add(self, key: Hashable, amount: float = 1.0, at: Optional[float] = None):
+        at = time.time() if at is None else at
+        exponent = (at - self._origin) / self.half_life
+        if exponent > RESCALE_EXPONENT:
+            self._rescale(at)
+            exponent = 0.0
+        self._scores[key] = self._scores.get(key, 0.0) + amount * 2.0 ** exponent
+
+    def rank(self, key: Hashable) -> float:
+        """Value that orders keys by current score; not itself a count"""
+        return self._scores.get(key, 0.0)
+
+    def score(self, key: Hashable, at: Optional[float] = None) -> float:
+        """Decayed count of a key at time `at` (default now)"""
+        at = time.time() if at is None else at
+        return self._scores.get(key, 0.0) * 2.0 ** (-(at - self._origin) / self.half_life)
+
+    def top(self, n: int) -> List[Hashable]:
+        return heapq.nlargest(n, self._scores, key=self._scores.__getitem__)
+
+
+class Popularity:
+    """Recent download popularity, and the menu orders derived from it.
+
+    Downloads are counted per subject and per paper in DecayedCounters as
+    they happen. Menus don't follow every download: `refresh` recomputes
+    the subject order of each class and the trending papers from the
+    counters, and reports which of them changed so only those keyboards
+    are rebuilt. Between refreshes, menus use the last computed order.
+    """
+
+    def __init__(self, half_life: float = 7 * 86400, trending_size: int = 3):
+        self.trending_size = trending_size
+        self._subjects = DecayedCounter(half_life)
+        self._papers = DecayedCounter(half_life)
+        self._subject_ranks: Dict[str, Dict[str, int]] = {}  # class -> subject -> position
+        self.trending: List[PaperKey] = []
+
+    def record(self, class_num: str, subject: str, year: str, count: float = 1.0, at: Optional[float] = None):
+        self._subjects.add((class_num, subject), count, at)
+        self._papers.add((class_num, subject, year), count, at)
+
+    def subjects(self, class_num: str, subjects: Iterable[str]) -> List[str]:
+        """Subjects in the order of the last refresh; subjects added since keep their place after those"""
+        ranks = self._subject_ranks.get(class_num, {})
+        return sorted(subjects, key=lambda subject: ranks.get(subject, len(ranks)))
+
+    def refresh(self, papers: Dict[str, Dict[str, Dict[str, str]]]) -> Tuple[Set[str], bool]:
+        """Recompute menu orders for a QUESTION_PAPERS style catalog.
+
+        Returns the classes whose subject order changed and whether the
+        trending papers changed.
+        """
+        changed = set()
+        for class_num, subjects in papers.items():
+            # Stable sort: subjects without downloads keep catalog order
+            order = sorted(subjects, key=lambda subject: -self._subjects.rank((class_num, subject)))
+            ranks = {subject: position for position, subject in enumerate(order)}
+            if ranks != self._subject_ranks.get(class_num):
+                self._subject_ranks[class_num] = ranks
+                changed.add(class_num)
+
+        trending = [
+            key for key in self._papers.top(self.trending_size * 2)
+            if key[2] in papers.get(key[0], {}).get(key[1], {})
+        ][:self.trending_size]
+        trending_changed = trending != self.trending
+        self.trending = trending
+        return changed, trending_changed
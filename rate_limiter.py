@@ -0,0 +1,288 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from typing import Any, Callable, Coroutine, Dict, Hashable, Iterable, List, Optional, Tuple, Union
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+logger = logging.getLogger(__name__)
+
+JSONDict = Dict[str, Any]
+
+# Lower value is sent first
+HIGH_PRIORITY = 0
+NORMAL_PRIORITY = 1
+
+# Answers to button presses and inline queries: the user is watching a spinner
+PRIORITY_ENDPOINTS = {"answerCallbackQuery", "answerInlineQuery"}
+
+# Calls that don't send anything to a chat and are never throttled
+UNLIMITED_ENDPOINTS = {"getUpdates", "getMe", "setWebhook", "deleteWebhook", "getWebhookInfo", "getFile"}
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, holding at most `capacity`"""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated", "blocked_until")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self) -> float:
+        """Take a token if one is available; otherwise return seconds until one will be"""
+        now = time.monotonic()
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def reserve(self) -> float:
+        """Take a token now, possibly going into debt; return seconds to wait before using it"""
+        now = time.monotonic()
+        self._refill(now)
+        self.tokens -= 1
+        wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        return max(wait, self.blocked_until - now)
+
+    def block(self, seconds: float):
+        """Refuse tokens for the next `seconds` (after a 429 retry_after)"""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    @property
+    def is_full(self) -> bool:
+        self._refill(time.monotonic())
+        return self.tokens >= self.capacity and time.monotonic() >= self.blocked_until
+
+
+class OutboundRateLimiter(BaseRateLimiter):
+    """Schedules Bot API calls under Telegram's global and per-chat limits.
+
+    Every call takes a token from the global bucket; waiting calls are
+    released in priority order, so callback answers overtake queued edits.
+    Calls addressed to a chat also take a token from that chat's bucket.
+    A 429 blocks the affected chat (or everything, if no chat is involved)
+    for `retry_after` seconds before the call is retried.
+    """
+
+    def __init__(self, global_rate: float = 30, per_chat_rate: float = 1, per_chat_burst: float = 3,
+                 group_rate: float = 20 / 60, max_retries: int = 2, max_chat_buckets: int = 10_000):
+        self.max_retries = max_retries
+        self.max_chat_buckets = max_chat_buckets
+        self.per_chat_rate = per_chat_rate
+        self.per_chat_burst = per_chat_burst
+        self.group_rate = group_rate
+        self._global = TokenBucket(global_rate, global_rate)
+        self._chats: Dict[Union[int, str], TokenBucket] = {}
+        self._waiting: List[Tuple[int, int]] = []  # heap of (priority, arrival)
+        self._arrivals = itertools.count()
+        self._condition: Optional[asyncio.Condition] = None
+        
+        # Metrics
+        self.requests = 0
+        self.retries = 0
+        self.throttled_seconds = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiting)
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    def _chat_bucket(self, chat_id: Union[int, str]) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= self.max_chat_buckets:
+                self._chats = {key: value for key, value in self._chats.items() if not value.is_full}
+            is_group = isinstance(chat_id, str) or chat_id < 0
+            rate = self.group_rate if is_group else self.per_chat_rate
+            bucket = self._chats[chat_id] = TokenBucket(rate, self.per_chat_burst)
+        return bucket
+
+    async def _acquire_global(self, priority: int):
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        entry = (priority, next(self._arrivals))
+        async with self._condition:
+            heapq.heappush(self._waiting, entry)
+            try:
+                while True:
+                    if self._waiting[0] != entry:
+                        await self._condition.wait()
+                        continue
+                    delay = self._global.try_take()
+                    if not delay:
+                        heapq.heappop(self._waiting)
+                        return
+                    try:
+                        # Woken early if someone else finishes, so a newer high-priority call can go first
+                        await asyncio.wait_for(self._condition.wait(), delay)
+                    except asyncio.TimeoutError:
+                        pass
+            finally:
+                if entry in self._waiting:
+                    self._waiting.remove(entry)
+                    heapq.heapify(self._waiting)
+                self._condition.notify_all()
+
+    async def process_request(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, Union[bool, JSONDict, List[JSONDict]]]],
+        args: Any,
+        kwargs: Dict[str, Any],
+        endpoint: str,
+        data: Dict[str, Any],
+        rate_limit_args: Optional[int],
+    ) -> Union[bool, JSONDict, List[JSONDict]]:
+        if endpoint in UNLIMITED_ENDPOINTS:
+            return await callback(*args, **kwargs)
+        
+        self.requests += 1
+        chat_id = data.get("chat_id")
+        priority = HIGH_PRIORITY if endpoint in PRIORITY_ENDPOINTS else NORMAL_PRIORITY
+        max_retries = rate_limit_args if rate_limit_args is not None else self.max_retries
+        
+        attempt = 0
+        while True:
+            started = time.monotonic()
+            if chat_id is not None and priority != HIGH_PRIORITY:
+                delay = self._chat_bucket(chat_id).reserve()
+                if delay:
+                    await asyncio.sleep(delay)
+            await self._acquire_global(priority)
+            self.throttled_seconds += time.monotonic() - started
+            
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as e:
+                if attempt >= max_retries:
+                    raise
+                attempt += 1
+                self.retries += 1
+                logger.warning("Bot API returned 429, retrying", extra={"endpoint": endpoint, "chat_id": chat_id, "retry_after": e.retry_after})
+                if chat_id is not None:
+                    self._chat_bucket(chat_id).block(e.retry_after)
+                else:
+                    self._global.block(e.retry_after)
+
+
+# Reasons UserRateLimiter drops an update
+DUPLICATE = "duplicate"
+THROTTLED = "throttled"
+BANNED = "banned"
+
+
+class UserRateLimiter:
+    """Per-user admission control for incoming updates.
+
+    Each user may send `rate` updates per second with bursts of `burst`.
+    The bucket is kept as one float, the time it will be full again
+    (GCRA's theoretical arrival time), so a check is a few comparisons. A
+    button press with the same callback_data as the user's previous one
+    within `duplicate_window` seconds is a double tap and is dropped
+    without taking a token. A user throttled `ban_after` times within one
+    window is banned for `ban_seconds`.
+
+    State lives in two generations of dicts, rotated every `window`
+    seconds. A user seen in the old generation moves to the current one;
+    users idle for a whole window go away with the old generation, without
+    a scan. Their buckets would have been full again anyway, since a
+    window is at least as long as a bucket takes to refill.
+    """
+
+    def __init__(self, rate: float = 1, burst: int = 8, duplicate_window: float = 1, ban_after: int = 30,
+                 ban_seconds: float = 300, window: float = 60, exempt: Iterable[Hashable] = ()):
+        self.interval = 1 / rate
+        self.tolerance = (burst - 1) * self.interval
+        self.duplicate_window = duplicate_window
+        self.ban_after = ban_after
+        self.ban_seconds = ban_seconds
+        self.window = max(window, burst * self.interval, duplicate_window)
+        self.exempt = frozenset(exempt)
+        # user -> [full again at, throttled this window, last callback_data, time of last press]
+        self._current: Dict[Hashable, List] = {}
+        self._previous: Dict[Hashable, List] = {}
+        self._rotate_at = time.monotonic() + self.window
+        self._banned: Dict[Hashable, float] = {}  # user -> ban end
+        
+        # Metrics
+        self.duplicates = 0
+        self.throttled = 0
+        self.dropped_banned = 0
+        self.bans = 0
+
+    def __len__(self) -> int:
+        return len(self._current) + len(self._previous)
+
+    @property
+    def banned(self) -> int:
+        return len(self._banned)
+
+    def _rotate(self, now: float):
+        # After a whole idle window, the current generation is stale too
+        self._previous = self._current if now < self._rotate_at + self.window else {}
+        self._current = {}
+        self._rotate_at = now + self.window
+        self._banned = {user: until for user, until in self._banned.items() if until > now}
+
+    def check(self, user: Hashable, callback_data: Optional[str] = None) -> Optional[str]:
+        """Why an update from `user` should be dropped (DUPLICATE, THROTTLED or BANNED), or None to process it"""
+        if user in self.exempt:
+            return None
+        now = time.monotonic()
+        if now >= self._rotate_at:
+            self._rotate(now)
+
+        until = self._banned.get(user)
+        if until is not None:
+            if now < until:
+                self.dropped_banned += 1
+                return BANNED
+            del self._banned[user]
+
+        entry = self._current.get(user)
+        if entry is None:
+            entry = self._previous.pop(user, None)
+            if entry is None:
+                entry = [now, 0, None, 0.0]
+            else:
+                entry[1] = 0
+            self._current[user] = entry
+
+        if callback_data is not None:
+            if callback_data == entry[2] and now - entry[3] < self.duplicate_window:
+                entry[3] = now
+                self.duplicates += 1
+                return DUPLICATE
+            entry[2] = callback_data
+            entry[3] = now
+
+        full_at = max(entry[0], now)
+        if full_at - now > self.tolerance:
+            self.throttled += 1
+            entry[1] += 1
+            if entry[1] >= self.ban_after:
+                self._banned[user] = now + self.ban_seconds
+                self.bans += 1
+                entry[1] = 0
+                logger.warning("User temporarily banned for flooding", extra={"user_id": user, "seconds": self.ban_seconds})
+            return THROTTLED
+        entry[0] = full_at + self.interval
+        return None
@@ -0,0 +1,266 @@
+import heapq
+import re
+from bisect import bisect_left, insort
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, List, Set, Tuple
+
+# (class_num, subject, year)
+PaperKey = Tuple[str, str, str]
+
+# Extra search terms for each subject, so "math" or "गणित" finds "Mathematics"
+SUBJECT_ALIASES: Dict[str, List[str]] = {
+    "Mathematics": ["math", "maths", "गणित"],
+    "Science": ["sci", "विज्ञान"],
+    "English": ["eng", "अंग्रेजी", "अंग्रेज़ी"],
+    "Hindi": ["हिंदी", "हिन्दी"],
+    "Social Science": ["sst", "sss", "social", "सामाजिक", "सामाजिक विज्ञान"],
+    "Physics": ["phy", "भौतिकी", "भौतिक"],
+    "Chemistry": ["chem", "रसायन", "रसायन विज्ञान"],
+    "Biology": ["bio", "जीवविज्ञान", "जीव विज्ञान"],
+    "Economics": ["eco", "econ", "अर्थशास्त्र"],
+}
+
+# Words that carry no meaning on their own ("Math 2022 Class 10")
+STOP_WORDS = {"class", "कक्षा", "std", "paper", "papers", "question", "year", "वर्ष", "साल", "प्रश्न", "पत्र"}
+
+# Splits on anything that is not a word character or part of a Devanagari word
+_TOKEN_SPLIT = re.compile(r"[^\w\u0900-\u097F]+")
+
+# "10th", "12वीं", "class10", "कक्षा10" -> "10"
+_CLASS_FORMS = re.compile(r"^(?:class|std|कक्षा)?(\d{1,2})(?:st|nd|rd|th|वीं|वी)?$")
+
+_DEVANAGARI_DIGITS = str.maketrans("०१२३४५६७८९", "0123456789")
+
+EXACT_MATCH_SCORE = 4
+PREFIX_MATCH_SCORE = 3
+# By edit distance; a typo ranks below any exact or prefix match
+FUZZY_MATCH_SCORES = {1: 2, 2: 1}
+
+# Shortest query term corrected for typos, and the longest that allows only one edit
+FUZZY_MIN_LENGTH = 3
+FUZZY_ONE_EDIT_MAX_LENGTH = 5
+
+# Candidate sets larger than this are ranked one year at a time
+FULL_SCAN_LIMIT = 512
+
+
+def _normalize(token: str) -> str:
+    match = _CLASS_FORMS.match(token)
+    return match.group(1) if match else token
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase search tokens, with Devanagari digits and class forms normalized"""
+    tokens = []
+    for token in _TOKEN_SPLIT.split(text.lower().translate(_DEVANAGARI_DIGITS)):
+        if token and token not in STOP_WORDS:
+            tokens.append(_normalize(token))
+    return tokens
+
+
+def trigrams(token: str) -> Set[str]:
+    """Character trigrams of a token padded with one boundary marker on each side"""
+    padded = f"^{token}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Levenshtein distance with adjacent transpositions, or limit + 1 if it exceeds limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = None
+    row = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(row[j] + 1, current[j - 1] + 1, row[j - 1] + cost)
+            if previous is not None and i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous, row = row, current
+    return row[-1] if row[-1] <= limit else limit + 1
+
+
+def max_edits(term: str) -> int:
+    """Typos tolerated in a query term; numbers and very short words must match"""
+    if len(term) < FUZZY_MIN_LENGTH or term.isdigit():
+        return 0
+    return 1 if len(term) <= FUZZY_ONE_EDIT_MAX_LENGTH else 2
+
+
+@lru_cache(maxsize=4096)
+def _subject_name_tokens(subject: str) -> FrozenSet[str]:
+    return frozenset(tokenize(subject))
+
+
+@lru_cache(maxsize=4096)
+def _ascending(text: str) -> Tuple[int, ...]:
+    """Key that makes heapq.nlargest order text A to Z, shorter prefixes first"""
+    return tuple(-ord(char) for char in text) + (1,)
+
+
+@lru_cache(maxsize=4096)
+def _subject_tokens(subject: str) -> FrozenSet[str]:
+    tokens = set(tokenize(subject))
+    for alias in SUBJECT_ALIASES.get(subject, ()):
+        tokens.update(tokenize(alias))
+    return frozenset(tokens)
+
+
+def paper_tokens(class_num: str, subject: str, year: str) -> Set[str]:
+    """All tokens a paper should be found under"""
+    return _subject_tokens(subject).union(tokenize(f"{class_num} {year}"))
+
+
+class SearchIndex:
+    """Inverted index from search token to the papers containing it"""
+
+    def __init__(self):
+        self._postings: Dict[str, Set[PaperKey]] = {}
+        self._vocabulary: List[str] = []  # sorted, for prefix lookups
+        self._trigrams: Dict[str, Set[str]] = {}  # trigram -> vocabulary tokens, for typo lookups
+        self._by_year: Dict[str, Set[PaperKey]] = {}
+        self._years: List[str] = []  # sorted, newest last
+
+    def build(self, papers: Dict[str, Dict[str, Dict[str, str]]]):
+        """Rebuild the index from a QUESTION_PAPERS style catalog"""
+        self._postings = {}
+        self._by_year = {}
+        for class_num, subjects in papers.items():
+            for subject, years in subjects.items():
+                for year in years:
+                    key = (class_num, subject, year)
+                    for token in paper_tokens(class_num, subject, year):
+                        self._postings.setdefault(token, set()).add(key)
+                    self._by_year.setdefault(year, set()).add(key)
+        self._vocabulary = sorted(self._postings)
+        self._years = sorted(self._by_year)
+        self._trigrams = {}
+        for token in self._vocabulary:
+            self._add_trigrams(token)
+
+    def _add_trigrams(self, token: str):
+        for gram in trigrams(token):
+            self._trigrams.setdefault(gram, set()).add(token)
+
+    def add(self, class_num: str, subject: str, year: str):
+        """Index a single paper"""
+        key = (class_num, subject, year)
+        for token in paper_tokens(class_num, subject, year):
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = set()
+                insort(self._vocabulary, token)
+                self._add_trigrams(token)
+            postings.add(key)
+        if year not in self._by_year:
+            self._by_year[year] = set()
+            insort(self._years, year)
+        self._by_year[year].add(key)
+
+    def _fuzzy(self, term: str, limit: int) -> Dict[int, List[str]]:
+        """Vocabulary tokens within `limit` edits of term, grouped by distance.
+
+        Each edit changes at most three padded trigrams, so only tokens
+        sharing enough trigrams with the term are compared in full.
+        """
+        grams = trigrams(term)
+        shared: Dict[str, int] = {}
+        for gram in grams:
+            for token in self._trigrams.get(gram, ()):
+                shared[token] = shared.get(token, 0) + 1
+        needed = len(grams) - 3 * limit
+        found: Dict[int, List[str]] = {}
+        for token, count in shared.items():
+            if count >= needed and not token.isdigit():
+                distance = edit_distance(term, token, limit)
+                if distance <= limit:
+                    found.setdefault(distance, []).append(token)
+        return found
+
+    def _expand(self, term: str) -> List[Tuple[int, Set[PaperKey]]]:
+        """(score, papers) tiers for a term, best first.
+
+        Papers under the exact token come first, then tokens the term is a
+        prefix of. Only if neither exists is the term treated as a typo and
+        matched against tokens a few edits away.
+        """
+        tiers = []
+        exact = self._postings.get(term)
+        if exact:
+            tiers.append((EXACT_MATCH_SCORE, exact))
+        prefixed = []
+        i = bisect_left(self._vocabulary, term)
+        while i < len(self._vocabulary) and self._vocabulary[i].startswith(term):
+            if self._vocabulary[i] != term:
+                prefixed.append(self._postings[self._vocabulary[i]])
+            i += 1
+        if prefixed:
+            tiers.append((PREFIX_MATCH_SCORE, set().union(*prefixed)))
+        if not tiers and max_edits(term):
+            for distance, tokens in sorted(self._fuzzy(term, max_edits(term)).items()):
+                tiers.append((FUZZY_MATCH_SCORES[distance], set().union(*(self._postings[token] for token in tokens))))
+        return tiers
+
+    def search(self, query: str, limit: int = 10) -> List[PaperKey]:
+        """Return the best `limit` papers for a query, best first.
+
+        Papers matching every term (AND) are preferred; if there are none,
+        papers matching any term (OR) are ranked by how many terms they match.
+        Terms match exactly, as a prefix, or, failing both, with a typo or two.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+
+        expanded = []
+        for term in terms:
+            tiers = self._expand(term)
+            if tiers:
+                matches = tiers[0][1] if len(tiers) == 1 else set().union(*(papers for _, papers in tiers))
+                expanded.append((tiers, matches))
+        if not expanded:
+            return []
+
+        by_size = sorted((matches for _, matches in expanded), key=len)
+        candidates: Iterable[PaperKey] = by_size[0]
+        if len(expanded) == len(terms):
+            for matches in by_size[1:]:
+                candidates = candidates & matches
+                if not candidates:
+                    break
+        if not candidates or len(expanded) < len(terms):
+            candidates = set().union(*by_size)
+
+        query_terms = frozenset(terms)
+
+        def score(key: PaperKey) -> Tuple[int, str, bool, str, Tuple[int, ...]]:
+            total = 0
+            for tiers, matches in expanded:
+                if key in matches:
+                    for tier_score, papers in tiers:
+                        if key in papers:
+                            total += tier_score
+                            break
+            # On equal score: newer papers, then subjects the query names in
+            # full ("science" -> Science before Social Science), then A to Z
+            exact = _subject_name_tokens(key[1]) <= query_terms
+            return total, key[2], exact, key[0].zfill(3), _ascending(key[1])
+
+        if len(candidates) <= FULL_SCAN_LIMIT:
+            return heapq.nlargest(limit, candidates, key=score)
+
+        # Walk years newest first; once the heap holds `limit` papers with the
+        # best achievable score, older years can only tie and lose on recency.
+        best_score = sum(tiers[0][0] for tiers, _ in expanded)
+        top: List[PaperKey] = []
+        for year in reversed(self._years):
+            bucket = candidates & self._by_year[year]
+            if not bucket:
+                continue
+            top = heapq.nlargest(limit, top + heapq.nlargest(limit, bucket, key=score), key=score)
+            if len(top) == limit and score(top[-1])[0] == best_score:
+                break
+        return top
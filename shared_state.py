@@ -0,0 +1,275 @@
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from sqlite_db import connect
+
+# (sequence number, message)
+Event = Tuple[int, str]
+
+
+class SharedState(ABC):
+    """State that every worker process must see: expiring keys and change feeds.
+
+    Keys hold short-lived per-user flags, such as "waiting for a search
+    query", that the next update may read in another process. Change feeds
+    are per-channel logs of messages numbered 1, 2, 3, ...; a worker keeps
+    the last number it applied and reads what came after it. Only the
+    newest `max_events` messages of a channel are kept, so a reader that
+    finds a hole in the numbering has missed messages and must reload
+    from the source of truth instead.
+
+    The operations map directly onto a Redis-like store (GET, SET EX,
+    GETDEL, INCR plus a sorted set), see RedisSharedState.
+
+    Catalog feeds only announce changes: rows are written to the catalog
+    database first, and followers read them back from there. Language
+    changes carry the new language, and the worker that made one writes
+    it to the user database with its next batch. Every worker must
+    therefore use the same CATALOG_DB_PATH and USER_DB_PATH files, which
+    also keeps the callback tokens numbered in the catalog database
+    identical for all workers.
+    """
+
+    # True when other processes see the same state
+    shared = False
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: str, ttl: Optional[float] = None):
+        ...
+
+    @abstractmethod
+    def pop(self, key: str) -> Optional[str]:
+        """Delete a key and return its value, atomically"""
+
+    @abstractmethod
+    def publish(self, channel: str, message: str) -> int:
+        """Append a message to a channel and return its sequence number"""
+
+    @abstractmethod
+    def read(self, channel: str, after: int, limit: int = 1000) -> List[Event]:
+        """Messages with a sequence number above `after`, oldest first"""
+
+    @abstractmethod
+    def last_seq(self, channel: str) -> int:
+        """Sequence number of the newest message, 0 if there is none"""
+
+    def close(self):
+        pass
+
+
+class MemorySharedState(SharedState):
+    """Process-local state, for running a single worker"""
+
+    def __init__(self, max_events: int = 10_000):
+        self.max_events = max_events
+        self._keys: Dict[str, Tuple[Optional[float], str]] = {}  # key -> (expires_at, value)
+        self._events: Dict[str, Deque[Event]] = {}
+        self._sets = 0
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._keys.get(key)
+        if entry is None:
+            return None
+        if entry[0] is not None and entry[0] <= time.monotonic():
+            del self._keys[key]
+            return None
+        return entry[1]
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None):
+        self._keys[key] = (time.monotonic() + ttl if ttl is not None else None, value)
+        self._sets += 1
+        if self._sets % 1000 == 0:
+            # Keys that are never read again would otherwise stay forever
+            now = time.monotonic()
+            for stale in [key for key, (expires_at, _) in self._keys.items() if expires_at is not None and expires_at <= now]:
+                del self._keys[stale]
+
+    def pop(self, key: str) -> Optional[str]:
+        entry = self._keys.pop(key, None)
+        if entry is None or (entry[0] is not None and entry[0] <= time.monotonic()):
+            return None
+        return entry[1]
+
+    def publish(self, channel: str, message: str) -> int:
+        events = self._events.get(channel)
+        if events is None:
+            events = self._events[channel] = deque(maxlen=self.max_events)
+        seq = events[-1][0] + 1 if events else 1
+        events.append((seq, message))
+        return seq
+
+    def read(self, channel: str, after: int, limit: int = 1000) -> List[Event]:
+        return [event for event in self._events.get(channel, ()) if event[0] > after][:limit]
+
+    def last_seq(self, channel: str) -> int:
+        events = self._events.get(channel)
+        return events[-1][0] if events else 0
+
+
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS shared_keys (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    expires_at REAL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS shared_events (
+    channel TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    message TEXT NOT NULL,
+    PRIMARY KEY (channel, seq)
+) WITHOUT ROWID;
+"""
+
+
+class SQLiteSharedState(SharedState):
+    """Shared state in a SQLite file, for several workers on one machine.
+
+    Like the catalog and user stores, the database runs in WAL mode so
+    readers never block the writer. Writers from different processes wait
+    up to `timeout` seconds for each other. Expiry uses wall-clock time,
+    which all processes agree on.
+    """
+
+    shared = True
+
+    def __init__(self, path: str, max_events: int = 10_000, timeout: float = 10):
+        self.path = path
+        self.max_events = max_events
+        self.timeout = timeout
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._sets = 0
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = connect(self.path, timeout=self.timeout)
+            conn.executescript(_SQLITE_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def get(self, key: str) -> Optional[str]:
+        row = self.conn.execute("SELECT value, expires_at FROM shared_keys WHERE key = ?", (key,)).fetchone()
+        if row is None or (row[1] is not None and row[1] <= time.time()):
+            return None
+        return row[0]
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None):
+        now = time.time()
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO shared_keys VALUES (?, ?, ?)", (key, value, now + ttl if ttl is not None else None)
+            )
+            self._sets += 1
+            if self._sets % 1000 == 0:
+                self.conn.execute("DELETE FROM shared_keys WHERE expires_at <= ?", (now,))
+
+    def pop(self, key: str) -> Optional[str]:
+        with self._lock, self.conn:
+            row = self.conn.execute("DELETE FROM shared_keys WHERE key = ? RETURNING value, expires_at", (key,)).fetchone()
+        if row is None or (row[1] is not None and row[1] <= time.time()):
+            return None
+        return row[0]
+
+    def publish(self, channel: str, message: str) -> int:
+        with self._lock, self.conn:
+            # One statement, so the number is assigned under the write lock
+            seq = self.conn.execute(
+                "INSERT INTO shared_events SELECT ?, COALESCE(MAX(seq), 0) + 1, ? FROM shared_events WHERE channel = ? "
+                "RETURNING seq",
+                (channel, message, channel)
+            ).fetchone()[0]
+            self.conn.execute("DELETE FROM shared_events WHERE channel = ? AND seq <= ?", (channel, seq - self.max_events))
+        return seq
+
+    def read(self, channel: str, after: int, limit: int = 1000) -> List[Event]:
+        return self.conn.execute(
+            "SELECT seq, message FROM shared_events WHERE channel = ? AND seq > ? ORDER BY seq LIMIT ?",
+            (channel, after, limit)
+        ).fetchall()
+
+    def last_seq(self, channel: str) -> int:
+        return self.conn.execute("SELECT COALESCE(MAX(seq), 0) FROM shared_events WHERE channel = ?", (channel,)).fetchone()[0]
+
+
+# KEYS: counter, sorted set; ARGV: message, max_events
+_REDIS_PUBLISH = """
+local seq = redis.call('INCR', KEYS[1])
+redis.call('ZADD', KEYS[2], seq, seq .. ':' .. ARGV[1])
+redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', seq - tonumber(ARGV[2]))
+return seq
+"""
+
+
+class RedisSharedState(SharedState):
+    """Shared state in Redis, for workers that share one catalog and user database.
+
+    Keys are plain Redis strings. A channel is an INCR counter that numbers
+    messages plus a sorted set of "<seq>:<message>" members scored by
+    number. Compared with SQLiteSharedState, it keeps the per-update key
+    traffic off the database files; it does not replace them, so workers on
+    several machines need those files on a shared volume. Needs the
+    optional `redis` package.
+    """
+
+    shared = True
+
+    def __init__(self, url: str, max_events: int = 10_000):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("a redis:// shared state URL needs the redis package (pip install redis)") from None
+        self.max_events = max_events
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self._publish = self.client.register_script(_REDIS_PUBLISH)
+
+    def close(self):
+        self.client.close()
+
+    def get(self, key: str) -> Optional[str]:
+        return self.client.get(key)
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None):
+        self.client.set(key, value, px=int(ttl * 1000) if ttl is not None else None)
+
+    def pop(self, key: str) -> Optional[str]:
+        return self.client.getdel(key)
+
+    def publish(self, channel: str, message: str) -> int:
+        # One script, so no reader sees a number before its message is stored
+        return self._publish(keys=[f"{channel}:seq", f"{channel}:events"], args=[message, self.max_events])
+
+    def read(self, channel: str, after: int, limit: int = 1000) -> List[Event]:
+        members = self.client.zrangebyscore(f"{channel}:events", f"({after}", "+inf", start=0, num=limit)
+        events = []
+        for member in members:
+            seq, message = member.split(":", 1)
+            events.append((int(seq), message))
+        return events
+
+    def last_seq(self, channel: str) -> int:
+        return int(self.client.get(f"{channel}:seq") or 0)
+
+
+def open_shared_state(url: str) -> SharedState:
+    """Shared state for a URL: "" or "memory://", "sqlite:///path/to/file.db", or "redis://host:port/db" """
+    if not url or url == "memory://":
+        return MemorySharedState()
+    if url.startswith("sqlite:///"):
+        return SQLiteSharedState(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisSharedState(url)
+    raise ValueError(f"unsupported shared state URL: {url!r}")
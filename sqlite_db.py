@@ -0,0 +1,15 @@
+import sqlite3
+
+
+def connect(path: str, timeout: float = 5.0) -> sqlite3.Connection:
+    """Open one of the bot's SQLite databases.
+
+    The stores open their connection lazily and share it with worker
+    threads under their own lock, so it is not tied to the opening thread.
+    WAL lets readers run alongside the writer, and synchronous=NORMAL is
+    durable enough for data that can be rebuilt or re-entered.
+    """
+    conn = sqlite3.connect(path, timeout=timeout, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
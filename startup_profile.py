@@ -0,0 +1,45 @@
+import time
+from typing import List, Tuple
+
+
+class StartupProfile:
+    """Time spent in each startup step, reported once the first update is handled.
+
+    `mark(name)` closes a step: it records the time since the previous
+    mark (or since the profile was created) under `name`. `finish` marks
+    the last step and returns the report; later calls return None. When
+    disabled, marks are not recorded and `finish` returns None.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.started = time.perf_counter()
+        self._last = self.started
+        self.steps: List[Tuple[str, float]] = []
+        self.finished = False
+
+    def mark(self, name: str):
+        if not self.enabled or self.finished:
+            return
+        now = time.perf_counter()
+        self.steps.append((name, now - self._last))
+        self._last = now
+
+    @property
+    def elapsed(self) -> float:
+        return self._last - self.started
+
+    def finish(self, name: str):
+        if not self.enabled or self.finished:
+            return None
+        self.mark(name)
+        self.finished = True
+        return self.report()
+
+    def report(self) -> str:
+        width = max((len(name) for name, _ in self.steps), default=0)
+        lines = ["⏱️ Startup profile (ms):"]
+        for name, seconds in self.steps:
+            lines.append(f"  {name:<{width}} {seconds * 1000:8.1f}")
+        lines.append(f"  {'total':<{width}} {self.elapsed * 1000:8.1f}")
+        return "\n".join(lines)
@@ -0,0 +1,94 @@
+import unittest
+
+from callback_codec import ALPHABET, LITERAL, MAX_CALLBACK_BYTES, CallbackCodec, decode_int, encode_int
+
+OP_MENU, OP_LANG, OP_CLASS, OP_SUBJECT, OP_YEAR, OP_VIEW = range(6)
+ARGUMENTS = {
+    OP_MENU: (None,),
+    OP_LANG: (LITERAL,),
+    OP_CLASS: (1,),
+    OP_SUBJECT: (2,),
+    OP_YEAR: (3,),
+    OP_VIEW: (None, LITERAL),
+}
+TOKENS = [
+    (1, ("10",)),
+    (2, ("10", "Mathematics")),
+    (3, ("10", "Mathematics", "2023")),
+    (64, ("10", "Social_Science")),
+    (5000, ("10", "Social_Science", "2024")),
+]
+
+
+def make_codec() -> CallbackCodec:
+    codec = CallbackCodec(ARGUMENTS)
+    codec.load(TOKENS)
+    return codec
+
+
+class IntCodingTest(unittest.TestCase):
+    def test_round_trip(self):
+        for value in (0, 1, 63, 64, 4095, 4096, 2 ** 40):
+            self.assertEqual(decode_int(encode_int(value)), value)
+
+    def test_rejects_empty_non_canonical_and_invalid(self):
+        self.assertIsNone(decode_int(""))
+        self.assertIsNone(decode_int(ALPHABET[0] + "B"))
+        self.assertIsNone(decode_int("B."))
+
+
+class CallbackCodecTest(unittest.TestCase):
+    def test_round_trip(self):
+        codec = make_codec()
+        cases = [(OP_MENU, None), (OP_VIEW, None), (OP_CLASS, ("10",)), (OP_SUBJECT, ("10", "Mathematics")),
+                 (OP_SUBJECT, ("10", "Social_Science")), (OP_YEAR, ("10", "Social_Science", "2024"))]
+        for opcode, path in cases:
+            data = codec.encode(opcode, path)
+            self.assertLessEqual(len(data.encode()), MAX_CALLBACK_BYTES)
+            self.assertEqual(codec.decode(data), (opcode, path))
+        for opcode, value in [(OP_LANG, "hi"), (OP_VIEW, "3")]:
+            self.assertEqual(codec.decode(codec.encode_literal(opcode, value)), (opcode, value))
+
+    def test_decodes_data_issued_by_another_process(self):
+        data = make_codec().encode(OP_YEAR, ("10", "Mathematics", "2023"))
+        self.assertEqual(make_codec().decode(data), (OP_YEAR, ("10", "Mathematics", "2023")))
+        self.assertEqual(make_codec().decode(ALPHABET[OP_LANG] + ".en"), (OP_LANG, "en"))
+
+    def test_rejects_argument_of_the_wrong_shape(self):
+        codec = make_codec()
+        class_token = encode_int(1)
+        year_token = encode_int(3)
+        for data in [
+            ALPHABET[OP_CLASS],                    # path expected, none given
+            ALPHABET[OP_YEAR],
+            ALPHABET[OP_CLASS] + ".10",            # literal where a path is expected
+            ALPHABET[OP_YEAR] + class_token,       # path of the wrong length
+            ALPHABET[OP_CLASS] + year_token,
+            ALPHABET[OP_MENU] + class_token,       # argument where none is expected
+            ALPHABET[OP_MENU] + ".x",
+            ALPHABET[OP_LANG],                     # literal expected, none given
+            ALPHABET[OP_LANG] + class_token,
+        ]:
+            self.assertIsNone(codec.decode(data), data)
+
+    def test_rejects_unknown_and_malformed_data(self):
+        codec = make_codec()
+        for data in [None, "", ALPHABET[40], ALPHABET[40] + encode_int(1), "!", "class_10",
+                     ALPHABET[OP_CLASS] + encode_int(999), ALPHABET[OP_CLASS] + "A" + encode_int(1),
+                     ALPHABET[OP_CLASS] + "!"]:
+            self.assertIsNone(codec.decode(data), data)
+
+    def test_rejected_data_is_not_remembered(self):
+        codec = make_codec()
+        for value in range(100):
+            codec.decode(ALPHABET[OP_LANG] + f".junk{value}")
+            codec.decode(ALPHABET[OP_CLASS] + f".junk{value}")
+        self.assertEqual(codec._decoded, {})
+
+    def test_literal_too_long(self):
+        with self.assertRaises(ValueError):
+            make_codec().encode_literal(OP_LANG, "x" * MAX_CALLBACK_BYTES)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,150 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Dict, Hashable, List, Optional
+
+from telegram import Update
+from telegram.error import TelegramError
+from telegram.ext import BaseUpdateProcessor
+
+from rate_limiter import BANNED, UserRateLimiter
+
+logger = logging.getLogger(__name__)
+
+
+class BoundedUpdateQueue(asyncio.Queue):
+    """Update queue that applies backpressure when too many updates are in flight.
+
+    An update counts as in flight from `put` until the application calls
+    `task_done` after processing it. While the limit is reached, `put`
+    waits, so the polling loop stops fetching and the webhook server stops
+    acknowledging until workers catch up.
+    """
+
+    def __init__(self, max_in_flight: int):
+        super().__init__()
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self.throttled_puts = 0
+        self._has_capacity = asyncio.Event()
+        self._has_capacity.set()
+
+    async def put(self, item: Any):
+        if self.in_flight >= self.max_in_flight:
+            self.throttled_puts += 1
+            while self.in_flight >= self.max_in_flight:
+                self._has_capacity.clear()
+                await self._has_capacity.wait()
+        self.in_flight += 1
+        await super().put(item)
+
+    def task_done(self):
+        super().task_done()
+        self.in_flight -= 1
+        if self.in_flight < self.max_in_flight:
+            self._has_capacity.set()
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """Processes updates concurrently across users but strictly in order for each user.
+
+    At most `workers` handler coroutines run at once. Updates from the same
+    user (or chat, when there is no user) wait on a per-user FIFO lock before
+    taking a worker slot, so one user's menu state and `waiting_for_search`
+    flag are never touched by two handlers at the same time.
+
+    Inline queries are debounced: Telegram sends one per keystroke, so each
+    waits `inline_debounce` seconds first and is dropped, without running
+    its handler, if the same user typed another one in the meantime.
+
+    Other updates first go through `user_limiter`, if given: floods, double
+    taps and updates from banned users are dropped there, before they wait
+    for the user's lock or a worker. A dropped button press is still
+    answered, so its spinner stops, unless the user is banned.
+    """
+
+    def __init__(self, workers: int, max_pending: int, inline_debounce: float = 0.0,
+                 user_limiter: Optional[UserRateLimiter] = None):
+        super().__init__(max_pending)
+        self.workers = workers
+        self.inline_debounce = inline_debounce
+        self.user_limiter = user_limiter
+        self._worker_slots = asyncio.Semaphore(workers)
+        # user key -> [lock, number of updates holding or waiting for it]
+        self._user_locks: Dict[Hashable, List] = {}
+        # user key -> id of the newest inline query still waiting out the debounce
+        self._latest_inline: Dict[Hashable, str] = {}
+        self.processed = 0
+        self.running = 0
+        self.debounced = 0
+
+    @staticmethod
+    def _user_key(update: object) -> Optional[Hashable]:
+        if not isinstance(update, Update):
+            return None
+        if update.effective_user is not None:
+            return update.effective_user.id
+        if update.effective_chat is not None:
+            return update.effective_chat.id
+        return None
+
+    async def _run(self, coroutine: Awaitable[Any]):
+        async with self._worker_slots:
+            self.running += 1
+            try:
+                await coroutine
+            finally:
+                self.running -= 1
+                self.processed += 1
+
+    async def _superseded(self, key: Hashable, query_id: str) -> bool:
+        self._latest_inline[key] = query_id
+        await asyncio.sleep(self.inline_debounce)
+        if self._latest_inline.get(key) != query_id:
+            return True
+        del self._latest_inline[key]
+        return False
+
+    @staticmethod
+    async def _answer_dropped(query) -> None:
+        try:
+            await query.answer()
+        except TelegramError as e:
+            logger.warning("Failed to answer dropped callback query", extra={"error": str(e)})
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        key = self._user_key(update)
+        if key is None:
+            await self._run(coroutine)
+            return
+
+        if update.inline_query is not None:
+            if self.inline_debounce > 0 and await self._superseded(key, update.inline_query.id):
+                coroutine.close()
+                self.debounced += 1
+                return
+        elif self.user_limiter is not None:
+            query = update.callback_query
+            reason = self.user_limiter.check(key, query.data if query is not None else None)
+            if reason is not None:
+                coroutine.close()
+                if query is not None and reason != BANNED:
+                    await self._answer_dropped(query)
+                return
+
+        entry = self._user_locks.get(key)
+        if entry is None:
+            entry = self._user_locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                await self._run(coroutine)
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._user_locks[key]
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
@@ -0,0 +1,137 @@
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from sqlite_db import connect
+
+# Approximate memory cost of one cached user: the int key plus an OrderedDict
+# entry (see benchmarks/bench_user_store.py)
+BYTES_PER_USER = 128
+
+
+class UserStore:
+    """Per-user language preferences with an LRU memory cap and write-behind persistence.
+
+    Languages are stored as small integer codes (indexes into `languages`),
+    so every cached user costs one OrderedDict entry. Codes are recorded in
+    the database when first assigned, so languages added later never shift
+    the codes of existing ones. Changes are buffered and written to SQLite
+    in batches by `flush`; users evicted from memory are read back from
+    disk on their next update.
+    """
+
+    def __init__(self, path: str, languages: List[str], max_bytes: int = 64 * 1024 * 1024,
+                 flush_batch_size: int = 500):
+        self.path = path
+        self.languages: List[Optional[str]] = list(languages)
+        self.default_language = languages[0]
+        self.default_code = 0
+        self.max_users = max(1, max_bytes // BYTES_PER_USER)
+        self.flush_batch_size = flush_batch_size
+        self._codes: Dict[str, int] = {language: code for code, language in enumerate(languages)}
+        self._cache: "OrderedDict[int, int]" = OrderedDict()
+        self._dirty: Dict[int, int] = {}
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = connect(self.path)
+            conn.execute("CREATE TABLE IF NOT EXISTS users (user_id INTEGER PRIMARY KEY, language INTEGER NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS languages (code INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE)")
+            self._sync_languages(conn)
+            self._conn = conn
+        return self._conn
+
+    def _sync_languages(self, conn: sqlite3.Connection):
+        """Load stored language codes and give new languages the next free ones"""
+        codes = dict(conn.execute("SELECT name, code FROM languages"))
+        # Databases from before the languages table used the order of `languages`
+        legacy = not codes
+        next_code = max(codes.values(), default=-1) + 1
+        with conn:
+            for language in [language for language in self.languages if language not in codes]:
+                if legacy:
+                    code = self._codes[language]
+                else:
+                    code, next_code = next_code, next_code + 1
+                codes[language] = code
+                conn.execute("INSERT INTO languages VALUES (?, ?)", (code, language))
+        names: List[Optional[str]] = [None] * (max(codes.values()) + 1)
+        for language, code in codes.items():
+            names[code] = language
+        self.languages = names
+        self._codes = codes
+        self.default_code = codes[self.default_language]
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def _remember(self, user_id: int, code: int):
+        self._cache[user_id] = code
+        self._cache.move_to_end(user_id)
+        if len(self._cache) > self.max_users:
+            self._cache.popitem(last=False)
+            self.evictions += 1
+
+    def get_language(self, user_id: int) -> str:
+        code = self._cache.get(user_id)
+        if code is not None:
+            self._cache.move_to_end(user_id)
+            return self.languages[code]
+        
+        code = self._dirty.get(user_id)
+        if code is None:
+            with self._lock:
+                row = self.conn.execute("SELECT language FROM users WHERE user_id = ?", (user_id,)).fetchone()
+            code = row[0] if row and row[0] < len(self.languages) and self.languages[row[0]] else self.default_code
+        self._remember(user_id, code)
+        return self.languages[code]
+
+    def set_language(self, user_id: int, language: str):
+        self.conn  # language codes are only final once the database is open
+        code = self._codes.get(language, self.default_code)
+        self._remember(user_id, code)
+        self._dirty[user_id] = code
+        if len(self._dirty) >= self.flush_batch_size:
+            self.flush()
+
+    def cache_language(self, user_id: int, language: str):
+        """Cache a language another worker process set.
+
+        That worker writes the change to disk itself, so it is not buffered
+        here, and a change of this process still buffered for the user is
+        older and is dropped.
+        """
+        self._dirty.pop(user_id, None)
+        self._remember(user_id, self._codes.get(language, self.default_code))
+
+    def forget(self, user_id: Optional[int] = None):
+        """Drop a cached user, or every cached user, so the next lookup reads the database.
+
+        Used when another worker process has changed the user's language.
+        Buffered changes of this process are kept.
+        """
+        if user_id is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(user_id, None)
+
+    def flush(self) -> int:
+        """Write buffered changes to disk in one transaction, returning how many were written"""
+        with self._lock:
+            if not self._dirty:
+                return 0
+            dirty, self._dirty = self._dirty, {}
+            with self.conn:
+                self.conn.executemany("INSERT OR REPLACE INTO users VALUES (?, ?)", dirty.items())
+        return len(dirty)
+
+    def close(self):
+        self.flush()
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
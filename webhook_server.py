@@ -0,0 +1,142 @@
+import asyncio
+import hmac
+import json
+import logging
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (status code, content type, body)
+Response = Tuple[int, str, bytes]
+RouteHandler = Callable[[Dict[str, str], bytes], Awaitable[Response]]
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 403: "Forbidden", 404: "Not Found", 413: "Payload Too Large",
+               429: "Too Many Requests", 500: "Internal Server Error"}
+
+MAX_BODY_BYTES = 1024 * 1024
+IDLE_TIMEOUT = 75  # seconds a keep-alive connection may sit idle
+
+
+def text_response(text: str, status: int = 200) -> Response:
+    return status, "text/plain; charset=utf-8", text.encode("utf-8")
+
+
+def json_response(data, status: int = 200) -> Response:
+    return status, "application/json", json.dumps(data).encode("utf-8")
+
+
+class HttpServer:
+    """Minimal asyncio HTTP/1.1 server with exact-path routing.
+
+    It runs on the bot's own event loop, so requests are handled without
+    crossing threads. Connections are kept alive between requests.
+    """
+
+    def __init__(self):
+        self._routes: Dict[Tuple[str, str], RouteHandler] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    def add_route(self, method: str, path: str, handler: RouteHandler):
+        self._routes[(method, path)] = handler
+
+    async def start(self, host: str, port: int):
+        self._server = await asyncio.start_server(self._serve_connection, host, port)
+
+    @property
+    def port(self) -> int:
+        return self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _dispatch(self, method: str, path: str, headers: Dict[str, str], body: bytes) -> Response:
+        handler = self._routes.get((method, path))
+        if handler is None:
+            return text_response("Not found", 404)
+        return await handler(headers, body)
+
+    async def _serve_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    request_line = await asyncio.wait_for(reader.readline(), IDLE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    break
+                if not request_line:
+                    break
+                
+                parts = request_line.decode("latin-1").split()
+                if len(parts) != 3:
+                    break
+                method, target, version = parts
+                
+                headers: Dict[str, str] = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                
+                length = int(headers.get("content-length", "0") or 0)
+                if length > MAX_BODY_BYTES:
+                    await self._write(writer, text_response("Payload too large", 413), keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                
+                try:
+                    response = await self._dispatch(method, target.split("?", 1)[0], headers, body)
+                except Exception:
+                    logger.exception("Error handling request", extra={"method": method, "target": target})
+                    response = text_response("Internal error", 500)
+                
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                await self._write(writer, response, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _write(writer: asyncio.StreamWriter, response: Response, keep_alive: bool):
+        status, content_type, body = response
+        head = (
+            f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+
+class WebhookServer(HttpServer):
+    """HTTP server that receives Telegram webhook updates, plus any extra routes (health checks).
+
+    Telegram keeps connections alive when delivering bursts of updates;
+    each update is passed to `handle_update` as parsed JSON.
+    """
+
+    def __init__(self, handle_update: Callable[[dict], Awaitable[None]], webhook_path: str,
+                 secret_token: Optional[str] = None):
+        super().__init__()
+        self.handle_update = handle_update
+        self.webhook_path = webhook_path
+        self.secret_token = secret_token
+        self.add_route("POST", webhook_path, self._receive_update)
+
+    async def _receive_update(self, headers: Dict[str, str], body: bytes) -> Response:
+        if self.secret_token and not hmac.compare_digest(
+                headers.get("x-telegram-bot-api-secret-token", "").encode(), self.secret_token.encode()):
+            return text_response("Forbidden", 403)
+        try:
+            data = json.loads(body)
+        except ValueError:
+            return text_response("Invalid JSON", 400)
+        await self.handle_update(data)
+        return text_response("OK")